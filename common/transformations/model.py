@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import numpy as np
 
 from common.transformations.camera import (FULL_FRAME_SIZE,
@@ -164,15 +166,76 @@ def get_camera_frame_from_bigmodel_frame(camera_frame_from_road_frame):
   return camera_frame_from_bigmodel_frame
 
 
-def get_model_frame(snu_full, camera_frame_from_model_frame, size):
-  idxs = camera_frame_from_model_frame.dot(np.column_stack([np.tile(np.arange(size[0]), size[1]),
+# remap tables are kept for this many (warp matrix, size) combinations
+WARP_CACHE_SIZE = 32
+
+
+def _warp_key(camera_frame_from_model_frame):
+  warp = np.ascontiguousarray(camera_frame_from_model_frame, dtype=np.float64)
+  if warp.shape != (3, 3):
+    raise ValueError(f"camera_frame_from_model_frame must be a 3x3 matrix, got shape {warp.shape}")
+  return warp.tobytes()
+
+
+def _camera_points(warp, size):
+  camera_frame_from_model_frame = np.frombuffer(warp).reshape((3, 3))
+  return camera_frame_from_model_frame.dot(np.column_stack([np.tile(np.arange(size[0]), size[1]),
                                                             np.tile(np.arange(size[1]), (size[0], 1)).T.flatten(),
-                                                            np.ones(size[0] * size[1])]).T).T.astype(int)
-  calib_flat = snu_full[idxs[:, 1], idxs[:, 0]]
-  if len(snu_full.shape) == 3:
-    calib = calib_flat.reshape((size[1], size[0], 3))
-  elif len(snu_full.shape) == 2:
-    calib = calib_flat.reshape((size[1], size[0]))
+                                                            np.ones(size[0] * size[1])]).T).T
+
+
+def _read_only(*arrays):
+  for a in arrays:
+    a.setflags(write=False)
+  return arrays
+
+
+@lru_cache(maxsize=WARP_CACHE_SIZE)
+def _nearest_remap(warp, size):
+  idxs = _camera_points(warp, size).astype(int)
+  return _read_only(idxs[:, 1].copy(), idxs[:, 0].copy())
+
+
+@lru_cache(maxsize=WARP_CACHE_SIZE)
+def _bilinear_remap(warp, size, frame_size):
+  pts = _camera_points(warp, size)
+  h, w = frame_size
+  x = np.clip(pts[:, 0], 0, w - 1)
+  y = np.clip(pts[:, 1], 0, h - 1)
+  x0, y0 = np.floor(x).astype(int), np.floor(y).astype(int)
+  x1, y1 = np.minimum(x0 + 1, w - 1), np.minimum(y0 + 1, h - 1)
+  return _read_only(y0, x0, y1, x1, x - x0, y - y0)
+
+
+def get_model_frames(frames, camera_frame_from_model_frame, size, bilinear=False):
+  """Warps a batch of (N, H, W) or (N, H, W, C) frames into the model frame of the given size.
+
+     The pixel lookup tables only depend on the warp matrix and sizes, so they are
+     built once and reused from an LRU cache. By default pixels are sampled like
+     get_model_frame always did, bilinear interpolates between neighbours instead.
+  """
+  frames = np.asarray(frames)
+  if len(frames.shape) not in (3, 4):
+    raise ValueError("shape of input imgs is weird")
+
+  warp, size = _warp_key(camera_frame_from_model_frame), tuple(size)
+  if bilinear:
+    y0, x0, y1, x1, wx, wy = _bilinear_remap(warp, size, frames.shape[1:3])
+    if len(frames.shape) == 4:
+      wx, wy = wx[:, None], wy[:, None]
+    top = frames[:, y0, x0] * (1 - wx) + frames[:, y0, x1] * wx
+    bottom = frames[:, y1, x0] * (1 - wx) + frames[:, y1, x1] * wx
+    calib_flat = top * (1 - wy) + bottom * wy
+    if np.issubdtype(frames.dtype, np.integer):
+      calib_flat = np.rint(calib_flat)
+    calib_flat = calib_flat.astype(frames.dtype)
   else:
+    rows, cols = _nearest_remap(warp, size)
+    calib_flat = frames[:, rows, cols]
+  return calib_flat.reshape((frames.shape[0], size[1], size[0]) + frames.shape[3:])
+
+
+def get_model_frame(snu_full, camera_frame_from_model_frame, size, bilinear=False):
+  if len(snu_full.shape) not in (2, 3):
     raise ValueError("shape of input img is weird")
-  return calib
+  return get_model_frames(snu_full[None], camera_frame_from_model_frame, size, bilinear)[0]
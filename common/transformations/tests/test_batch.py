@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import unittest
+
+import numpy as np
+
+import common.transformations.coordinates as coord
+import common.transformations.orientation as orient
+import common.transformations.transformations as tr
+
+ECEF_INIT = tr.geodetic2ecef_single([37.7749, -122.4194, 10.])
+BATCH_SIZES = (0, 1, 7)
+
+
+def random_euler(rng, n):
+  # pitch stays away from the gimbal lock, so the conversions round trip
+  return rng.uniform([-np.pi, -1.5, -np.pi], [np.pi, 1.5, np.pi], size=(n, 3))
+
+
+def random_quat(rng, n):
+  q = rng.normal(size=(n, 4))
+  return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def random_rot(rng, n):
+  return np.array([tr.euler2rot_single(e) for e in random_euler(rng, n)]).reshape((n, 3, 3))
+
+
+def random_geodetic(rng, n):
+  return rng.uniform([-80., -180., -100.], [80., 180., 1000.], size=(n, 3))
+
+
+def random_ecef(rng, n):
+  return np.array([tr.geodetic2ecef_single(g) for g in random_geodetic(rng, n)]).reshape((n, 3))
+
+
+def random_ned(rng, n):
+  return rng.uniform(-1000., 1000., size=(n, 3))
+
+
+# name: (batch function, single function, wrapped function, input shape, output shape, inputs)
+FUNCTIONS = {
+  'euler2quat': (tr.euler2quat_batch, tr.euler2quat_single, orient.euler2quat, (3,), (4,), random_euler),
+  'quat2euler': (tr.quat2euler_batch, tr.quat2euler_single, orient.quat2euler, (4,), (3,), random_quat),
+  'quat2rot': (tr.quat2rot_batch, tr.quat2rot_single, orient.quat2rot, (4,), (3, 3), random_quat),
+  'rot2quat': (tr.rot2quat_batch, tr.rot2quat_single, orient.rot2quat, (3, 3), (4,), random_rot),
+  'euler2rot': (tr.euler2rot_batch, tr.euler2rot_single, orient.euler2rot, (3,), (3, 3), random_euler),
+  'rot2euler': (tr.rot2euler_batch, tr.rot2euler_single, orient.rot2euler, (3, 3), (3,), random_rot),
+  'geodetic2ecef': (tr.geodetic2ecef_batch, tr.geodetic2ecef_single, coord.geodetic2ecef, (3,), (3,), random_geodetic),
+  'ecef2geodetic': (tr.ecef2geodetic_batch, tr.ecef2geodetic_single, coord.ecef2geodetic, (3,), (3,), random_ecef),
+}
+
+# functions that also take the ecef position the euler angles are relative to
+INIT_FUNCTIONS = {
+  'ecef_euler_from_ned': (tr.ecef_euler_from_ned_batch, tr.ecef_euler_from_ned_single, orient.ecef_euler_from_ned, random_euler),
+  'ned_euler_from_ecef': (tr.ned_euler_from_ecef_batch, tr.ned_euler_from_ecef_single, orient.ned_euler_from_ecef, random_euler),
+}
+
+LOCAL_COORD_METHODS = {
+  'ecef2ned': random_ecef,
+  'ned2ecef': random_ned,
+  'geodetic2ned': random_geodetic,
+  'ned2geodetic': random_ned,
+}
+
+
+class TestBatchTransformations(unittest.TestCase):
+  def _check(self, batch, single, wrapped, input_shape, output_shape, inputs):
+    rng = np.random.RandomState(0)
+
+    for n in BATCH_SIZES:
+      inp = inputs(rng, n)
+      expected = np.array([single(i) for i in inp]).reshape((n,) + output_shape)
+      out = batch(np.ascontiguousarray(inp))
+      self.assertEqual(out.shape, (n,) + output_shape)
+      np.testing.assert_allclose(out, expected, rtol=1e-12, atol=1e-12)
+      np.testing.assert_allclose(wrapped(inp), expected, rtol=1e-12, atol=1e-12)
+
+    # a single unbatched row
+    inp = inputs(rng, 1)[0]
+    out = wrapped(inp)
+    self.assertEqual(out.shape, output_shape)
+    np.testing.assert_allclose(out, np.array(single(inp)).reshape(output_shape), rtol=1e-12, atol=1e-12)
+
+    # several leading batch dimensions, also from a non contiguous view and lists
+    inp = inputs(rng, 12).reshape((3, 4) + input_shape)
+    expected = np.array([single(i) for i in inp.reshape((-1,) + input_shape)]).reshape((3, 4) + output_shape)
+    for view, expected_view in ((inp, expected), (inp[:, ::2], expected[:, ::2]), (inp.tolist(), expected)):
+      out = wrapped(view)
+      self.assertEqual(out.shape, expected_view.shape)
+      np.testing.assert_allclose(out, expected_view, rtol=1e-12, atol=1e-12)
+
+  def test_functions(self):
+    for name, (batch, single, wrapped, input_shape, output_shape, inputs) in FUNCTIONS.items():
+      with self.subTest(name):
+        self._check(batch, single, wrapped, input_shape, output_shape, inputs)
+
+  def test_init_functions(self):
+    for name, (batch, single, wrapped, inputs) in INIT_FUNCTIONS.items():
+      with self.subTest(name):
+        self._check(lambda inp, f=batch: f(ECEF_INIT, inp),
+                    lambda inp, f=single: f(ECEF_INIT, inp),
+                    lambda inp, f=wrapped: f(ECEF_INIT, inp),
+                    (3,), (3,), inputs)
+
+  def test_local_coord(self):
+    lc = coord.LocalCoord.from_ecef(ECEF_INIT)
+    for name, inputs in LOCAL_COORD_METHODS.items():
+      with self.subTest(name):
+        self._check(getattr(lc, f"{name}_batch"), getattr(lc, f"{name}_single"), getattr(lc, name),
+                    (3,), (3,), inputs)
+
+  def test_bad_shapes(self):
+    lc = coord.LocalCoord.from_ecef(ECEF_INIT)
+    batches = [(batch, input_shape) for batch, _, _, input_shape, _, _ in FUNCTIONS.values()]
+    batches += [(lambda inp, f=batch: f(ECEF_INIT, inp), (3,)) for batch, _, _, _ in INIT_FUNCTIONS.values()]
+    batches += [(getattr(lc, f"{name}_batch"), (3,)) for name in LOCAL_COORD_METHODS]
+
+    for batch, input_shape in batches:
+      if input_shape == (3, 3):
+        bad_shapes = [(5, 3, 4), (5, 4, 3), (5, 2, 2)]
+      else:
+        bad_shapes = [(5, input_shape[0] - 1), (5, input_shape[0] + 1)]
+      for shape in bad_shapes:
+        with self.subTest(batch=batch, shape=shape):
+          with self.assertRaises(ValueError):
+            batch(np.zeros(shape))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import unittest
+
+import numpy as np
+
+import common.transformations.model as model
+from common.transformations.camera import W, H, fcam_intrinsics, get_view_frame_from_road_frame
+from common.transformations.model import get_camera_frame_from_model_frame, get_model_frame, get_model_frames
+
+
+def old_get_model_frame(snu_full, camera_frame_from_model_frame, size):
+  # get_model_frame before the remap tables were cached
+  idxs = camera_frame_from_model_frame.dot(np.column_stack([np.tile(np.arange(size[0]), size[1]),
+                                                            np.tile(np.arange(size[1]), (size[0], 1)).T.flatten(),
+                                                            np.ones(size[0] * size[1])]).T).T.astype(int)
+  calib_flat = snu_full[idxs[:, 1], idxs[:, 0]]
+  if len(snu_full.shape) == 3:
+    return calib_flat.reshape((size[1], size[0], 3))
+  return calib_flat.reshape((size[1], size[0]))
+
+
+def camera_frame_from_model_frame(pitch=0.):
+  camera_frame_from_road_frame = np.dot(fcam_intrinsics, get_view_frame_from_road_frame(0, pitch, 0, model.model_height))
+  return get_camera_frame_from_model_frame(camera_frame_from_road_frame)
+
+
+class TestModelFrame(unittest.TestCase):
+  def setUp(self):
+    model._nearest_remap.cache_clear()
+    model._bilinear_remap.cache_clear()
+
+  def test_nearest_matches_old(self):
+    rng = np.random.RandomState(0)
+    warp = camera_frame_from_model_frame(0.02)
+    for shape in ((H, W), (H, W, 3)):
+      frames = rng.randint(0, 256, size=(4,) + shape, dtype=np.uint8)
+      expected = np.stack([old_get_model_frame(f, warp, model.MODEL_INPUT_SIZE) for f in frames])
+
+      for frame, expected_frame in zip(frames, expected):
+        np.testing.assert_array_equal(get_model_frame(frame, warp, model.MODEL_INPUT_SIZE), expected_frame)
+      np.testing.assert_array_equal(get_model_frames(frames, warp, model.MODEL_INPUT_SIZE), expected)
+
+  def test_bilinear(self):
+    # bilinear interpolation of a linear image is exact, away from the borders
+    size = (20, 10)
+    warp = np.array([[0.5, 0., 10.25],
+                     [0., 0.5, 5.75],
+                     [0., 0., 1.]])
+    y, x = np.mgrid[:40, :60]
+    frame = 2. * x + 3. * y
+
+    xs, ys = np.meshgrid(np.arange(size[0]), np.arange(size[1]))
+    expected = 2. * (0.5 * xs + 10.25) + 3. * (0.5 * ys + 5.75)
+    np.testing.assert_allclose(get_model_frame(frame, warp, size, bilinear=True), expected)
+
+    # channels are interpolated alike, integer frames are rounded and keep their type
+    frames = np.stack([frame, frame + 1.], axis=-1).astype(np.uint8)[None]
+    out = get_model_frames(frames, warp, size, bilinear=True)
+    self.assertEqual(out.dtype, np.uint8)
+    np.testing.assert_array_equal(out, np.rint(np.stack([expected, expected + 1.], axis=-1))[None])
+
+  def test_cache_reuse(self):
+    rng = np.random.RandomState(0)
+    warp = camera_frame_from_model_frame()
+    frame = rng.randint(0, 256, size=(H, W), dtype=np.uint8)
+
+    first = get_model_frame(frame, warp, model.MODEL_INPUT_SIZE)
+    for same_warp in (warp.copy(), warp.tolist()):
+      np.testing.assert_array_equal(get_model_frame(frame, same_warp, model.MODEL_INPUT_SIZE), first)
+    info = model._nearest_remap.cache_info()
+    self.assertEqual((info.hits, info.misses), (2, 1))
+
+    # the cached tables can't be changed by callers
+    rows, cols = model._nearest_remap(model._warp_key(warp), model.MODEL_INPUT_SIZE)
+    self.assertFalse(rows.flags.writeable or cols.flags.writeable)
+
+    get_model_frame(frame, camera_frame_from_model_frame(0.02), model.MODEL_INPUT_SIZE)
+    get_model_frame(frame, warp, (160, 80))
+    self.assertEqual(model._nearest_remap.cache_info().misses, 3)
+
+    get_model_frame(frame, warp, model.MODEL_INPUT_SIZE, bilinear=True)
+    get_model_frame(frame, warp, model.MODEL_INPUT_SIZE, bilinear=True)
+    info = model._bilinear_remap.cache_info()
+    self.assertEqual((info.hits, info.misses), (1, 1))
+
+  def test_bad_shapes(self):
+    frame = np.zeros((H, W), dtype=np.uint8)
+    for bad_warp in (np.eye(2), np.eye(4), np.zeros((3, 4)), np.zeros(9)):
+      with self.assertRaises(ValueError):
+        get_model_frame(frame, bad_warp, model.MODEL_INPUT_SIZE)
+    with self.assertRaises(ValueError):
+      get_model_frame(np.zeros(W), camera_frame_from_model_frame(), model.MODEL_INPUT_SIZE)
+    with self.assertRaises(ValueError):
+      get_model_frames(frame, camera_frame_from_model_frame(), model.MODEL_INPUT_SIZE)
+
+
+if __name__ == "__main__":
+  unittest.main()
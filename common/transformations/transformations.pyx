@@ -112,6 +112,208 @@ def ecef2geodetic_single(ecef):
     return [g.lat, g.lon, g.alt]
 
 
+# Batch versions of the functions above. They take C contiguous (N, 3), (N, 4)
+# or (N, 3, 3) arrays and convert all rows in a single loop. The loops don't
+# check bounds, so the shapes are checked before.
+
+cdef int check_rows(double[:, ::1] a, Py_ssize_t dim) except -1:
+    if a.shape[1] != dim:
+        raise ValueError(f"expected an array of shape (N, {dim}), got ({a.shape[0]}, {a.shape[1]})")
+    return 0
+
+cdef int check_matrices(double[:, :, ::1] a) except -1:
+    if a.shape[1] != 3 or a.shape[2] != 3:
+        raise ValueError(f"expected an array of shape (N, 3, 3), got ({a.shape[0]}, {a.shape[1]}, {a.shape[2]})")
+    return 0
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def euler2quat_batch(double[:, ::1] euler):
+    check_rows(euler, 3)
+    cdef Py_ssize_t i, n = euler.shape[0]
+    cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 4))
+    cdef double[:, ::1] out_v = out
+    cdef Vector3 e
+    cdef Quaternion q
+    for i in range(n):
+        e = Vector3(euler[i, 0], euler[i, 1], euler[i, 2])
+        q = euler2quat_c(e)
+        out_v[i, 0] = q.w()
+        out_v[i, 1] = q.x()
+        out_v[i, 2] = q.y()
+        out_v[i, 3] = q.z()
+    return out
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def quat2euler_batch(double[:, ::1] quat):
+    check_rows(quat, 4)
+    cdef Py_ssize_t i, n = quat.shape[0]
+    cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 3))
+    cdef double[:, ::1] out_v = out
+    cdef Quaternion q
+    cdef Vector3 e
+    for i in range(n):
+        q = Quaternion(quat[i, 0], quat[i, 1], quat[i, 2], quat[i, 3])
+        e = quat2euler_c(q)
+        out_v[i, 0] = e(0)
+        out_v[i, 1] = e(1)
+        out_v[i, 2] = e(2)
+    return out
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def quat2rot_batch(double[:, ::1] quat):
+    check_rows(quat, 4)
+    cdef Py_ssize_t i, r, c, n = quat.shape[0]
+    cdef np.ndarray[double, ndim=3, mode="c"] out = np.empty((n, 3, 3))
+    cdef double[:, :, ::1] out_v = out
+    cdef Quaternion q
+    cdef Matrix3 m
+    for i in range(n):
+        q = Quaternion(quat[i, 0], quat[i, 1], quat[i, 2], quat[i, 3])
+        m = quat2rot_c(q)
+        for r in range(3):
+            for c in range(3):
+                out_v[i, r, c] = m(r, c)
+    return out
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def rot2quat_batch(double[:, :, ::1] rot):
+    check_matrices(rot)
+    cdef Py_ssize_t i, r, c, n = rot.shape[0]
+    cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 4))
+    cdef double[:, ::1] out_v = out
+    cdef double buf[9]
+    cdef Matrix3 m
+    cdef Quaternion q
+    for i in range(n):
+        # Eigen matrices are column major
+        for r in range(3):
+            for c in range(3):
+                buf[3 * c + r] = rot[i, r, c]
+        m = Matrix3(buf)
+        q = rot2quat_c(m)
+        out_v[i, 0] = q.w()
+        out_v[i, 1] = q.x()
+        out_v[i, 2] = q.y()
+        out_v[i, 3] = q.z()
+    return out
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def euler2rot_batch(double[:, ::1] euler):
+    check_rows(euler, 3)
+    cdef Py_ssize_t i, r, c, n = euler.shape[0]
+    cdef np.ndarray[double, ndim=3, mode="c"] out = np.empty((n, 3, 3))
+    cdef double[:, :, ::1] out_v = out
+    cdef Vector3 e
+    cdef Matrix3 m
+    for i in range(n):
+        e = Vector3(euler[i, 0], euler[i, 1], euler[i, 2])
+        m = euler2rot_c(e)
+        for r in range(3):
+            for c in range(3):
+                out_v[i, r, c] = m(r, c)
+    return out
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def rot2euler_batch(double[:, :, ::1] rot):
+    check_matrices(rot)
+    cdef Py_ssize_t i, r, c, n = rot.shape[0]
+    cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 3))
+    cdef double[:, ::1] out_v = out
+    cdef double buf[9]
+    cdef Matrix3 m
+    cdef Vector3 e
+    for i in range(n):
+        for r in range(3):
+            for c in range(3):
+                buf[3 * c + r] = rot[i, r, c]
+        m = Matrix3(buf)
+        e = rot2euler_c(m)
+        out_v[i, 0] = e(0)
+        out_v[i, 1] = e(1)
+        out_v[i, 2] = e(2)
+    return out
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def ecef_euler_from_ned_batch(ecef_init, double[:, ::1] ned_pose):
+    check_rows(ned_pose, 3)
+    cdef Py_ssize_t i, n = ned_pose.shape[0]
+    cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 3))
+    cdef double[:, ::1] out_v = out
+    cdef ECEF init = list2ecef(ecef_init)
+    cdef Vector3 pose
+    cdef Vector3 e
+    for i in range(n):
+        pose = Vector3(ned_pose[i, 0], ned_pose[i, 1], ned_pose[i, 2])
+        e = ecef_euler_from_ned_c(init, pose)
+        out_v[i, 0] = e(0)
+        out_v[i, 1] = e(1)
+        out_v[i, 2] = e(2)
+    return out
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def ned_euler_from_ecef_batch(ecef_init, double[:, ::1] ecef_pose):
+    check_rows(ecef_pose, 3)
+    cdef Py_ssize_t i, n = ecef_pose.shape[0]
+    cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 3))
+    cdef double[:, ::1] out_v = out
+    cdef ECEF init = list2ecef(ecef_init)
+    cdef Vector3 pose
+    cdef Vector3 e
+    for i in range(n):
+        pose = Vector3(ecef_pose[i, 0], ecef_pose[i, 1], ecef_pose[i, 2])
+        e = ned_euler_from_ecef_c(init, pose)
+        out_v[i, 0] = e(0)
+        out_v[i, 1] = e(1)
+        out_v[i, 2] = e(2)
+    return out
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def geodetic2ecef_batch(double[:, ::1] geodetic):
+    check_rows(geodetic, 3)
+    cdef Py_ssize_t i, n = geodetic.shape[0]
+    cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 3))
+    cdef double[:, ::1] out_v = out
+    cdef Geodetic g
+    cdef ECEF e
+    for i in range(n):
+        g.lat = geodetic[i, 0]
+        g.lon = geodetic[i, 1]
+        g.alt = geodetic[i, 2]
+        e = geodetic2ecef_c(g)
+        out_v[i, 0] = e.x
+        out_v[i, 1] = e.y
+        out_v[i, 2] = e.z
+    return out
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def ecef2geodetic_batch(double[:, ::1] ecef):
+    check_rows(ecef, 3)
+    cdef Py_ssize_t i, n = ecef.shape[0]
+    cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 3))
+    cdef double[:, ::1] out_v = out
+    cdef ECEF e
+    cdef Geodetic g
+    for i in range(n):
+        e.x = ecef[i, 0]
+        e.y = ecef[i, 1]
+        e.z = ecef[i, 2]
+        g = ecef2geodetic_c(e)
+        out_v[i, 0] = g.lat
+        out_v[i, 1] = g.lon
+        out_v[i, 2] = g.alt
+    return out
+
+
 cdef class LocalCoord:
     cdef LocalCoord_c * lc
 
@@ -170,5 +372,85 @@ cdef class LocalCoord:
         cdef Geodetic g = self.lc.ned2geodetic(n)
         return [g.lat, g.lon, g.alt]
 
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    def ecef2ned_batch(self, double[:, ::1] ecef):
+        assert self.lc
+        check_rows(ecef, 3)
+        cdef Py_ssize_t i, n = ecef.shape[0]
+        cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 3))
+        cdef double[:, ::1] out_v = out
+        cdef ECEF e
+        cdef NED ned
+        for i in range(n):
+            e.x = ecef[i, 0]
+            e.y = ecef[i, 1]
+            e.z = ecef[i, 2]
+            ned = self.lc.ecef2ned(e)
+            out_v[i, 0] = ned.n
+            out_v[i, 1] = ned.e
+            out_v[i, 2] = ned.d
+        return out
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    def ned2ecef_batch(self, double[:, ::1] ned):
+        assert self.lc
+        check_rows(ned, 3)
+        cdef Py_ssize_t i, n = ned.shape[0]
+        cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 3))
+        cdef double[:, ::1] out_v = out
+        cdef NED nd
+        cdef ECEF e
+        for i in range(n):
+            nd.n = ned[i, 0]
+            nd.e = ned[i, 1]
+            nd.d = ned[i, 2]
+            e = self.lc.ned2ecef(nd)
+            out_v[i, 0] = e.x
+            out_v[i, 1] = e.y
+            out_v[i, 2] = e.z
+        return out
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    def geodetic2ned_batch(self, double[:, ::1] geodetic):
+        assert self.lc
+        check_rows(geodetic, 3)
+        cdef Py_ssize_t i, n = geodetic.shape[0]
+        cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 3))
+        cdef double[:, ::1] out_v = out
+        cdef Geodetic g
+        cdef NED ned
+        for i in range(n):
+            g.lat = geodetic[i, 0]
+            g.lon = geodetic[i, 1]
+            g.alt = geodetic[i, 2]
+            ned = self.lc.geodetic2ned(g)
+            out_v[i, 0] = ned.n
+            out_v[i, 1] = ned.e
+            out_v[i, 2] = ned.d
+        return out
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    def ned2geodetic_batch(self, double[:, ::1] ned):
+        assert self.lc
+        check_rows(ned, 3)
+        cdef Py_ssize_t i, n = ned.shape[0]
+        cdef np.ndarray[double, ndim=2, mode="c"] out = np.empty((n, 3))
+        cdef double[:, ::1] out_v = out
+        cdef NED nd
+        cdef Geodetic g
+        for i in range(n):
+            nd.n = ned[i, 0]
+            nd.e = ned[i, 1]
+            nd.d = ned[i, 2]
+            g = self.lc.ned2geodetic(nd)
+            out_v[i, 0] = g.lat
+            out_v[i, 1] = g.lon
+            out_v[i, 2] = g.alt
+        return out
+
     def __dealloc__(self):
         del self.lc
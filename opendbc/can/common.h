@@ -32,6 +32,7 @@ public:
 
   std::vector<Signal> parse_sigs;
   std::vector<double> vals;
+  size_t slot = 0;  // index of vals[0] among all signals of the parser
 
   uint16_t ts;
   uint64_t seen;
@@ -43,6 +44,11 @@ public:
   bool ignore_checksum = false;
   bool ignore_counter = false;
 
+  // every successfully parsed value, one vector per signal in parse_sigs
+  bool record_history = false;
+  std::vector<uint64_t> history_ts;
+  std::vector<std::vector<double>> history_vals;
+
   bool parse(uint64_t sec, uint16_t ts_, uint8_t * dat);
   bool update_counter_generic(int64_t v, int cnt_size);
 };
@@ -55,7 +61,11 @@ private:
   const DBC *dbc = NULL;
   std::unordered_map<uint32_t, MessageState> message_states;
 
+  void assign_slots();
+
 public:
+  size_t num_slots = 0;
+
   bool can_valid = false;
   uint64_t last_sec = 0;
 
@@ -65,11 +75,16 @@ public:
   CANParser(int abus, const std::string& dbc_name, bool ignore_checksum, bool ignore_counter);
   #ifndef DYNAMIC_CAPNP
   void update_string(const std::string &data, bool sendcan);
+  std::vector<SignalHistory> update_strings(const std::vector<std::string> &data, bool sendcan);
   void UpdateCans(uint64_t sec, const capnp::List<cereal::CanData>::Reader& cans);
   #endif
   void UpdateCans(uint64_t sec, const capnp::DynamicStruct::Reader& cans);
   void UpdateValid(uint64_t sec);
   std::vector<SignalValue> query_latest();
+  std::vector<SignalValue> query_all();
+  void set_record_history(bool enabled);
+  std::vector<SignalHistory> query_history();
+  void clear_history();
 };
 
 class CANPacker {
@@ -78,8 +93,12 @@ private:
   std::map<std::pair<uint32_t, std::string>, Signal> signal_lookup;
   std::map<uint32_t, Msg> message_lookup;
 
+  uint64_t set_counter_and_checksum(uint32_t address, uint64_t ret, int counter);
+
 public:
   CANPacker(const std::string& dbc_name);
   uint64_t pack(uint32_t address, const std::vector<SignalPackValue> &values, int counter);
+  uint64_t pack(uint32_t address, const std::vector<const Signal*> &signals, const double *values, int counter);
+  const Signal* lookup_signal(uint32_t address, const std::string &name);
   Msg* lookup_message(uint32_t address);
 };
@@ -64,6 +64,13 @@ cdef extern from "common_dbc.h":
     uint16_t ts
     const char* name
     double value
+    size_t slot
+
+  cdef struct SignalHistory:
+    uint32_t address
+    const char* name
+    vector[uint64_t] ts
+    vector[double] values
 
   cdef struct SignalPackValue:
     string name
@@ -75,10 +82,17 @@ cdef extern from "common.h":
 
   cdef cppclass CANParser:
     bool can_valid
+    size_t num_slots
     CANParser(int, string, vector[MessageParseOptions], vector[SignalParseOptions])
     void update_string(string, bool)
+    vector[SignalHistory] update_strings(vector[string], bool) except +
     vector[SignalValue] query_latest()
+    vector[SignalValue] query_all()
+    void set_record_history(bool)
+    vector[SignalHistory] query_history()
 
   cdef cppclass CANPacker:
    CANPacker(string)
    uint64_t pack(uint32_t, vector[SignalPackValue], int counter)
+   uint64_t pack(uint32_t, vector[const Signal*], const double*, int counter)
+   const Signal* lookup_signal(uint32_t, string)
@@ -28,6 +28,14 @@ struct SignalValue {
   uint16_t ts;
   const char* name;
   double value;
+  size_t slot;
+};
+
+struct SignalHistory {
+  uint32_t address;
+  const char* name;
+  std::vector<uint64_t> ts;
+  std::vector<double> values;
 };
 
 enum SignalType {
@@ -3,7 +3,10 @@ import re
 import os
 import struct
 import sys
+import pickle
+import hashlib
 import numbers
+import tempfile
 from collections import namedtuple, defaultdict
 
 def int_or_float(s):
@@ -19,6 +22,132 @@ DBCSignal = namedtuple(
                 "factor", "offset", "tmin", "tmax", "units"])
 
 
+# bump when the parsed layout changes, so old cache files are ignored
+DBC_CACHE_VERSION = 1
+DBC_CACHE_DIR = os.getenv("DBC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".comma", "dbc_cache"))
+
+# parsed dbcs by file hash, shared by all dbc objects of this process
+_parsed_dbcs = {}
+
+
+def parse_dbc(txt, name):
+  """Parses the lines of a DBC file into (msgs, def_vals), see dbc."""
+  # regexps from https://github.com/ebroecker/canmatrix/blob/master/canmatrix/importdbc.py
+  bo_regexp = re.compile(r"^BO\_ (\w+) (\w+) *: (\w+) (\w+)")
+  sg_regexp = re.compile(r"^SG\_ (\w+) : (\d+)\|(\d+)@(\d+)([\+|\-]) \(([0-9.+\-eE]+),([0-9.+\-eE]+)\) \[([0-9.+\-eE]+)\|([0-9.+\-eE]+)\] \"(.*)\" (.*)")
+  sgm_regexp = re.compile(r"^SG\_ (\w+) (\w+) *: (\d+)\|(\d+)@(\d+)([\+|\-]) \(([0-9.+\-eE]+),([0-9.+\-eE]+)\) \[([0-9.+\-eE]+)\|([0-9.+\-eE]+)\] \"(.*)\" (.*)")
+  val_regexp = re.compile(r"VAL\_ (\w+) (\w+) (\s*[-+]?[0-9]+\s+\".+?\"[^;]*)")
+
+  msgs = {}
+  def_vals = defaultdict(list)
+
+  for l in txt:
+    l = l.strip()
+
+    if l.startswith("BO_ "):
+      # new group
+      dat = bo_regexp.match(l)
+
+      if dat is None:
+        print("bad BO {0}".format(l))
+
+      msg_name = dat.group(2)
+      size = int(dat.group(3))
+      ids = int(dat.group(1), 0)  # could be hex
+      if ids in msgs:
+        sys.exit("Duplicate address detected %d %s" % (ids, name))
+
+      msgs[ids] = ((msg_name, size), [])
+
+    if l.startswith("SG_ "):
+      # new signal
+      dat = sg_regexp.match(l)
+      go = 0
+      if dat is None:
+        dat = sgm_regexp.match(l)
+        go = 1
+
+      if dat is None:
+        print("bad SG {0}".format(l))
+
+      sgname = dat.group(1)
+      start_bit = int(dat.group(go + 2))
+      signal_size = int(dat.group(go + 3))
+      is_little_endian = int(dat.group(go + 4)) == 1
+      is_signed = dat.group(go + 5) == '-'
+      factor = int_or_float(dat.group(go + 6))
+      offset = int_or_float(dat.group(go + 7))
+      tmin = int_or_float(dat.group(go + 8))
+      tmax = int_or_float(dat.group(go + 9))
+      units = dat.group(go + 10)
+
+      msgs[ids][1].append(
+        DBCSignal(sgname, start_bit, signal_size, is_little_endian,
+                  is_signed, factor, offset, tmin, tmax, units))
+
+    if l.startswith("VAL_ "):
+      # new signal value/definition
+      dat = val_regexp.match(l)
+
+      if dat is None:
+        print("bad VAL {0}".format(l))
+
+      ids = int(dat.group(1), 0)  # could be hex
+      sgname = dat.group(2)
+      defvals = dat.group(3)
+
+      defvals = defvals.replace("?", r"\?")  # escape sequence in C++
+      defvals = defvals.split('"')[:-1]
+
+      # convert strings to UPPER_CASE_WITH_UNDERSCORES
+      defvals[1::2] = [d.strip().upper().replace(" ", "_") for d in defvals[1::2]]
+      defvals = '"' + "".join(str(i) for i in defvals) + '"'
+
+      def_vals[ids].append((sgname, defvals))
+
+  for msg in msgs.values():
+    msg[1].sort(key=lambda x: x.start_bit)
+
+  return msgs, dict(def_vals)
+
+
+def load_dbc(txt, name):
+  """Like parse_dbc, but reuses earlier results for the same DBC text.
+
+     Parsed DBCs are memoized in this process and stored in DBC_CACHE_DIR, keyed
+     by the hash of the text, so a DBC is only parsed once per change.
+  """
+  key = hashlib.sha1("".join(txt).encode()).hexdigest()
+  if key in _parsed_dbcs:
+    return _parsed_dbcs[key]
+
+  cache_fn = os.path.join(DBC_CACHE_DIR, f"{name}_{key}")
+  try:
+    with open(cache_fn, "rb") as f:
+      version, parsed = pickle.load(f)
+    if version != DBC_CACHE_VERSION:
+      raise ValueError(f"old cache version {version}")
+  except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+    parsed = parse_dbc(txt, name)
+    tmp_fn = None
+    try:
+      os.makedirs(DBC_CACHE_DIR, exist_ok=True)
+      with tempfile.NamedTemporaryFile(mode="wb", dir=DBC_CACHE_DIR, delete=False) as f:
+        tmp_fn = f.name
+        pickle.dump((DBC_CACHE_VERSION, parsed), f, pickle.HIGHEST_PROTOCOL)
+      os.replace(tmp_fn, cache_fn)
+    except OSError:
+      # don't leave partial cache files behind, e.g. on a full disk
+      if tmp_fn is not None:
+        try:
+          os.unlink(tmp_fn)
+        except OSError:
+          pass
+
+  _parsed_dbcs[key] = parsed
+  return parsed
+
+
 class dbc():
   def __init__(self, fn):
     self.name, _ = os.path.splitext(os.path.basename(fn))
@@ -26,92 +155,21 @@ class dbc():
       self.txt = f.readlines()
     self._warned_addresses = set()
 
-    # regexps from https://github.com/ebroecker/canmatrix/blob/master/canmatrix/importdbc.py
-    bo_regexp = re.compile(r"^BO\_ (\w+) (\w+) *: (\w+) (\w+)")
-    sg_regexp = re.compile(r"^SG\_ (\w+) : (\d+)\|(\d+)@(\d+)([\+|\-]) \(([0-9.+\-eE]+),([0-9.+\-eE]+)\) \[([0-9.+\-eE]+)\|([0-9.+\-eE]+)\] \"(.*)\" (.*)")
-    sgm_regexp = re.compile(r"^SG\_ (\w+) (\w+) *: (\d+)\|(\d+)@(\d+)([\+|\-]) \(([0-9.+\-eE]+),([0-9.+\-eE]+)\) \[([0-9.+\-eE]+)\|([0-9.+\-eE]+)\] \"(.*)\" (.*)")
-    val_regexp = re.compile(r"VAL\_ (\w+) (\w+) (\s*[-+]?[0-9]+\s+\".+?\"[^;]*)")
+    msgs, def_vals = load_dbc(self.txt, self.name)
 
     # A dictionary which maps message ids to tuples ((name, size), signals).
     #   name is the ASCII name of the message.
     #   size is the size of the message in bytes.
     #   signals is a list signals contained in the message.
     # signals is a list of DBCSignal in order of increasing start_bit.
-    self.msgs = {}
+    self.msgs = {address: (m[0], list(m[1])) for address, m in msgs.items()}
 
     # A dictionary which maps message ids to a list of tuples (signal name, definition value pairs)
-    self.def_vals = defaultdict(list)
+    self.def_vals = defaultdict(list, {address: list(v) for address, v in def_vals.items()})
 
     # lookup to bit reverse each byte
     self.bits_index = [(i & ~0b111) + ((-i - 1) & 0b111) for i in range(64)]
 
-    for l in self.txt:
-      l = l.strip()
-
-      if l.startswith("BO_ "):
-        # new group
-        dat = bo_regexp.match(l)
-
-        if dat is None:
-          print("bad BO {0}".format(l))
-
-        name = dat.group(2)
-        size = int(dat.group(3))
-        ids = int(dat.group(1), 0)  # could be hex
-        if ids in self.msgs:
-          sys.exit("Duplicate address detected %d %s" % (ids, self.name))
-
-        self.msgs[ids] = ((name, size), [])
-
-      if l.startswith("SG_ "):
-        # new signal
-        dat = sg_regexp.match(l)
-        go = 0
-        if dat is None:
-          dat = sgm_regexp.match(l)
-          go = 1
-
-        if dat is None:
-          print("bad SG {0}".format(l))
-
-        sgname = dat.group(1)
-        start_bit = int(dat.group(go + 2))
-        signal_size = int(dat.group(go + 3))
-        is_little_endian = int(dat.group(go + 4)) == 1
-        is_signed = dat.group(go + 5) == '-'
-        factor = int_or_float(dat.group(go + 6))
-        offset = int_or_float(dat.group(go + 7))
-        tmin = int_or_float(dat.group(go + 8))
-        tmax = int_or_float(dat.group(go + 9))
-        units = dat.group(go + 10)
-
-        self.msgs[ids][1].append(
-          DBCSignal(sgname, start_bit, signal_size, is_little_endian,
-                    is_signed, factor, offset, tmin, tmax, units))
-
-      if l.startswith("VAL_ "):
-        # new signal value/definition
-        dat = val_regexp.match(l)
-
-        if dat is None:
-          print("bad VAL {0}".format(l))
-
-        ids = int(dat.group(1), 0)  # could be hex
-        sgname = dat.group(2)
-        defvals = dat.group(3)
-
-        defvals = defvals.replace("?", r"\?")  # escape sequence in C++
-        defvals = defvals.split('"')[:-1]
-
-        # convert strings to UPPER_CASE_WITH_UNDERSCORES
-        defvals[1::2] = [d.strip().upper().replace(" ", "_") for d in defvals[1::2]]
-        defvals = '"' + "".join(str(i) for i in defvals) + '"'
-
-        self.def_vals[ids].append((sgname, defvals))
-
-    for msg in self.msgs.values():
-      msg[1].sort(key=lambda x: x.start_bit)
-
     self.msg_name_to_address = {}
     for address, m in self.msgs.items():
       name = m[0][0]
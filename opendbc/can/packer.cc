@@ -33,6 +33,14 @@ static uint64_t set_value(uint64_t ret, const Signal& sig, int64_t ival) {
   return ret;
 }
 
+static uint64_t set_scaled_value(uint64_t ret, const Signal& sig, double value) {
+  int64_t ival = (int64_t)(round((value - sig.offset) / sig.factor));
+  if (ival < 0) {
+    ival = (1ULL << sig.b2) + ival;
+  }
+  return set_value(ret, sig, ival);
+}
+
 CANPacker::CANPacker(const std::string& dbc_name) {
   dbc = dbc_lookup(dbc_name);
   assert(dbc);
@@ -58,16 +66,23 @@ uint64_t CANPacker::pack(uint32_t address, const std::vector<SignalPackValue> &s
       WARN("undefined signal %s - %d\n", sigval.name.c_str(), address);
       continue;
     }
-    const auto& sig = sig_it->second;
+    ret = set_scaled_value(ret, sig_it->second, value);
+  }
 
-    int64_t ival = (int64_t)(round((value - sig.offset) / sig.factor));
-    if (ival < 0) {
-      ival = (1ULL << sig.b2) + ival;
-    }
+  return set_counter_and_checksum(address, ret, counter);
+}
 
-    ret = set_value(ret, sig, ival);
+// same as above, with the signals already looked up by lookup_signal
+uint64_t CANPacker::pack(uint32_t address, const std::vector<const Signal*> &signals, const double *values, int counter) {
+  uint64_t ret = 0;
+  for (int i = 0; i < signals.size(); i++) {
+    ret = set_scaled_value(ret, *signals[i], values[i]);
   }
 
+  return set_counter_and_checksum(address, ret, counter);
+}
+
+uint64_t CANPacker::set_counter_and_checksum(uint32_t address, uint64_t ret, int counter) {
   if (counter >= 0){
     auto sig_it = signal_lookup.find(std::make_pair(address, "COUNTER"));
     if (sig_it == signal_lookup.end()) {
@@ -115,3 +130,8 @@ uint64_t CANPacker::pack(uint32_t address, const std::vector<SignalPackValue> &s
 Msg* CANPacker::lookup_message(uint32_t address) {
   return &message_lookup[address];
 }
+
+const Signal* CANPacker::lookup_signal(uint32_t address, const std::string &name) {
+  auto sig_it = signal_lookup.find(std::make_pair(address, name));
+  return sig_it != signal_lookup.end() ? &sig_it->second : NULL;
+}
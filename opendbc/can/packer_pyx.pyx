@@ -9,7 +9,19 @@ from libcpp cimport bool
 from posix.dlfcn cimport dlopen, dlsym, RTLD_LAZY
 
 from .common cimport CANPacker as cpp_CANPacker
-from .common cimport dbc_lookup, SignalPackValue, DBC
+from .common cimport dbc_lookup, SignalPackValue, Signal, DBC
+
+
+cdef class MessageTemplate:
+  """A message with its signal names resolved once, made by CANPacker.make_template."""
+  cdef:
+    object packer
+    uint32_t address
+    int size
+    vector[const Signal*] signals
+
+  cdef readonly:
+    tuple signal_names
 
 
 cdef class CANPacker:
@@ -18,6 +30,7 @@ cdef class CANPacker:
     const DBC *dbc
     map[string, (int, int)] name_to_address_and_size
     map[int, int] address_to_size
+    vector[double] values_buf
 
   def __init__(self, dbc_name):
     self.dbc = dbc_lookup(dbc_name)
@@ -63,3 +76,52 @@ cdef class CANPacker:
     cdef uint64_t val = self.pack(addr, values, counter)
     val = self.ReverseBytes(val)
     return [addr, 0, (<char *>&val)[:size], bus]
+
+  def make_template(self, name_or_addr, signal_names):
+    """Resolves a message and the names of the signals to set, for make_can_msgs."""
+    cdef MessageTemplate tmpl = MessageTemplate()
+    cdef const Signal *sig
+    if type(name_or_addr) == int:
+      tmpl.address = name_or_addr
+      tmpl.size = self.address_to_size[name_or_addr]
+    else:
+      tmpl.address, tmpl.size = self.name_to_address_and_size[name_or_addr.encode('utf8')]
+
+    for name in signal_names:
+      sig = self.packer.lookup_signal(tmpl.address, name.encode('utf8'))
+      if sig == NULL:
+        raise RuntimeError(f"undefined signal {name} - {name_or_addr}")
+      tmpl.signals.push_back(sig)
+
+    tmpl.packer = self
+    tmpl.signal_names = tuple(signal_names)
+    return tmpl
+
+  def make_can_msgs(self, msgs, list out=None):
+    """Packs all messages of a control cycle at once.
+
+       msgs is a sequence of (template, bus, values, counter) with values in the
+       order of the template's signal names and counter -1 when not set. Returns
+       a list of can messages, like make_can_msg does for one. If out is given,
+       e.g. the can_sends of a carcontroller, the messages are appended to it
+       and it is returned instead of a new list.
+    """
+    cdef MessageTemplate tmpl
+    cdef uint64_t val
+    cdef size_t i
+
+    ret = [] if out is None else out
+    for tmpl, bus, values, counter in msgs:
+      if tmpl.packer is not self:
+        raise ValueError("template was made by another CANPacker")
+      if len(values) != tmpl.signals.size():
+        raise ValueError(f"expected {tmpl.signals.size()} values for 0x{tmpl.address:X}, got {len(values)}")
+
+      self.values_buf.resize(tmpl.signals.size())
+      for i in range(tmpl.signals.size()):
+        self.values_buf[i] = values[i]
+
+      val = self.packer.pack(tmpl.address, tmpl.signals, self.values_buf.data(), counter)
+      val = self.ReverseBytes(val)
+      ret.append([tmpl.address, 0, (<char *>&val)[:tmpl.size], bus])
+    return ret
@@ -87,6 +87,13 @@ bool MessageState::parse(uint64_t sec, uint16_t ts_, uint8_t * dat) {
   ts = ts_;
   seen = sec;
 
+  if (record_history) {
+    history_ts.push_back(sec);
+    for (int i = 0; i < vals.size(); i++) {
+      history_vals[i].push_back(vals[i]);
+    }
+  }
+
   return true;
 }
 
@@ -166,6 +173,8 @@ CANParser::CANParser(int abus, const std::string& dbc_name,
       }
     }
   }
+
+  assign_slots();
 }
 
 CANParser::CANParser(int abus, const std::string& dbc_name, bool ignore_checksum, bool ignore_counter)
@@ -193,6 +202,17 @@ CANParser::CANParser(int abus, const std::string& dbc_name, bool ignore_checksum
 
     message_states[state.address] = state;
   }
+
+  assign_slots();
+}
+
+void CANParser::assign_slots() {
+  // number every parsed signal, so values can be kept in a flat array
+  num_slots = 0;
+  for (auto& kv : message_states) {
+    kv.second.slot = num_slots;
+    num_slots += kv.second.parse_sigs.size();
+  }
 }
 
 #ifndef DYNAMIC_CAPNP
@@ -216,6 +236,24 @@ void CANParser::update_string(const std::string &data, bool sendcan) {
   UpdateValid(last_sec);
 }
 
+std::vector<SignalHistory> CANParser::update_strings(const std::vector<std::string> &data, bool sendcan) {
+  set_record_history(true);
+  try {
+    for (const auto &d : data) {
+      update_string(d, sendcan);
+    }
+  } catch (...) {
+    // don't leave a partial batch behind for the next one
+    clear_history();
+    set_record_history(false);
+    throw;
+  }
+
+  std::vector<SignalHistory> history = query_history();
+  set_record_history(false);
+  return history;
+}
+
 void CANParser::UpdateCans(uint64_t sec, const capnp::List<cereal::CanData>::Reader& cans) {
   int msg_count = cans.size();
 
@@ -294,8 +332,66 @@ std::vector<SignalValue> CANParser::query_latest() {
         .ts = state.ts,
         .name = sig.name,
         .value = state.vals[i],
+        .slot = state.slot + i,
+      });
+    }
+  }
+
+  return ret;
+}
+
+std::vector<SignalValue> CANParser::query_all() {
+  std::vector<SignalValue> ret;
+
+  for (const auto& kv : message_states) {
+    const auto& state = kv.second;
+    for (int i=0; i<state.parse_sigs.size(); i++) {
+      ret.push_back((SignalValue){
+        .address = state.address,
+        .ts = state.ts,
+        .name = state.parse_sigs[i].name,
+        .value = state.vals[i],
+        .slot = state.slot + i,
+      });
+    }
+  }
+
+  return ret;
+}
+
+void CANParser::set_record_history(bool enabled) {
+  for (auto& kv : message_states) {
+    auto& state = kv.second;
+    state.record_history = enabled;
+    state.history_vals.resize(state.parse_sigs.size());
+  }
+}
+
+void CANParser::clear_history() {
+  for (auto& kv : message_states) {
+    auto& state = kv.second;
+    for (auto& vals : state.history_vals) {
+      vals.clear();
+    }
+    state.history_ts.clear();
+  }
+}
+
+std::vector<SignalHistory> CANParser::query_history() {
+  std::vector<SignalHistory> ret;
+
+  for (auto& kv : message_states) {
+    auto& state = kv.second;
+    for (int i = 0; i < state.parse_sigs.size(); i++) {
+      ret.push_back((SignalHistory){
+        .address = state.address,
+        .name = state.parse_sigs[i].name,
+        .ts = state.history_ts,
+        .values = std::move(state.history_vals[i]),
       });
+      state.history_vals[i].clear();
     }
+    state.history_ts.clear();
   }
 
   return ret;
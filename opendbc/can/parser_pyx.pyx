@@ -5,14 +5,16 @@ from libcpp.string cimport string
 from libcpp.vector cimport vector
 from libcpp.unordered_set cimport unordered_set
 from libc.stdint cimport uint32_t, uint64_t, uint16_t
+from libc.string cimport memcpy
 from libcpp.map cimport map
 from libcpp cimport bool
 
 from .common cimport CANParser as cpp_CANParser
-from .common cimport SignalParseOptions, MessageParseOptions, dbc_lookup, SignalValue, DBC
+from .common cimport SignalParseOptions, MessageParseOptions, dbc_lookup, SignalValue, SignalHistory, DBC
 
 import os
 import numbers
+import numpy as np
 from collections import defaultdict
 
 cdef int CAN_INVALID_CNT = 5
@@ -25,11 +27,17 @@ cdef class CANParser:
     map[uint32_t, string] address_to_msg_name
     vector[SignalValue] can_values
     bool test_mode_enabled
+    double[::1] _values
+    uint16_t[::1] _timestamps
+    list slot_dicts
+    dict slots
 
   cdef readonly:
     string dbc_name
     dict vl
     dict ts
+    object values
+    object timestamps
     bool can_valid
     int can_invalid_cnt
 
@@ -101,13 +109,28 @@ cdef class CANParser:
       message_options_v.push_back(mpo)
 
     self.can = new cpp_CANParser(bus, dbc_name, message_options_v, signal_options_v)
+
+    # flat arrays of every parsed signal, indexed by the handles from signal_handle
+    self.values = np.zeros(self.can.num_slots, dtype=np.float64)
+    self.timestamps = np.zeros(self.can.num_slots, dtype=np.uint16)
+    self._values = self.values
+    self._timestamps = self.timestamps
+    self.slots = {}
+    self.slot_dicts = [None] * self.can.num_slots
+    for cv in self.can.query_all():
+      name = <unicode>self.address_to_msg_name[cv.address].c_str()
+      cv_name = <unicode>cv.name
+      self.slots[(cv.address, cv_name)] = cv.slot
+      self.slot_dicts[cv.slot] = (cv_name, self.vl[cv.address], self.ts[cv.address], self.vl[name], self.ts[name])
+
     self.update_vl()
 
-  cdef unordered_set[uint32_t] update_vl(self):
+  cdef unordered_set[uint32_t] update_vl(self, bool all_values=False):
     cdef string sig_name
     cdef unordered_set[uint32_t] updated_val
 
-    can_values = self.can.query_latest()
+    # query_latest only has the messages of the last event, after a batch every message may have changed
+    can_values = self.can.query_all() if all_values else self.can.query_latest()
     valid = self.can.can_valid
 
     # Update invalid flag
@@ -117,20 +140,34 @@ cdef class CANParser:
     self.can_valid = self.can_invalid_cnt < CAN_INVALID_CNT
 
     for cv in can_values:
-      # Cast char * directly to unicode
-      name = <unicode>self.address_to_msg_name[cv.address].c_str()
-      cv_name = <unicode>cv.name
+      self._values[cv.slot] = cv.value
+      self._timestamps[cv.slot] = cv.ts
 
-      self.vl[cv.address][cv_name] = cv.value
-      self.ts[cv.address][cv_name] = cv.ts
-
-      self.vl[name][cv_name] = cv.value
-      self.ts[name][cv_name] = cv.ts
+      # names and dicts are looked up once in __init__, so no strings are made here
+      cv_name, vl_address, ts_address, vl_name, ts_name = self.slot_dicts[cv.slot]
+      vl_address[cv_name] = vl_name[cv_name] = cv.value
+      ts_address[cv_name] = ts_name[cv_name] = cv.ts
 
       updated_val.insert(cv.address)
 
     return updated_val
 
+  def signal_handle(self, msg, sig):
+    """Returns the index of a parsed signal in self.values and self.timestamps.
+
+       msg can be a message name or address. Resolve handles once, e.g. in
+       CarState.__init__, and read cp.values[handle] or cp.value(handle) in the
+       update loop instead of the string keyed cp.vl[msg][sig].
+    """
+    address = msg if isinstance(msg, numbers.Number) else self.msg_name_to_address[msg.encode('utf8')]
+    try:
+      return self.slots[(address, sig)]
+    except KeyError:
+      raise RuntimeError(f"Signal {sig} of {msg} isn't parsed by this CANParser") from None
+
+  cpdef double value(self, int handle):
+    return self._values[handle]
+
   def update_string(self, dat, sendcan=False):
     self.can.update_string(dat, sendcan)
     return self.update_vl()
@@ -144,6 +181,42 @@ cdef class CANParser:
 
     return updated_vals
 
+  def update_strings_batch(self, strings, sendcan=False):
+    """Parses many can or sendcan events at once, e.g. all of them from a log.
+
+       Returns (vl, ts) dicts keyed by address and message name like self.vl and
+       self.ts, but holding NumPy arrays with every parsed value of each signal
+       and the logMonoTime of the event it came from, in order. self.vl and
+       self.ts are left with the latest value of every signal, also of messages
+       missing from the last event. The events are all parsed in one C++ call,
+       so a batch that fails leaves no values behind.
+    """
+    cdef vector[SignalHistory] history
+    cdef double[::1] values
+    cdef uint64_t[::1] times
+    cdef size_t i, n
+
+    history = self.can.update_strings(strings, sendcan)
+    self.update_vl(True)
+
+    vl = defaultdict(dict)
+    ts = defaultdict(dict)
+    for i in range(history.size()):
+      n = history[i].values.size()
+      values = np.empty(n, dtype=np.float64)
+      times = np.empty(n, dtype=np.uint64)
+      if n:
+        memcpy(&values[0], history[i].values.data(), n * sizeof(double))
+        memcpy(&times[0], history[i].ts.data(), n * sizeof(uint64_t))
+
+      address = history[i].address
+      name = <unicode>self.address_to_msg_name[address].c_str()
+      sig_name = <unicode>history[i].name
+      vl[address][sig_name] = vl[name][sig_name] = values.base
+      ts[address][sig_name] = ts[name][sig_name] = times.base
+
+    return dict(vl), dict(ts)
+
 cdef class CANDefine():
   cdef:
     const DBC *dbc
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+import os
+import glob
+import tempfile
+import unittest
+from unittest import mock
+
+from opendbc.can import dbc as dbc_module
+from opendbc.can.dbc import dbc, parse_dbc
+
+DBC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "generator", "honda", "honda_civic_touring_2016_can.dbc")
+
+
+class TestDBC(unittest.TestCase):
+  def test_cached_load(self):
+    with tempfile.TemporaryDirectory() as cache_dir, mock.patch.object(dbc_module, "DBC_CACHE_DIR", cache_dir):
+      dbc_module._parsed_dbcs.clear()
+      first = dbc(DBC_PATH)
+      self.assertEqual(len(glob.glob(os.path.join(cache_dir, "*"))), 1)
+
+      # load from the cache file, then from the memo
+      dbc_module._parsed_dbcs.clear()
+      second = dbc(DBC_PATH)
+      third = dbc(DBC_PATH)
+
+    msgs, def_vals = parse_dbc(first.txt, first.name)
+    for d in (first, second, third):
+      self.assertEqual(d.msgs, msgs)
+      self.assertEqual(d.def_vals, def_vals)
+      self.assertEqual(d.msg_name_to_address["STEERING_CONTROL"], 228)
+
+    # every object gets its own lists
+    first.msgs[228][1].clear()
+    self.assertNotEqual(third.msgs[228][1], [])
+
+  def test_bad_cache_file(self):
+    with tempfile.TemporaryDirectory() as cache_dir, mock.patch.object(dbc_module, "DBC_CACHE_DIR", cache_dir):
+      dbc_module._parsed_dbcs.clear()
+      expected = dbc(DBC_PATH).msgs
+      cache_fn, = glob.glob(os.path.join(cache_dir, "*"))
+
+      for contents in (b"", b"not a pickle"):
+        with open(cache_fn, "wb") as f:
+          f.write(contents)
+        dbc_module._parsed_dbcs.clear()
+        self.assertEqual(dbc(DBC_PATH).msgs, expected)
+
+  def test_failed_cache_write(self):
+    with tempfile.TemporaryDirectory() as cache_dir, mock.patch.object(dbc_module, "DBC_CACHE_DIR", cache_dir), \
+         mock.patch.object(dbc_module.pickle, "dump", side_effect=OSError("No space left on device")):
+      dbc_module._parsed_dbcs.clear()
+      d = dbc(DBC_PATH)
+      self.assertEqual(os.listdir(cache_dir), [])
+    self.assertEqual(d.msg_name_to_address["STEERING_CONTROL"], 228)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -96,6 +96,115 @@ class TestCanParserPacker(unittest.TestCase):
 
         idx += 1
 
+  def test_signal_handles(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+
+    signals = [
+      ("STEER_TORQUE", "STEERING_CONTROL", 0),
+      ("STEER_TORQUE_REQUEST", "STEERING_CONTROL", 0),
+    ]
+    checks = [("STEERING_CONTROL", 50)]
+
+    parser = CANParser(dbc_file, signals, checks, 0)
+    packer = CANPacker(dbc_file)
+
+    torque = parser.signal_handle("STEERING_CONTROL", "STEER_TORQUE")
+    self.assertEqual(torque, parser.signal_handle(0xe4, "STEER_TORQUE"))
+    counter = parser.signal_handle("STEERING_CONTROL", "COUNTER")
+    with self.assertRaises(RuntimeError):
+      parser.signal_handle("STEERING_CONTROL", "STEER_TORQUE_MOTOR")
+
+    for idx, steer in enumerate(range(-256, 255)):
+      msgs = packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": steer, "STEER_TORQUE_REQUEST": 1}, idx)
+      parser.update_string(can_list_to_can_capnp([msgs]))
+
+      self.assertEqual(parser.value(torque), steer)
+      self.assertEqual(parser.values[torque], parser.vl["STEERING_CONTROL"]["STEER_TORQUE"])
+      self.assertEqual(parser.value(counter), idx % 4)
+
+  def test_packer_templates(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    packer = CANPacker(dbc_file)
+
+    steering = packer.make_template("STEERING_CONTROL", ["STEER_TORQUE", "STEER_TORQUE_REQUEST"])
+    with self.assertRaises(RuntimeError):
+      packer.make_template("STEERING_CONTROL", ["STEER_TORQUE", "NOT_A_SIGNAL"])
+
+    for idx, steer in enumerate(range(-256, 255)):
+      msgs = packer.make_can_msgs([(steering, 0, (steer, 1), idx), (steering, 2, [steer, 0], -1)])
+      self.assertEqual(msgs[0], packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": steer, "STEER_TORQUE_REQUEST": 1}, idx))
+      self.assertEqual(msgs[1], packer.make_can_msg("STEERING_CONTROL", 2, {"STEER_TORQUE": steer, "STEER_TORQUE_REQUEST": 0}))
+
+    with self.assertRaises(ValueError):
+      packer.make_can_msgs([(steering, 0, (1,), -1)])
+
+  def test_batch(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+
+    signals = [
+      ("STEER_TORQUE", "STEERING_CONTROL", 0),
+      ("STEER_TORQUE_REQUEST", "STEERING_CONTROL", 0),
+    ]
+    checks = [("STEERING_CONTROL", 50)]
+
+    parser = CANParser(dbc_file, signals, checks, 0)
+    packer = CANPacker(dbc_file)
+
+    # two frames per event, both of them should be returned
+    strings = []
+    steers = list(range(-256, 255))
+    for idx in range(0, len(steers) - 1, 2):
+      msgs = [packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": steers[idx + i], "STEER_TORQUE_REQUEST": 1}, idx + i)
+              for i in range(2)]
+      strings.append(can_list_to_can_capnp(msgs))
+
+    vl, ts = parser.update_strings_batch(strings)
+
+    n = len(strings) * 2
+    self.assertEqual(vl["STEERING_CONTROL"]["STEER_TORQUE"].tolist(), steers[:n])
+    self.assertEqual(vl["STEERING_CONTROL"]["STEER_TORQUE_REQUEST"].tolist(), [1] * n)
+    self.assertEqual(vl["STEERING_CONTROL"]["COUNTER"].tolist(), [i % 4 for i in range(n)])
+    self.assertIs(vl[0xe4]["STEER_TORQUE"], vl["STEERING_CONTROL"]["STEER_TORQUE"])
+    self.assertEqual(len(ts["STEERING_CONTROL"]["STEER_TORQUE"]), n)
+    self.assertTrue(all(ts["STEERING_CONTROL"]["STEER_TORQUE"][1:] >= ts["STEERING_CONTROL"]["STEER_TORQUE"][:-1]))
+    self.assertAlmostEqual(parser.vl["STEERING_CONTROL"]["STEER_TORQUE"], steers[n - 1])
+
+    # the next batch only has new values
+    vl, _ = parser.update_strings_batch(strings[:1])
+    self.assertEqual(vl["STEERING_CONTROL"]["STEER_TORQUE"].tolist(), steers[:2])
+
+    # a batch that fails leaves nothing behind for the next one, the truncated event fails to parse in C++
+    with self.assertRaises(RuntimeError):
+      parser.update_strings_batch(strings[1:3] + [strings[3][:16]])
+    vl, _ = parser.update_strings_batch(strings[:1])
+    self.assertEqual(vl["STEERING_CONTROL"]["STEER_TORQUE"].tolist(), steers[:2])
+    self.assertEqual(vl["STEERING_CONTROL"]["COUNTER"].tolist(), [0, 1])
+
+  def test_batch_latest_values(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+
+    signals = [
+      ("STEER_TORQUE", "STEERING_CONTROL", 0),
+      ("STEER_ANGLE", "STEERING_SENSORS", 0),
+    ]
+    checks = [("STEERING_CONTROL", 50), ("STEERING_SENSORS", 100)]
+
+    parser = CANParser(dbc_file, signals, checks, 0)
+    packer = CANPacker(dbc_file)
+
+    # STEERING_SENSORS is only in the first event of the batch
+    strings = [
+      can_list_to_can_capnp([packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": 10}, 0),
+                             packer.make_can_msg("STEERING_SENSORS", 0, {"STEER_ANGLE": 12.5}, 0)]),
+      can_list_to_can_capnp([packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": 20}, 1)]),
+    ]
+    vl, _ = parser.update_strings_batch(strings)
+
+    self.assertEqual(vl["STEERING_SENSORS"]["STEER_ANGLE"].tolist(), [12.5])
+    self.assertAlmostEqual(parser.vl["STEERING_SENSORS"]["STEER_ANGLE"], 12.5)
+    self.assertAlmostEqual(parser.vl["STEERING_CONTROL"]["STEER_TORQUE"], 20)
+    self.assertEqual(parser.values[parser.signal_handle("STEERING_SENSORS", "STEER_ANGLE")], 12.5)
+
 
 if __name__ == "__main__":
   unittest.main()
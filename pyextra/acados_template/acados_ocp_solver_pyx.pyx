@@ -192,9 +192,35 @@ cdef class AcadosOcpSolverFast:
         """
         Get the information of the last solver call.
 
-            :param field: string in ['statistics', 'time_tot', 'time_lin', 'time_sim', 'time_sim_ad', 'time_sim_la', 'time_qp', 'time_qp_solver_call', 'time_reg', 'sqp_iter']
+            :param field: string in ['statistics', 'time_tot', 'time_lin', 'time_sim', 'time_sim_ad', 'time_sim_la', 'time_qp', 'time_qp_solver_call', 'time_reg', 'sqp_iter', 'stat_m', 'stat_n']
+
+            .. note:: statistics is a table with one column per iteration, for SQP_RTI the rows are iter, qp_stat and qp_iter
         """
-        raise NotImplementedError()
+        double_fields = ['time_tot', 'time_lin', 'time_sim', 'time_sim_ad', 'time_sim_la', 'time_qp',
+                         'time_qp_solver_call', 'time_qp_xcond', 'time_glob', 'time_reg']
+        int_fields = ['sqp_iter', 'stat_m', 'stat_n']
+        field = field_.encode('utf-8')
+
+        cdef double double_value
+        cdef int int_value
+        cdef cnp.ndarray[cnp.float64_t, ndim=2] out
+
+        if field_ in double_fields:
+            acados_solver_common.ocp_nlp_get(self.nlp_config, self.nlp_solver, field, <void *> &double_value)
+            return double_value
+        elif field_ in int_fields:
+            acados_solver_common.ocp_nlp_get(self.nlp_config, self.nlp_solver, field, <void *> &int_value)
+            return int_value
+        elif field_ == 'statistics':
+            sqp_iter = self.get_stats('sqp_iter')
+            stat_m = self.get_stats('stat_m')
+            stat_n = self.get_stats('stat_n')
+            out = np.zeros((stat_n + 1, min(stat_m, sqp_iter + 1)))
+            acados_solver_common.ocp_nlp_get(self.nlp_config, self.nlp_solver, field, <void *> out.data)
+            return out
+        else:
+            raise Exception('AcadosOcpSolver.get_stats(): {} is not a valid argument.\
+                    \n Possible values are {}. Exiting.'.format(field_, double_fields + int_fields + ['statistics']))
 
 
     def get_cost(self):
@@ -278,6 +304,78 @@ cdef class AcadosOcpSolverFast:
                     self.nlp_dims, self.nlp_out, stage, field, <void *> &value[0])
 
 
+    def set_all(self, str field_, value_):
+        """
+        Set numerical data at all shooting nodes in one call.
+
+            :param field: string in ['x', 'u', 'pi', 'p', 'yref']
+            :param value: array with one row per stage, (N, dim) for 'u' and 'pi', (N+1, dim) otherwise
+
+            .. note:: for 'yref' only the first entries of a row are used at stages with a smaller
+                      dimension, e.g. the terminal stage
+        """
+        out_fields = ['x', 'u', 'pi']
+        if field_ not in out_fields + ['p', 'yref']:
+            raise Exception('AcadosOcpSolver.set_all(): {} is not a valid argument.\
+                \nPossible values are {}. Exiting.'.format(field_, out_fields + ['p', 'yref']))
+
+        field = field_.encode('utf-8')
+        cdef double[:, ::1] value = np.ascontiguousarray(value_, dtype=np.double)
+        cdef int stages = self.N if field_ in ['u', 'pi'] else self.N + 1
+        cdef int stage, dims
+        cdef int cost_dims[2]
+
+        if value.shape[0] != stages:
+            raise Exception('AcadosOcpSolver.set_all(): field "{}" needs {} rows, got {}.'.format(field_, stages, value.shape[0]))
+
+        for stage in range(stages):
+            if field_ == 'p':
+                assert acados_solver.acados_update_params(self.capsule, stage, <double *> &value[stage, 0], value.shape[1]) == 0
+            elif field_ == 'yref':
+                acados_solver_common.ocp_nlp_cost_dims_get_from_attr(self.nlp_config, \
+                    self.nlp_dims, self.nlp_out, stage, field, &cost_dims[0])
+                if cost_dims[0] > value.shape[1]:
+                    raise Exception('AcadosOcpSolver.set_all(): field "yref" has dimension {} at stage {}, got {}.'\
+                        .format(cost_dims[0], stage, value.shape[1]))
+                acados_solver_common.ocp_nlp_cost_model_set(self.nlp_config, \
+                    self.nlp_dims, self.nlp_in, stage, field, <void *> &value[stage, 0])
+            else:
+                dims = acados_solver_common.ocp_nlp_dims_get_from_attr(self.nlp_config,
+                    self.nlp_dims, self.nlp_out, stage, field)
+                if dims != value.shape[1]:
+                    raise Exception('AcadosOcpSolver.set_all(): mismatching dimension for field "{}" '\
+                        'with dimension {} (you have {})'.format(field_, dims, value.shape[1]))
+                acados_solver_common.ocp_nlp_out_set(self.nlp_config, \
+                    self.nlp_dims, self.nlp_out, stage, field, <void *> &value[stage, 0])
+
+
+    def get_all(self, str field_):
+        """
+        Get the last solution of the solver at all shooting nodes in one call.
+
+            :param field: string in ['x', 'u', 'pi']
+
+            :returns: array with one row per stage, (N, dim) for 'u' and 'pi', (N+1, dim) for 'x'
+        """
+        out_fields = ['x', 'u', 'pi']
+        if field_ not in out_fields:
+            raise Exception('AcadosOcpSolver.get_all(): {} is an invalid argument.\
+                    \n Possible values are {}. Exiting.'.format(field_, out_fields))
+
+        field = field_.encode('utf-8')
+        cdef int stages = self.N if field_ in ['u', 'pi'] else self.N + 1
+        cdef int dims = acados_solver_common.ocp_nlp_dims_get_from_attr(self.nlp_config,
+            self.nlp_dims, self.nlp_out, 0, field)
+        cdef cnp.ndarray[cnp.float64_t, ndim=2] out = np.zeros((stages, dims))
+        cdef int stage
+
+        for stage in range(stages):
+            acados_solver_common.ocp_nlp_out_get(self.nlp_config, \
+                self.nlp_dims, self.nlp_out, stage, field, <void *> &out[stage, 0])
+
+        return out
+
+
     def cost_set(self, int stage, str field_, value_):
         """
         Set numerical data in the cost module of the solver.
@@ -1,6 +1,5 @@
 import os
 import logging
-from bisect import bisect_right
 
 import numpy as np
 import sympy as sp
@@ -151,6 +150,13 @@ def gen_code(folder, name, f_sym, dt_sym, x_sym, obs_eqs, dim_x, dim_err, eskf_p
     post_code += f"  update<{h_sym.shape[0]}, 3, {int(maha_test)}>(in_x, in_P, h_{kind}, H_{kind}, {He_str}, in_z, in_R, in_ea, MAHA_THRESH_{kind});\n"
     post_code += "}\n"
 
+    # feature kinds change the size of y, so they are only updated one at a time
+    if He_str == 'NULL':
+      header += f"void {name}_update_batch_{kind}(double *in_x, double *in_P, double *in_z, double *in_R, double *in_ea, int n, int ea_dim, int joint, int *quat_idxs, int n_quat);\n"
+      post_code += f"void {name}_update_batch_{kind}(double *in_x, double *in_P, double *in_z, double *in_R, double *in_ea, int n, int ea_dim, int joint, int *quat_idxs, int n_quat) {{\n"
+      post_code += f"  update_batch<{h_sym.shape[0]}, 3, {int(maha_test)}>(in_x, in_P, h_{kind}, H_{kind}, in_z, in_R, in_ea, n, ea_dim, joint, quat_idxs, n_quat, MAHA_THRESH_{kind});\n"
+      post_code += "}\n"
+
   # For ffi loading of specific functions
   for line in sympy_header.split("\n"):
     if line.startswith("void "):  # sympy functions
@@ -214,10 +220,83 @@ def gen_code(folder, name, f_sym, dt_sym, x_sym, obs_eqs, dim_x, dim_err, eskf_p
   open(os.path.join(folder, f"{name}.cpp"), 'w').write(code)
 
 
+# number of past states kept for rewinding
+REWIND_TO_KEEP = 512
+
+
+class RewindHistory():
+  """Ring buffer of the filter states and observations after each update, oldest first.
+
+     States and covariances are copied into preallocated arrays, so checkpoints
+     don't allocate and old entries are overwritten instead of sliced away.
+  """
+  def __init__(self, dim_x, dim_err, size=REWIND_TO_KEEP):
+    self.size = size
+    self.t = np.zeros(size)
+    self.x = np.zeros((size, dim_x, 1))
+    self.P = np.zeros((size, dim_err, dim_err))
+    self.obs = [None] * size
+    self.start = 0
+    self.count = 0
+
+  def __len__(self):
+    return self.count
+
+  def clear(self):
+    self.start = 0
+    self.count = 0
+    self.obs = [None] * self.size
+
+  def _idx(self, i):
+    return (self.start + i) % self.size
+
+  def time(self, i):
+    return self.t[self._idx(i)]
+
+  def push(self, t, x, P, obs):
+    if self.count == self.size:
+      self.start = self._idx(1)
+    else:
+      self.count += 1
+    i = self._idx(self.count - 1)
+    self.t[i] = t
+    self.x[i] = x
+    self.P[i] = P
+    self.obs[i] = obs
+
+  def get(self, i):
+    i = self._idx(i)
+    return float(self.t[i]), self.x[i], self.P[i]
+
+  def bisect_right(self, t):
+    # index of the first entry later than t
+    lo, hi = 0, self.count
+    while lo < hi:
+      mid = (lo + hi) // 2
+      if t < self.time(mid):
+        hi = mid
+      else:
+        lo = mid + 1
+    return lo
+
+  def obs_from(self, i):
+    return [self.obs[self._idx(j)] for j in range(i, self.count)]
+
+  def truncate(self, n):
+    for j in range(n, self.count):
+      self.obs[self._idx(j)] = None
+    self.count = n
+
+
 class EKF_sym():
   def __init__(self, folder, name, Q, x_initial, P_initial, dim_main, dim_main_err,  # pylint: disable=dangerous-default-value
-               N=0, dim_augment=0, dim_augment_err=0, maha_test_kinds=[], quaternion_idxs=[], global_vars=None, max_rewind_age=1.0, logger=logging):
-    """Generates process function and all observation functions for the kalman filter."""
+               N=0, dim_augment=0, dim_augment_err=0, maha_test_kinds=[], quaternion_idxs=[], global_vars=None, max_rewind_age=1.0, logger=logging,
+               joint_update_kinds=[]):
+    """Generates process function and all observation functions for the kalman filter.
+
+       Observations of the kinds in joint_update_kinds are applied in a single
+       stacked update per batch, all others one after the other.
+    """
     self.msckf = N > 0
     self.N = N
     self.dim_augment = dim_augment
@@ -242,14 +321,15 @@ class EKF_sym():
     # quaternions need normalization
     self.quaternion_idxs = quaternion_idxs
 
+    # kinds whose batches are applied as one stacked observation
+    self.joint_update_kinds = joint_update_kinds
+
     # process noise
     self.Q = Q
 
     # rewind stuff
     self.max_rewind_age = max_rewind_age
-    self.rewind_t = []
-    self.rewind_states = []
-    self.rewind_obscache = []
+    self.rewind_history = RewindHistory(self.dim_x, self.dim_err)
     self.init_state(x_initial, P_initial, None)
 
     ffi, lib = load_code(folder, name, "kf")
@@ -339,6 +419,36 @@ class EKF_sym():
     def _update_blas(x, P, kind, z, R, extra_args=[]):  # pylint: disable=dangerous-default-value
         return self._updates[kind](x, P, z, R, extra_args)
 
+    # wrap the C++ batch update function, that takes all observations of a batch in one call
+    def batch_fun_wrapper(f, kind):
+      f = eval(f"lib.{name}_{f}", {"lib": lib})  # pylint: disable=eval-used
+      joint = kind in self.joint_update_kinds
+      quat_idxs = np.array(self.quaternion_idxs, dtype=np.int32)
+
+      def _update_batch_blas(x, P, z, R, extra_args):
+        # these are from the user, so we canonicalize them. y is written into z
+        z = np.array(z, dtype=np.float64, order='C')
+        R = np.ascontiguousarray(R, dtype=np.float64)
+        extra_args = np.ascontiguousarray(extra_args, dtype=np.float64)
+        extra_args = extra_args.reshape((len(z), -1)) if extra_args.size else np.zeros((len(z), 0))
+        f(ffi.cast("double *", x.ctypes.data),
+          ffi.cast("double *", P.ctypes.data),
+          ffi.cast("double *", z.ctypes.data),
+          ffi.cast("double *", R.ctypes.data),
+          ffi.cast("double *", extra_args.ctypes.data),
+          ffi.cast("int", len(z)),
+          ffi.cast("int", extra_args.shape[1]),
+          ffi.cast("int", joint),
+          ffi.cast("int *", quat_idxs.ctypes.data),
+          ffi.cast("int", len(quat_idxs)))
+        return x, P, list(z)
+      return _update_batch_blas
+
+    self._update_batches = {}
+    for kind in kinds:
+      if hasattr(lib, f"{name}_update_batch_{kind}"):
+        self._update_batches[kind] = batch_fun_wrapper(f"update_batch_{kind}", kind)
+
     # assign the functions
     self._predict = _predict_blas
     # self._predict = self._predict_python
@@ -350,14 +460,10 @@ class EKF_sym():
     self.P = np.array(covs).astype(np.float64)
     self.filter_time = filter_time
     self.augment_times = [0] * self.N
-    self.rewind_obscache = []
-    self.rewind_t = []
-    self.rewind_states = []
+    self.rewind_history.clear()
 
   def reset_rewind(self):
-    self.rewind_obscache = []
-    self.rewind_t = []
-    self.rewind_states = []
+    self.rewind_history.clear()
 
   def augment(self):
     # TODO this is not a generalized way of doing this and implies that the augmented states
@@ -414,37 +520,27 @@ class EKF_sym():
 
   def rewind(self, t):
     # find where we are rewinding to
-    idx = bisect_right(self.rewind_t, t)
-    assert self.rewind_t[idx - 1] <= t
-    assert self.rewind_t[idx] > t    # must be true, or rewind wouldn't be called
+    history = self.rewind_history
+    idx = history.bisect_right(t)
+    assert history.time(idx - 1) <= t
+    assert history.time(idx) > t    # must be true, or rewind wouldn't be called
 
     # set the state to the time right before that
-    self.filter_time = self.rewind_t[idx - 1]
-    self.x[:] = self.rewind_states[idx - 1][0]
-    self.P[:] = self.rewind_states[idx - 1][1]
+    self.filter_time, x, P = history.get(idx - 1)
+    self.x[:] = x
+    self.P[:] = P
 
     # return the observations we rewound over for fast forwarding
-    ret = self.rewind_obscache[idx:]
+    ret = history.obs_from(idx)
 
     # throw away the old future
-    # TODO: is this making a copy?
-    self.rewind_t = self.rewind_t[:idx]
-    self.rewind_states = self.rewind_states[:idx]
-    self.rewind_obscache = self.rewind_obscache[:idx]
+    history.truncate(idx)
 
     return ret
 
   def checkpoint(self, obs):
-    # push to rewinder
-    self.rewind_t.append(self.filter_time)
-    self.rewind_states.append((np.copy(self.x), np.copy(self.P)))
-    self.rewind_obscache.append(obs)
-
-    # only keep a certain number around
-    REWIND_TO_KEEP = 512
-    self.rewind_t = self.rewind_t[-REWIND_TO_KEEP:]
-    self.rewind_states = self.rewind_states[-REWIND_TO_KEEP:]
-    self.rewind_obscache = self.rewind_obscache[-REWIND_TO_KEEP:]
+    # push to rewinder, the oldest entry is overwritten once it's full
+    self.rewind_history.push(self.filter_time, self.x, self.P, obs)
 
   def predict(self, t):
     # initialize time
@@ -463,7 +559,8 @@ class EKF_sym():
 
     # rewind
     if self.filter_time is not None and t < self.filter_time:
-      if len(self.rewind_t) == 0 or t < self.rewind_t[0] or t < self.rewind_t[-1] - self.max_rewind_age:
+      history = self.rewind_history
+      if len(history) == 0 or t < history.time(0) or t < history.time(len(history) - 1) - self.max_rewind_age:
         self.logger.error("observation too old at %.3f with filter at %.3f, ignoring" % (t, self.filter_time))
         return None
       rewound = self.rewind(t)
@@ -507,16 +604,20 @@ class EKF_sym():
     xk_km1, Pk_km1 = np.copy(self.x).flatten(), np.copy(self.P)
 
     # update batch
-    y = []
-    for i in range(len(z)):
-      # these are from the user, so we canonicalize them
-      z_i = np.array(z[i], dtype=np.float64, order='F')
-      R_i = np.array(R[i], dtype=np.float64, order='F')
-      extra_args_i = np.array(extra_args[i], dtype=np.float64, order='F')
-      # update
-      self.x, self.P, y_i = self._update(self.x, self.P, kind, z_i, R_i, extra_args=extra_args_i)
-      self.normalize_quaternions()
-      y.append(y_i)
+    if kind in self._update_batches and len(z) > 0:
+      # all observations in one call, quaternions are normalized after every update in C++
+      self.x, self.P, y = self._update_batches[kind](self.x, self.P, z, R, extra_args)
+    else:
+      y = []
+      for i in range(len(z)):
+        # these are from the user, so we canonicalize them
+        z_i = np.array(z[i], dtype=np.float64, order='F')
+        R_i = np.array(R[i], dtype=np.float64, order='F')
+        extra_args_i = np.array(extra_args[i], dtype=np.float64, order='F')
+        # update
+        self.x, self.P, y_i = self._update(self.x, self.P, kind, z_i, R_i, extra_args=extra_args_i)
+        self.normalize_quaternions()
+        y.append(y_i)
     xk_k, Pk_k = np.copy(self.x).flatten(), np.copy(self.P)
 
     if augment:
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from bisect import bisect_right
+
+import numpy as np
+import sympy as sp
+
+from rednose.helpers.ekf_sym import EKF_sym, RewindHistory, REWIND_TO_KEEP, gen_code
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+NAME = "batch_test"
+
+# observation kinds of the test filter, only POS_VEL is mahalanobis tested
+POS_VEL = 1
+POS_BIAS = 2
+H = {
+  POS_VEL: np.array([[1., 0., 0.], [0., 1., 0.]]),
+  POS_BIAS: np.array([[1., 0., 1.]]),
+}
+R = {
+  POS_VEL: np.diag([0.1**2, 0.1**2]),
+  POS_BIAS: np.diag([0.1**2]),
+}
+
+TRUE_V, TRUE_B = 1.0, 0.5
+
+QUAT_NAME = "quat_batch_test"
+QUAT = 3
+TRUE_Q = np.array([0.5, 0.5, 0.5, 0.5])
+
+
+def _compiler():
+  return os.environ.get("CXX", "clang++" if shutil.which("clang++") else "g++")
+
+
+def missing_toolchain():
+  """Returns why generated filters can't be compiled here, or None if they can."""
+  cxx = _compiler()
+  if shutil.which(cxx) is None:
+    return f"{cxx} isn't installed"
+  eigen = subprocess.run([cxx, "-std=c++1z", "-fsyntax-only", "-x", "c++", "-"], input=b"#include <eigen3/Eigen/Dense>\n",
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+  if eigen.returncode != 0:
+    return "Eigen isn't installed"
+  return None
+
+
+def compile_filter(folder, name):
+  cxx = _compiler()
+  subprocess.check_call([cxx, "-std=c++1z", "-O2", "-shared", "-fPIC", f"-I{ROOT}", f"-I{folder}",
+                         os.path.join(folder, f"{name}.cpp"), os.path.join(ROOT, "rednose", "helpers", "common_ekf.cc"),
+                         "-o", os.path.join(folder, "libkf.so")])
+
+
+def build_filter(folder):
+  """Generates and compiles a linear filter with position, velocity and bias states."""
+  state_sym = sp.MatrixSymbol('state', 3, 1)
+  state = sp.Matrix(state_sym)
+  p, v, b = state
+  dt = sp.Symbol('dt')
+  f_sym = state + dt * sp.Matrix([v, 0, 0])
+
+  obs_eqs = [
+    [sp.Matrix([p, v]), POS_VEL, None],
+    [sp.Matrix([p + b]), POS_BIAS, None],
+  ]
+  gen_code(folder, NAME, f_sym, dt, state_sym, obs_eqs, 3, 3, maha_test_kinds=[POS_VEL])
+  compile_filter(folder, NAME)
+
+
+def build_quat_filter(folder):
+  """Generates and compiles a filter with a slowly rotating quaternion state that is observed directly."""
+  state_sym = sp.MatrixSymbol('state', 4, 1)
+  state = sp.Matrix(state_sym)
+  dt = sp.Symbol('dt')
+  w = 0.01
+  omega = sp.Matrix([[0, -w, 0, 0], [w, 0, 0, 0], [0, 0, 0, -w], [0, 0, w, 0]])
+  f_sym = state + dt * omega * state
+
+  gen_code(folder, QUAT_NAME, f_sym, dt, state_sym, [[state, QUAT, None]], 4, 4, quaternion_idxs=[0])
+  compile_filter(folder, QUAT_NAME)
+
+
+def observations(rng, t, kind, n):
+  p = TRUE_V * t
+  truth = np.array([p, TRUE_V]) if kind == POS_VEL else np.array([p + TRUE_B])
+  z = truth + rng.normal(0, 0.01, size=(n, len(truth)))
+  return z, np.array([R[kind]] * n)
+
+
+class TestBatchUpdate(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    # only a missing toolchain skips, the generated code failing to compile is an error
+    reason = missing_toolchain()
+    if reason is not None:
+      raise unittest.SkipTest(reason)
+    cls.folder = tempfile.mkdtemp()
+    try:
+      build_filter(cls.folder)
+    except Exception:
+      shutil.rmtree(cls.folder)
+      raise
+
+  @classmethod
+  def tearDownClass(cls):
+    shutil.rmtree(cls.folder)
+
+  def _filter(self, joint=False, batched=True):
+    x = np.array([0., TRUE_V, TRUE_B])
+    P = np.diag([1., 1., 1.])
+    Q = np.diag([0.01, 0.01, 0.001])
+    ekf = EKF_sym(self.folder, NAME, Q, x, P, 3, 3, maha_test_kinds=[POS_VEL],
+                  joint_update_kinds=[POS_VEL, POS_BIAS] if joint else [])
+    if not batched:
+      # one update call per observation, like before batches went to C++
+      ekf._update_batches = {}
+    return ekf
+
+  def _update_single(self, ekf, t, kind, z, R):
+    y = []
+    for z_i, R_i in zip(z, R):
+      y += ekf.predict_and_update_batch(t, kind, z_i[None], R_i[None])[6]
+    return y
+
+  def _assert_same_state(self, ekf, ref):
+    np.testing.assert_allclose(ekf.state(), ref.state(), rtol=1e-6, atol=1e-9)
+    np.testing.assert_allclose(ekf.covs(), ref.covs(), rtol=1e-6, atol=1e-12)
+
+  def test_equivalence(self):
+    rng = np.random.RandomState(0)
+    single = self._filter(batched=False)
+    sequential = self._filter()
+    joint = self._filter(joint=True)
+
+    for step in range(20):
+      t = 0.05 * step
+      kind = POS_VEL if step % 2 == 0 else POS_BIAS
+      z, R = observations(rng, t, kind, 3)
+      z_in = z.copy()
+
+      y_single = self._update_single(single, t, kind, z, R)
+      y_sequential = sequential.predict_and_update_batch(t, kind, z, R)[6]
+      x_prior, _, _, _, _, _, y_joint, _, _ = joint.predict_and_update_batch(t, kind, z, R)
+
+      self._assert_same_state(sequential, single)
+      self._assert_same_state(joint, single)
+
+      # y of every observation is returned, the caller's z is left alone
+      np.testing.assert_allclose(np.array(y_sequential), np.array(y_single), atol=1e-9)
+      np.testing.assert_allclose(np.array(y_joint), z - x_prior.dot(H[kind].T), atol=1e-9)
+      np.testing.assert_array_equal(z, z_in)
+
+  def test_outlier_rejection(self):
+    rng = np.random.RandomState(1)
+    z, R = observations(rng, 0.1, POS_VEL, 3)
+    z_outlier = np.vstack([z[:1], [[100., -100.]], z[1:]])
+    R_outlier = np.vstack([R[:1], R])
+
+    single = self._filter(batched=False)
+    y_single = self._update_single(single, 0.1, POS_VEL, z_outlier, R_outlier)
+
+    for joint in (False, True):
+      clean = self._filter(joint=joint)
+      clean.predict_and_update_batch(0.1, POS_VEL, z, R)
+
+      # only the outlier is ignored, the other observations of its batch are still used
+      ekf = self._filter(joint=joint)
+      x_prior, _, _, _, _, _, y, _, _ = ekf.predict_and_update_batch(0.1, POS_VEL, z_outlier, R_outlier)
+      self._assert_same_state(ekf, clean)
+      self._assert_same_state(ekf, single)
+      self.assertLess(ekf.covs()[0, 0], 0.1)
+
+      # the outlier's y is still written back
+      if joint:
+        np.testing.assert_allclose(np.array(y), z_outlier - x_prior.dot(H[POS_VEL].T), atol=1e-9)
+      else:
+        np.testing.assert_allclose(np.array(y), np.array(y_single), atol=1e-9)
+
+
+class TestQuaternionBatchUpdate(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    # only a missing toolchain skips, the generated code failing to compile is an error
+    reason = missing_toolchain()
+    if reason is not None:
+      raise unittest.SkipTest(reason)
+    cls.folder = tempfile.mkdtemp()
+    try:
+      build_quat_filter(cls.folder)
+    except Exception:
+      shutil.rmtree(cls.folder)
+      raise
+
+  @classmethod
+  def tearDownClass(cls):
+    shutil.rmtree(cls.folder)
+
+  def _filter(self, joint=False, batched=True):
+    ekf = EKF_sym(self.folder, QUAT_NAME, np.eye(4) * 1e-4, np.array([1., 0., 0., 0.]), np.eye(4), 4, 4,
+                  quaternion_idxs=[0], joint_update_kinds=[QUAT] if joint else [])
+    if not batched:
+      ekf._update_batches = {}
+    return ekf
+
+  def test_normalized_per_update(self):
+    rng = np.random.RandomState(2)
+    single = self._filter(batched=False)
+    sequential = self._filter()
+    joint = self._filter(joint=True)
+
+    for step in range(10):
+      t = 0.05 * step
+      z = TRUE_Q + rng.normal(0, 0.2, size=(3, 4))
+      R = np.array([np.eye(4) * 0.2**2] * 3)
+      for ekf in (single, sequential, joint):
+        ekf.predict_and_update_batch(t, QUAT, z, R, extra_args=[[]] * len(z))
+
+      # the quaternion is normalized after every observation of a sequential batch, like one by one
+      np.testing.assert_allclose(sequential.state(), single.state(), rtol=1e-9, atol=1e-12)
+      np.testing.assert_allclose(sequential.covs(), single.covs(), rtol=1e-9, atol=1e-12)
+      for ekf in (sequential, joint):
+        self.assertAlmostEqual(np.linalg.norm(ekf.state()), 1., places=12)
+    np.testing.assert_allclose(joint.state(), TRUE_Q, atol=0.1)
+
+
+class ListHistory():
+  """The list based rewind history EKF_sym kept before RewindHistory."""
+  def __init__(self, size):
+    self.size = size
+    self.t, self.states, self.obs = [], [], []
+
+  def push(self, t, x, P, obs):
+    self.t.append(t)
+    self.states.append((np.copy(x), np.copy(P)))
+    self.obs.append(obs)
+    self.t = self.t[-self.size:]
+    self.states = self.states[-self.size:]
+    self.obs = self.obs[-self.size:]
+
+  def truncate(self, idx):
+    self.t = self.t[:idx]
+    self.states = self.states[:idx]
+    self.obs = self.obs[:idx]
+
+
+class TestRewindHistory(unittest.TestCase):
+  def _check(self, history, ref):
+    self.assertEqual(len(history), len(ref.t))
+    for i, (t, (x, P)) in enumerate(zip(ref.t, ref.states)):
+      self.assertEqual(history.time(i), t)
+      t_i, x_i, P_i = history.get(i)
+      self.assertEqual(t_i, t)
+      np.testing.assert_array_equal(x_i, x)
+      np.testing.assert_array_equal(P_i, P)
+    self.assertEqual(history.obs_from(0), ref.obs)
+
+  def _run(self, size, steps, seed, check_every=1):
+    rng = np.random.RandomState(seed)
+    history, ref = RewindHistory(2, 3, size=size), ListHistory(size)
+    t = 0.
+    wrapped = False
+    for step in range(steps):
+      # several updates can share a filter time
+      t += rng.choice([0., 0.5, 1.])
+      x, P = np.full((2, 1), step, dtype=float), np.full((3, 3), step, dtype=float)
+      obs = (t, step)
+      history.push(t, x, P, obs)
+      ref.push(t, x, P, obs)
+      wrapped |= step >= size and len(ref.t) == size
+      # the history keeps its own copies
+      x[:] = -1
+      P[:] = -1
+
+      rewind = rng.rand() < 0.05
+      if rewind:
+        # mostly a few updates back, sometimes to before the oldest entry
+        t_oldest = ref.t[0] - 1 if rng.rand() < 0.02 else ref.t[-1] - 2
+        t_rewind = rng.uniform(t_oldest, ref.t[-1] + 1)
+        idx = history.bisect_right(t_rewind)
+        self.assertEqual(idx, bisect_right(ref.t, t_rewind))
+        self.assertEqual(history.obs_from(idx), ref.obs[idx:])
+        history.truncate(idx)
+        ref.truncate(idx)
+        if len(ref.t):
+          t = ref.t[-1]
+      if rewind or step % check_every == 0:
+        self._check(history, ref)
+
+    self.assertTrue(wrapped)
+    self._check(history, ref)
+    for t_query in ref.t + [t - 1, t + 1]:
+      self.assertEqual(history.bisect_right(t_query), bisect_right(ref.t, t_query))
+
+  def test_wraparound(self):
+    self._run(8, 400, 0)
+
+  def test_past_rewind_to_keep(self):
+    self._run(REWIND_TO_KEEP, 4 * REWIND_TO_KEEP, 1, check_every=64)
+
+  def test_clear(self):
+    history = RewindHistory(2, 3, size=4)
+    for i in range(6):
+      history.push(float(i), np.zeros((2, 1)), np.zeros((3, 3)), i)
+    history.clear()
+    self.assertEqual(len(history), 0)
+    self.assertEqual(history.obs_from(0), [])
+    history.push(10., np.ones((2, 1)), np.ones((3, 3)), "obs")
+    self.assertEqual(history.get(0)[0], 10.)
+    self.assertEqual(history.obs_from(0), ["obs"])
+
+
+if __name__ == "__main__":
+  unittest.main()
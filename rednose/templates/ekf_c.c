@@ -121,3 +121,99 @@ void update(double *in_x, double *in_P, Hfun h_fun, Hfun H_fun, Hfun Hea_fun, do
 }
 
 
+
+// the quaternions starting at quat_idxs in x are normalized, like after every update in EKF_sym
+void normalize_quaternions(double *in_x, int *quat_idxs, int n_quat) {
+  for (int i = 0; i < n_quat; i++) {
+    Eigen::Map<Eigen::Matrix<double, 4, 1>> q(in_x + quat_idxs[i]);
+    q /= q.norm();
+  }
+}
+
+// updates with n observations of the same kind in one call, z, R and ea hold one row per observation.
+// sequential applies them one after the other like update, joint stacks them into a single update.
+// y of each observation is written back into z
+template <int ZDIM, int EADIM, bool MAHA_TEST>
+void update_batch(double *in_x, double *in_P, Hfun h_fun, Hfun H_fun, double *in_z, double *in_R, double *in_ea, int n, int ea_dim, bool joint,
+                  int *quat_idxs, int n_quat, double MAHA_THRESHOLD) {
+  if (!joint) {
+    for (int i = 0; i < n; i++) {
+      update<ZDIM, EADIM, MAHA_TEST>(in_x, in_P, h_fun, H_fun, NULL, in_z + i * ZDIM, in_R + i * ZDIM * ZDIM, in_ea + i * ea_dim, MAHA_THRESHOLD);
+      normalize_quaternions(in_x, quat_idxs, n_quat);
+    }
+    return;
+  }
+
+  typedef Eigen::Matrix<double, ZDIM, ZDIM, Eigen::RowMajor> ZZM;
+  typedef Eigen::Matrix<double, ZDIM, DIM, Eigen::RowMajor> ZDM;
+  typedef Eigen::Matrix<double, ZDIM, EDIM, Eigen::RowMajor> ZEM;
+  typedef Eigen::Matrix<double, Eigen::Dynamic, EDIM, Eigen::RowMajor> XEM;
+  typedef Eigen::Matrix<double, Eigen::Dynamic, 1> X1M;
+  typedef Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::RowMajor> XXM;
+
+  double in_hx[ZDIM] = {0};
+  double in_H[ZDIM * DIM] = {0};
+  double in_H_mod[EDIM * DIM] = {0};
+  double delta_x[EDIM] = {0};
+  double x_new[DIM] = {0};
+
+  EEM P(in_P);
+
+  // get modified H
+  H_mod_fun(in_x, in_H_mod);
+  DEM H_mod(in_H_mod);
+
+  // stack y, H and a block diagonal R of all observations
+  X1M y(n * ZDIM);
+  X1M y_out(n * ZDIM);
+  XEM H_err(n * ZDIM, EDIM);
+  XXM R = XXM::Zero(n * ZDIM, n * ZDIM);
+  for (int i = 0; i < n; i++) {
+    h_fun(in_x, in_ea + i * ea_dim, in_hx);
+    H_fun(in_x, in_ea + i * ea_dim, in_H);
+
+    Eigen::Matrix<double, ZDIM, 1> z(in_z + i * ZDIM);
+    Eigen::Matrix<double, ZDIM, 1> hx(in_hx);
+    Eigen::Matrix<double, ZDIM, 1> y_i = z - hx;
+    ZEM H_err_i = ZDM(in_H) * H_mod;
+    ZZM R_i(in_R + i * ZDIM * ZDIM);
+
+    y_out.segment(i * ZDIM, ZDIM) = y_i;
+
+    // Do mahalobis distance test per observation
+    if (MAHA_TEST){
+      ZZM a = (H_err_i * P * H_err_i.transpose() + R_i).inverse();
+      double maha_dist = (y_i.transpose() * a * y_i).value();
+      if (maha_dist > MAHA_THRESHOLD){
+        // leave the outlier out of the stack, scaling up its R like update does makes S too ill conditioned
+        // for the other observations once they're solved together
+        y_i.setZero();
+        H_err_i.setZero();
+      }
+    }
+
+    y.segment(i * ZDIM, ZDIM) = y_i;
+    H_err.block(i * ZDIM, 0, ZDIM, EDIM) = H_err_i;
+    R.block(i * ZDIM, i * ZDIM, ZDIM, ZDIM) = R_i;
+  }
+
+  // kalman gains and I_KH
+  XXM S = ((H_err * P) * H_err.transpose()) + R;
+  XEM KT = S.fullPivLu().solve(H_err * P.transpose());
+  EEM I_KH = Eigen::Matrix<double, EDIM, EDIM>::Identity() - (KT.transpose() * H_err);
+
+  // update state by injecting dx
+  Eigen::Matrix<double, EDIM, 1> dx(delta_x);
+  dx  = (KT.transpose() * y);
+  memcpy(delta_x, dx.data(), EDIM * sizeof(double));
+  err_fun(in_x, delta_x, x_new);
+
+  // update cov
+  P = ((I_KH * P) * I_KH.transpose()) + ((KT.transpose() * R) * KT);
+
+  // copy out state
+  memcpy(in_x, x_new, DIM * sizeof(double));
+  memcpy(in_P, P.data(), EDIM * EDIM * sizeof(double));
+  memcpy(in_z, y_out.data(), n * ZDIM * sizeof(double));
+  normalize_quaternions(in_x, quat_idxs, n_quat);
+}
@@ -1,10 +1,12 @@
 import os
+from collections.abc import Mapping
 from common.params import Params
 from common.basedir import BASEDIR
 from selfdrive.version import get_comma_remote, get_tested_branch
-from selfdrive.car.fingerprints import eliminate_incompatible_cars, all_legacy_fingerprint_cars
+from selfdrive.car.fingerprints import compatible_cars_mask, cars_from_mask, ALL_LEGACY_FINGERPRINT_CARS_MASK
 from selfdrive.car.vin import get_vin, VIN_UNKNOWN
 from selfdrive.car.fw_versions import get_fw_versions, match_fw_to_car
+from selfdrive.car.registry import get_registry
 from selfdrive.hardware import EON
 from selfdrive.swaglog import cloudlog
 import cereal.messaging as messaging
@@ -61,26 +63,36 @@ def load_interfaces(brand_names):
   return ret
 
 
+class CarInterfaces(Mapping):
+  """Maps car models to (CarInterface, CarController, CarState), importing a brand on first use."""
+  def __init__(self, brand_names):
+    self._brand_names = brand_names
+    self._model_brands = {model: brand for brand, models in brand_names.items() for model in models}
+    self._loaded = {}
+
+  def __getitem__(self, model_name):
+    if model_name not in self._loaded:
+      brand_name = self._model_brands[model_name]
+      self._loaded.update(load_interfaces({brand_name: self._brand_names[brand_name]}))
+    return self._loaded[model_name]
+
+  def __iter__(self):
+    return iter(self._model_brands)
+
+  def __len__(self):
+    return len(self._model_brands)
+
+
 def _get_interface_names():
-  # read all the folders in selfdrive/car and return a dict where:
+  # return a dict where:
   # - keys are all the car names that which we have an interface for
   # - values are lists of spefic car models for a given car
-  brand_names = {}
-  for car_folder in [x[0] for x in os.walk(BASEDIR + '/selfdrive/car')]:
-    try:
-      brand_name = car_folder.split('/')[-1]
-      model_names = __import__('selfdrive.car.%s.values' % brand_name, fromlist=['CAR']).CAR
-      model_names = [getattr(model_names, c) for c in model_names.__dict__.keys() if not c.startswith("__")]
-      brand_names[brand_name] = model_names
-    except (ImportError, IOError):
-      pass
-
-  return brand_names
+  return {brand_name: entry['models'] for brand_name, entry in get_registry().items() if 'models' in entry}
 
 
-# imports from directory selfdrive/car/<name>/
+# imports from directory selfdrive/car/<name>/ when a model is first looked up
 interface_names = _get_interface_names()
-interfaces = load_interfaces(interface_names)
+interfaces = CarInterfaces(interface_names)
 
 
 # **** for use live only ****
@@ -116,7 +128,8 @@ def fingerprint(logcan, sendcan, has_relay):
   Params().put("CarVin", vin)
 
   finger = gen_empty_fingerprint()
-  candidate_cars = {i: all_legacy_fingerprint_cars() for i in [0, 1]}  # attempt fingerprint on both bus 0 and 1
+  # masks of the candidate cars, attempt fingerprint on both bus 0 and 1
+  candidate_cars = {i: ALL_LEGACY_FINGERPRINT_CARS_MASK for i in [0, 1]}
   frame = 0
   frame_fingerprint = 10  # 0.1s
   car_fingerprint = None
@@ -136,17 +149,17 @@ def fingerprint(logcan, sendcan, has_relay):
       for b in candidate_cars:
         # Ignore extended messages and VIN query response.
         if can.src == b and can.address < 0x800 and can.address not in [0x7df, 0x7e0, 0x7e8]:
-          candidate_cars[b] = eliminate_incompatible_cars(can, candidate_cars[b])
+          candidate_cars[b] &= compatible_cars_mask(can.address, len(can.dat))
 
     # if we only have one car choice and the time since we got our first
     # message has elapsed, exit
     for b in candidate_cars:
-      if len(candidate_cars[b]) == 1 and frame > frame_fingerprint:
+      if bin(candidate_cars[b]).count("1") == 1 and frame > frame_fingerprint:
         # fingerprint done
-        car_fingerprint = candidate_cars[b][0]
+        car_fingerprint = cars_from_mask(candidate_cars[b])[0]
 
     # bail if no cars left or we've been waiting for more than 2s
-    failed = (all(len(cc) == 0 for cc in candidate_cars.values()) and frame > frame_fingerprint) or frame > 200
+    failed = (all(cc == 0 for cc in candidate_cars.values()) and frame > frame_fingerprint) or frame > 200
     succeeded = car_fingerprint is not None
     done = failed or succeeded
 
@@ -1,20 +1,21 @@
-import os
-from common.basedir import BASEDIR
+from selfdrive.car.registry import REGISTRY_ATTRS, get_brands, get_registry
 
 
 def get_attr_from_cars(attr, result=dict, combine_brands=True):
   # read all the folders in selfdrive/car and return a dict where:
   # - keys are all the car models
   # - values are attr values from all car folders
+  # attributes in the car registry are read without importing the brands
   result = result()
 
-  for car_folder in [x[0] for x in os.walk(BASEDIR + '/selfdrive/car')]:
+  for car_name in get_brands():
     try:
-      car_name = car_folder.split('/')[-1]
-      values = __import__('selfdrive.car.%s.values' % car_name, fromlist=[attr])
-      if hasattr(values, attr):
-        attr_values = getattr(values, attr)
+      if attr in REGISTRY_ATTRS:
+        attr_values = get_registry().get(car_name, {}).get(attr)
       else:
+        values = __import__('selfdrive.car.%s.values' % car_name, fromlist=[attr])
+        attr_values = getattr(values, attr, None)
+      if attr_values is None:
         continue
 
       if isinstance(attr_values, dict):
@@ -39,6 +40,39 @@ _FINGERPRINTS = get_attr_from_cars('FINGERPRINTS')
 
 _DEBUG_ADDRESS = {1880: 8}   # reserved for debug purposes
 
+
+def _build_fingerprint_index(fingerprints):
+  # bit i of a car mask stands for the i-th car in fingerprints
+  car_bits = {car_name: 1 << i for i, car_name in enumerate(fingerprints)}
+
+  # address -> message length -> mask of the cars with a fingerprint containing that message
+  index = {}
+  for car_name, car_fingerprints in fingerprints.items():
+    for fingerprint in car_fingerprints:
+      for adr, length in {**fingerprint, **_DEBUG_ADDRESS}.items():  # add alien debug address
+        lengths = index.setdefault(adr, {})
+        lengths[length] = lengths.get(length, 0) | car_bits[car_name]
+
+  return car_bits, index
+
+
+_CAR_BITS, _FINGERPRINT_INDEX = _build_fingerprint_index(_FINGERPRINTS)
+ALL_LEGACY_FINGERPRINT_CARS_MASK = (1 << len(_CAR_BITS)) - 1
+
+
+def compatible_cars_mask(adr, length):
+  """Returns the mask of the cars that could have sent a message of length bytes on address adr."""
+  # ignore addresses that are more than 11 bits
+  if adr >= 0x800:
+    return ALL_LEGACY_FINGERPRINT_CARS_MASK
+  return _FINGERPRINT_INDEX.get(adr, {}).get(length, 0)
+
+
+def cars_from_mask(mask):
+  """Returns the list of cars in a car mask."""
+  return [car_name for car_name, bit in _CAR_BITS.items() if mask & bit]
+
+
 def is_valid_for_fingerprint(msg, car_fingerprint):
   adr = msg.address
   # ignore addresses that are more than 11 bits
@@ -55,19 +89,8 @@ def eliminate_incompatible_cars(msg, candidate_cars):
      Returns:
       A list containing the subset of candidate_cars that could have sent msg.
   """
-  compatible_cars = []
-
-  for car_name in candidate_cars:
-    car_fingerprints = _FINGERPRINTS[car_name]
-
-    for fingerprint in car_fingerprints:
-      fingerprint.update(_DEBUG_ADDRESS)  # add alien debug address
-
-      if is_valid_for_fingerprint(msg, fingerprint):
-        compatible_cars.append(car_name)
-        break
-
-  return compatible_cars
+  mask = compatible_cars_mask(msg.address, len(msg.dat))
+  return [car_name for car_name in candidate_cars if mask & _CAR_BITS[car_name]]
 
 
 def all_known_cars():
@@ -3,6 +3,7 @@ import struct
 import traceback
 from typing import Any
 from collections import defaultdict
+from functools import lru_cache
 
 from tqdm import tqdm
 
@@ -181,34 +182,66 @@ def build_fw_dict(fw_versions):
   return fw_versions_dict
 
 
-def match_fw_to_car_fuzzy(fw_versions_dict, log=True, exclude=None):
-  """Do a fuzzy FW match. This function will return a match, and the number of firmware version
-  that were matched uniquely to that specific car. If multiple ECUs uniquely match to different cars
-  the match is rejected."""
+ESSENTIAL_ECUS = [Ecu.engine, Ecu.eps, Ecu.esp, Ecu.fwdRadar, Ecu.fwdCamera, Ecu.vsa]
+
+# These ECUs are known to be shared between models (EPS only between hybrid/ICE version)
+# Getting this exactly right isn't crucial, but excluding camera and radar makes it almost
+# impossible to get 3 matching versions, even if two models with shared parts are released at the same
+# time and only one is in our database.
+FUZZY_EXCLUDE_ECUS = [Ecu.fwdCamera, Ecu.fwdRadar, Ecu.eps]
+
+
+def _ecu_optional(candidate, ecu_type):
+  """Whether a candidate can still match exactly if this ECU didn't respond."""
+  if ecu_type == Ecu.esp and candidate in [TOYOTA.RAV4, TOYOTA.COROLLA, TOYOTA.HIGHLANDER, TOYOTA.SIENNA, TOYOTA.LEXUS_IS]:
+    return True
 
-  # These ECUs are known to be shared between models (EPS only between hybrid/ICE version)
-  # Getting this exactly right isn't crucial, but excluding camera and radar makes it almost
-  # impossible to get 3 matching versions, even if two models with shared parts are released at the same
-  # time and only one is in our database.
-  exclude_types = [Ecu.fwdCamera, Ecu.fwdRadar, Ecu.eps]
+  # On some Toyota models, the engine can show on two different addresses
+  if ecu_type == Ecu.engine and candidate in [TOYOTA.CAMRY, TOYOTA.COROLLA_TSS2, TOYOTA.CHR, TOYOTA.LEXUS_IS]:
+    return True
 
-  # Build lookup table from (addr, subaddr, fw) to list of candidate cars
-  all_fw_versions = defaultdict(list)
+  # Ignore non essential ecus
+  return ecu_type not in ESSENTIAL_ECUS
+
+
+@lru_cache(maxsize=None)
+def _fw_index():
+  """Lookup tables over FW_VERSIONS, built on first use and shared by all matchers.
+
+     Returns:
+      exact: ((addr, subaddr) -> candidates having that ECU, candidate -> ECUs that have to respond)
+      all_versions: (addr, subaddr, fw) -> list of candidates having that version
+      fuzzy_versions: like all_versions, without the ECUs excluded from fuzzy matching
+  """
+  ecu_candidates = defaultdict(set)
+  required_ecus = {}
+  all_versions = defaultdict(list)
+  fuzzy_versions = defaultdict(list)
   for candidate, fw_by_addr in FW_VERSIONS.items():
-    if candidate == exclude:
-      continue
+    required_ecus[candidate] = frozenset(ecu[1:] for ecu in fw_by_addr if not _ecu_optional(candidate, ecu[0]))
 
-    for addr, fws in fw_by_addr.items():
-      if addr[0] in exclude_types:
-        continue
+    for ecu, fws in fw_by_addr.items():
+      ecu_candidates[ecu[1:]].add(candidate)
       for f in fws:
-        all_fw_versions[(addr[1], addr[2], f)].append(candidate)
+        all_versions[(ecu[1], ecu[2], f)].append(candidate)
+        if ecu[0] not in FUZZY_EXCLUDE_ECUS:
+          fuzzy_versions[(ecu[1], ecu[2], f)].append(candidate)
+
+  exact = ({addr: frozenset(c) for addr, c in ecu_candidates.items()}, required_ecus)
+  return exact, dict(all_versions), dict(fuzzy_versions)
+
+
+def match_fw_to_car_fuzzy(fw_versions_dict, log=True, exclude=None):
+  """Do a fuzzy FW match. This function will return a match, and the number of firmware version
+  that were matched uniquely to that specific car. If multiple ECUs uniquely match to different cars
+  the match is rejected."""
+  _, _, fuzzy_versions = _fw_index()
 
   match_count = 0
   candidate = None
   for addr, version in fw_versions_dict.items():
     # All cars that have this FW response on the specified address
-    candidates = all_fw_versions[(addr[0], addr[1], version)]
+    candidates = [c for c in fuzzy_versions.get((addr[0], addr[1], version), []) if c != exclude]
 
     if len(candidates) == 1:
       match_count += 1
@@ -231,31 +264,31 @@ def match_fw_to_car_exact(fw_versions_dict):
   FW versions for a list of "essential" ECUs. If an ECU is not considered
   essential the FW version can be missing to get a fingerprint, but if it's present it
   needs to match the database."""
-  invalid = []
-  candidates = FW_VERSIONS
-
-  for candidate, fws in candidates.items():
-    for ecu, expected_versions in fws.items():
-      ecu_type = ecu[0]
-      addr = ecu[1:]
-      found_version = fw_versions_dict.get(addr, None)
-      ESSENTIAL_ECUS = [Ecu.engine, Ecu.eps, Ecu.esp, Ecu.fwdRadar, Ecu.fwdCamera, Ecu.vsa]
-      if ecu_type == Ecu.esp and candidate in [TOYOTA.RAV4, TOYOTA.COROLLA, TOYOTA.HIGHLANDER, TOYOTA.SIENNA, TOYOTA.LEXUS_IS] and found_version is None:
-        continue
-
-      # On some Toyota models, the engine can show on two different addresses
-      if ecu_type == Ecu.engine and candidate in [TOYOTA.CAMRY, TOYOTA.COROLLA_TSS2, TOYOTA.CHR, TOYOTA.LEXUS_IS] and found_version is None:
-        continue
-
-      # Ignore non essential ecus
-      if ecu_type not in ESSENTIAL_ECUS and found_version is None:
-        continue
-
-      if found_version not in expected_versions:
-        invalid.append(candidate)
-        break
-
-  return set(candidates.keys()) - set(invalid)
+  (ecu_candidates, required_ecus), all_versions, _ = _fw_index()
+
+  # Every responding ECU rules out the cars that have it with a different version
+  matches = set(required_ecus)
+  for addr, version in fw_versions_dict.items():
+    with_version = all_versions.get((addr[0], addr[1], version), [])
+    matches -= ecu_candidates.get(addr, frozenset()).difference(with_version)
+
+  # Essential ECUs can't be missing from the response
+  return {c for c in matches if required_ecus[c].issubset(fw_versions_dict)}
+
+
+def match_fw_to_car_ranked(fw_versions_dict):
+  """Ranks cars by how many of the given FW versions appear in their database entry.
+
+  Returns a list of (candidate, matching ECU count) for every car with at least one
+  matching ECU, closest candidates first."""
+  _, all_versions, _ = _fw_index()
+
+  match_counts = defaultdict(int)
+  for addr, version in fw_versions_dict.items():
+    for candidate in all_versions.get((addr[0], addr[1], version), []):
+      match_counts[candidate] += 1
+
+  return sorted(match_counts.items(), key=lambda m: (-m[1], m[0]))
 
 
 def match_fw_to_car(fw_versions, allow_fuzzy=True):
@@ -49,6 +49,8 @@ class CarController():
     self.params = CarControllerParams()
 
     self.packer_pt = CANPacker(DBC[CP.carFingerprint]['pt'])
+    # the 50 Hz steering command is packed from a template, without resolving signal names every frame
+    self.steering_template = self.packer_pt.make_template("ASCMLKASteeringCmd", gmcan.STEERING_CONTROL_SIGNALS)
     #self.packer_obj = CANPacker(DBC[CP.carFingerprint]['radar'])
     #self.packer_ch = CANPacker(DBC[CP.carFingerprint]['chassis'])
 
@@ -88,7 +90,8 @@ class CarController():
       # moment of disengaging, increment the counter based on the last message known to pass Panda safety checks.
       idx = (CS.lka_steering_cmd_counter + 1) % 4
 
-      can_sends.append(gmcan.create_steering_control(self.packer_pt, CanBus.POWERTRAIN, apply_steer, idx, lkas_enabled))
+      steering_values = gmcan.steering_control_values(apply_steer, idx, lkas_enabled)
+      self.packer_pt.make_can_msgs([(self.steering_template, CanBus.POWERTRAIN, steering_values, -1)], can_sends)
 
     if CS.CP.enableGasInterceptor:
 
@@ -15,68 +15,95 @@ class CarState(CarStateBase):
     self.adaptive_Cruise = False
     self.enable_lkas = False
     self.lka_steering_cmd_counter = 0
+    self.pt_cp = None
+    self.loopback_cp = None
+
+  def resolve_handles(self, pt_cp, loopback_cp):
+    # signal names are looked up once per parser, update reads values by handle
+    self.pt_cp = pt_cp
+    self.loopback_cp = loopback_cp
+    pt = pt_cp.signal_handle
+    self.h_acc_buttons = pt("ASCMSteeringButton", "ACCButtons")
+    self.h_wheel_speeds = (pt("EBCMWheelSpdFront", "FLWheelSpd"), pt("EBCMWheelSpdFront", "FRWheelSpd"),
+                           pt("EBCMWheelSpdRear", "RLWheelSpd"), pt("EBCMWheelSpdRear", "RRWheelSpd"))
+    self.h_vehicle_speed = pt("ECMVehicleSpeed", "VehicleSpeed")
+    self.h_prndl = pt("ECMPRDNL", "PRNDL")
+    self.h_brake = pt("EBCMBrakePedalPosition", "BrakePedalPosition")
+    if self.CP.enableGasInterceptor:
+      self.h_interceptor_gas = (pt("GAS_SENSOR", "INTERCEPTOR_GAS"), pt("GAS_SENSOR", "INTERCEPTOR_GAS2"))
+    self.h_gas = pt("AcceleratorPedal", "AcceleratorPedal")
+    self.h_steering_angle = pt("PSCMSteeringAngle", "SteeringWheelAngle")
+    self.h_steering_rate = pt("PSCMSteeringAngle", "SteeringWheelRate")
+    self.h_steering_torque = pt("PSCMStatus", "LKADriverAppldTrq")
+    self.h_steering_torque_eps = pt("PSCMStatus", "LKATorqueDelivered")
+    self.h_lkas_status = pt("PSCMStatus", "LKATorqueDeliveredStatus")
+    self.h_doors = (pt("BCMDoorBeltStatus", "FrontLeftDoor"), pt("BCMDoorBeltStatus", "FrontRightDoor"),
+                    pt("BCMDoorBeltStatus", "RearLeftDoor"), pt("BCMDoorBeltStatus", "RearRightDoor"))
+    self.h_seatbelt = pt("BCMDoorBeltStatus", "LeftSeatBelt")
+    self.h_turn_signals = pt("BCMTurnSignals", "TurnSignals")
+    self.h_epb_closed = pt("EPBStatus", "EPBClosed")
+    self.h_main_on = pt("ECMEngineStatus", "CruiseMainOn")
+    self.h_traction_control = pt("ESPStatus", "TractionControlOn")
+    self.h_cruise_state = pt("AcceleratorPedal2", "CruiseState")
+    self.h_lka_counter = loopback_cp.signal_handle("ASCMLKASteeringCmd", "RollingCounter")
 
   def update(self, pt_cp, loopback_cp):
+    if pt_cp is not self.pt_cp or loopback_cp is not self.loopback_cp:
+      self.resolve_handles(pt_cp, loopback_cp)
+    pt = pt_cp.value
+
     ret = car.CarState.new_message()
     ret.adaptiveCruise = self.adaptive_Cruise
     ret.lkasEnable = self.enable_lkas
     self.prev_cruise_buttons = self.cruise_buttons
-    self.cruise_buttons = pt_cp.vl["ASCMSteeringButton"]["ACCButtons"]
-
-    ret.wheelSpeeds = self.get_wheel_speeds(
-      pt_cp.vl["EBCMWheelSpdFront"]["FLWheelSpd"],
-      pt_cp.vl["EBCMWheelSpdFront"]["FRWheelSpd"],
-      pt_cp.vl["EBCMWheelSpdRear"]["RLWheelSpd"],
-      pt_cp.vl["EBCMWheelSpdRear"]["RRWheelSpd"],
-    )
+    self.cruise_buttons = pt(self.h_acc_buttons)
+
+    ret.wheelSpeeds = self.get_wheel_speeds(*[pt(h) for h in self.h_wheel_speeds])
     ret.vEgoRaw = mean([ret.wheelSpeeds.fl, ret.wheelSpeeds.fr, ret.wheelSpeeds.rl, ret.wheelSpeeds.rr])
     ret.vEgo, ret.aEgo = self.update_speed_kf(ret.vEgoRaw)
     ret.standstill = ret.vEgoRaw < 0.01
-    ret.vEgo = pt_cp.vl["ECMVehicleSpeed"]["VehicleSpeed"] * CV.MPH_TO_MS
+    ret.vEgo = pt(self.h_vehicle_speed) * CV.MPH_TO_MS
 
-    ret.gearShifter = self.parse_gear_shifter(self.shifter_values.get(pt_cp.vl["ECMPRDNL"]["PRNDL"], None))
-    ret.brake = pt_cp.vl["EBCMBrakePedalPosition"]["BrakePedalPosition"] / 0xd0
+    ret.gearShifter = self.parse_gear_shifter(self.shifter_values.get(pt(self.h_prndl), None))
+    ret.brake = pt(self.h_brake) / 0xd0
     # Brake pedal's potentiometer returns near-zero reading even when pedal is not pressed.
     if ret.brake < 10/0xd0:
       ret.brake = 0.
 
     if self.CP.enableGasInterceptor:
-      ret.gas = (pt_cp.vl["GAS_SENSOR"]["INTERCEPTOR_GAS"] + pt_cp.vl["GAS_SENSOR"]["INTERCEPTOR_GAS2"]) / 2.
+      ret.gas = (pt(self.h_interceptor_gas[0]) + pt(self.h_interceptor_gas[1])) / 2.
       ret.gasPressed = ret.gas > 20
     else:
-      ret.gas = pt_cp.vl["AcceleratorPedal"]["AcceleratorPedal"] / 254.
+      ret.gas = pt(self.h_gas) / 254.
       ret.gasPressed = ret.gas > 1e-5
 
-    ret.steeringAngleDeg = pt_cp.vl["PSCMSteeringAngle"]["SteeringWheelAngle"]
-    ret.steeringRateDeg = pt_cp.vl["PSCMSteeringAngle"]["SteeringWheelRate"]
-    ret.steeringTorque = pt_cp.vl["PSCMStatus"]["LKADriverAppldTrq"]
-    ret.steeringTorqueEps = pt_cp.vl["PSCMStatus"]["LKATorqueDelivered"]
+    ret.steeringAngleDeg = pt(self.h_steering_angle)
+    ret.steeringRateDeg = pt(self.h_steering_rate)
+    ret.steeringTorque = pt(self.h_steering_torque)
+    ret.steeringTorqueEps = pt(self.h_steering_torque_eps)
     ret.steeringPressed = abs(ret.steeringTorque) > STEER_THRESHOLD
-    self.lka_steering_cmd_counter = loopback_cp.vl["ASCMLKASteeringCmd"]["RollingCounter"]
+    self.lka_steering_cmd_counter = loopback_cp.value(self.h_lka_counter)
 
     # 0 inactive, 1 active, 2 temporarily limited, 3 failed
-    self.lkas_status = pt_cp.vl["PSCMStatus"]["LKATorqueDeliveredStatus"]
+    self.lkas_status = pt(self.h_lkas_status)
     ret.steerWarning = self.lkas_status == 2
     ret.steerError = self.lkas_status == 3
 
     # 1 - open, 0 - closed
-    ret.doorOpen = (pt_cp.vl["BCMDoorBeltStatus"]["FrontLeftDoor"] == 1 or
-                    pt_cp.vl["BCMDoorBeltStatus"]["FrontRightDoor"] == 1 or
-                    pt_cp.vl["BCMDoorBeltStatus"]["RearLeftDoor"] == 1 or
-                    pt_cp.vl["BCMDoorBeltStatus"]["RearRightDoor"] == 1)
+    ret.doorOpen = any(pt(h) == 1 for h in self.h_doors)
 
     # 1 - latched
-    ret.seatbeltUnlatched = pt_cp.vl["BCMDoorBeltStatus"]["LeftSeatBelt"] == 0
-    ret.leftBlinker = pt_cp.vl["BCMTurnSignals"]["TurnSignals"] == 1
-    ret.rightBlinker = pt_cp.vl["BCMTurnSignals"]["TurnSignals"] == 2
+    ret.seatbeltUnlatched = pt(self.h_seatbelt) == 0
+    ret.leftBlinker = pt(self.h_turn_signals) == 1
+    ret.rightBlinker = pt(self.h_turn_signals) == 2
 
-    self.park_brake = pt_cp.vl["EPBStatus"]["EPBClosed"]
+    self.park_brake = pt(self.h_epb_closed)
     # 오토홀드 표시 추가 (PSK)
-    ret.autoHold = pt_cp.vl["EPBStatus"]["EPBClosed"]
-    self.main_on = bool(pt_cp.vl["ECMEngineStatus"]["CruiseMainOn"])
+    ret.autoHold = pt(self.h_epb_closed)
+    self.main_on = bool(pt(self.h_main_on))
     ret.mainOn = self.main_on
-    ret.espDisabled = pt_cp.vl["ESPStatus"]["TractionControlOn"] != 1
-    self.pcm_acc_status = pt_cp.vl["AcceleratorPedal2"]["CruiseState"]
+    ret.espDisabled = pt(self.h_traction_control) != 1
+    self.pcm_acc_status = pt(self.h_cruise_state)
     ret.cruiseState.available = self.pcm_acc_status != 0
     ret.cruiseState.standstill = False
 
@@ -1,14 +1,13 @@
 from selfdrive.car import make_can_msg
 
-def create_steering_control(packer, bus, apply_steer, idx, lkas_active):
+STEERING_CONTROL_SIGNALS = ("LKASteeringCmdActive", "LKASteeringCmd", "RollingCounter", "LKASteeringCmdChecksum")
 
-  values = {
-    "LKASteeringCmdActive": lkas_active,
-    "LKASteeringCmd": apply_steer,
-    "RollingCounter": idx,
-    "LKASteeringCmdChecksum": 0x1000 - (lkas_active << 11) - (apply_steer & 0x7ff) - idx
-  }
+def steering_control_values(apply_steer, idx, lkas_active):
+  # in the order of STEERING_CONTROL_SIGNALS, for a packer template of ASCMLKASteeringCmd
+  return (lkas_active, apply_steer, idx, 0x1000 - (lkas_active << 11) - (apply_steer & 0x7ff) - idx)
 
+def create_steering_control(packer, bus, apply_steer, idx, lkas_active):
+  values = dict(zip(STEERING_CONTROL_SIGNALS, steering_control_values(apply_steer, idx, lkas_active)))
   return packer.make_can_msg("ASCMLKASteeringCmd", bus, values)
 
 def create_adas_keepalive(bus):
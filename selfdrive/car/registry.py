@@ -0,0 +1,75 @@
+import os
+import pickle
+import hashlib
+from pathlib import Path
+from functools import lru_cache
+
+from common.basedir import BASEDIR
+from common.file_helpers import atomic_write_in_dir, mkdirs_exists_ok
+from selfdrive.hardware import PC
+
+CAR_DIR = os.path.join(BASEDIR, "selfdrive", "car")
+
+if PC:
+  REGISTRY_CACHE = os.path.join(str(Path.home()), ".comma", "car_registry")
+else:
+  REGISTRY_CACHE = "/data/car_registry"
+
+# values attributes kept in the registry, so reading them doesn't import every brand
+REGISTRY_ATTRS = ('FINGERPRINTS', 'FW_VERSIONS')
+
+
+def get_brands():
+  """Returns the names of all folders in selfdrive/car with a values module."""
+  return sorted(d for d in os.listdir(CAR_DIR) if os.path.isfile(os.path.join(CAR_DIR, d, "values.py")))
+
+
+def _values_hash(brands):
+  h = hashlib.sha1()
+  for brand in brands:
+    with open(os.path.join(CAR_DIR, brand, "values.py"), "rb") as f:
+      h.update(brand.encode() + b"\0" + f.read())
+  return h.hexdigest()
+
+
+def _build_registry(brands):
+  registry = {}
+  for brand in brands:
+    try:
+      values = __import__('selfdrive.car.%s.values' % brand, fromlist=['CAR'])
+    except (ImportError, IOError):
+      continue
+
+    entry = {attr: getattr(values, attr) for attr in REGISTRY_ATTRS if hasattr(values, attr)}
+    if hasattr(values, 'CAR'):
+      entry['models'] = [getattr(values.CAR, c) for c in values.CAR.__dict__.keys() if not c.startswith("__")]
+    registry[brand] = entry
+  return registry
+
+
+@lru_cache(maxsize=None)
+def get_registry():
+  """Returns a dict of brand -> {'models': [...], 'FINGERPRINTS': {...}, 'FW_VERSIONS': {...}}.
+
+     Building it imports the values module of every brand, so the result is
+     stored in REGISTRY_CACHE and reused until a values.py changes.
+  """
+  brands = get_brands()
+  key = _values_hash(brands)
+
+  try:
+    with open(REGISTRY_CACHE, "rb") as f:
+      cache = pickle.load(f)
+    if cache['key'] == key:
+      return cache['registry']
+  except Exception:
+    pass
+
+  registry = _build_registry(brands)
+  try:
+    mkdirs_exists_ok(os.path.dirname(REGISTRY_CACHE))
+    with atomic_write_in_dir(REGISTRY_CACHE, mode="wb", overwrite=True) as f:
+      pickle.dump({'key': key, 'registry': registry}, f, -1)
+  except OSError:
+    pass
+  return registry
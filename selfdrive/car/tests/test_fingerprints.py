@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+import unittest
+from collections import namedtuple
+
+from selfdrive.car.fingerprints import _FINGERPRINTS as FINGERPRINTS
+from selfdrive.car.fingerprints import all_legacy_fingerprint_cars, eliminate_incompatible_cars, is_valid_for_fingerprint
+from selfdrive.car.registry import _build_registry, get_brands, get_registry
+
+CanData = namedtuple('CanData', ['address', 'dat'])
+
+
+class TestFingerprints(unittest.TestCase):
+  def test_eliminate_matches_fingerprint_scan(self):
+    all_cars = all_legacy_fingerprint_cars()
+    msgs = {CanData(adr, b"\x00" * length) for fps in FINGERPRINTS.values() for fp in fps for adr, length in fp.items()}
+    msgs |= {CanData(adr, b"\x00" * 8) for adr in (0x1, 1880, 0x800, 0x18daf110)}
+
+    for msg in msgs:
+      expected = [c for c in all_cars if any(is_valid_for_fingerprint(msg, {**fp, 1880: 8}) for fp in FINGERPRINTS[c])]
+      self.assertEqual(eliminate_incompatible_cars(msg, all_cars), expected)
+
+  def test_registry_up_to_date(self):
+    self.assertEqual(get_registry(), _build_registry(get_brands()))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+import random
+import unittest
+from parameterized import parameterized
+
+from cereal import car
+from selfdrive.car.fingerprints import FW_VERSIONS
+from selfdrive.car.fw_versions import match_fw_to_car, match_fw_to_car_ranked, build_fw_dict
+
+CarFw = car.CarParams.CarFw
+
+
+class TestFwFingerprint(unittest.TestCase):
+  @parameterized.expand([(c,) for c in FW_VERSIONS])
+  def test_fw_fingerprint(self, car_model):
+    fw = []
+    for (ecu, addr, sub_addr), fw_versions in FW_VERSIONS[car_model].items():
+      f = CarFw.new_message(ecu=ecu, address=addr, fwVersion=random.choice(fw_versions))
+      if sub_addr is not None:
+        f.subAddress = sub_addr
+      fw.append(f)
+
+    _, matches = match_fw_to_car(fw)
+    self.assertIn(car_model, matches)
+
+    ranked = match_fw_to_car_ranked(build_fw_dict(fw))
+    self.assertEqual(ranked[0][1], len(fw))
+    self.assertIn(car_model, [c for c, count in ranked if count == len(fw)])
+
+
+if __name__ == "__main__":
+  unittest.main()
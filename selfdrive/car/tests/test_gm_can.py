@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import unittest
+
+from opendbc.can.packer import CANPacker
+from selfdrive.boardd.boardd import can_list_to_can_capnp
+from selfdrive.car.gm import gmcan
+from selfdrive.car.gm.carstate import CarState
+from selfdrive.car.gm.interface import CarInterface
+from selfdrive.car.gm.values import CAR, DBC, CanBus
+from selfdrive.config import Conversions as CV
+
+
+class TestGMCan(unittest.TestCase):
+  def test_steering_control_template(self):
+    packer = CANPacker(DBC[CAR.VOLT]['pt'])
+    template = packer.make_template("ASCMLKASteeringCmd", gmcan.STEERING_CONTROL_SIGNALS)
+
+    # the carcontroller packs from the template, it has to match the dict based message
+    for apply_steer in range(-300, 301, 7):
+      for idx in range(4):
+        for lkas_active in (False, True):
+          expected = gmcan.create_steering_control(packer, CanBus.POWERTRAIN, apply_steer, idx, lkas_active)
+          can_sends = []
+          values = gmcan.steering_control_values(apply_steer, idx, lkas_active)
+          ret = packer.make_can_msgs([(template, CanBus.POWERTRAIN, values, -1)], can_sends)
+          self.assertIs(ret, can_sends)
+          self.assertEqual(can_sends, [expected])
+
+  def test_carstate_signal_handles(self):
+    CP = CarInterface.get_params(CAR.VOLT)
+    CS = CarState(CP)
+    packer = CANPacker(DBC[CAR.VOLT]['pt'])
+    msgs = [
+      packer.make_can_msg("EBCMWheelSpdFront", CanBus.POWERTRAIN, {"FLWheelSpd": 20., "FRWheelSpd": 21.}),
+      packer.make_can_msg("EBCMWheelSpdRear", CanBus.POWERTRAIN, {"RLWheelSpd": 22., "RRWheelSpd": 23.}),
+      packer.make_can_msg("PSCMStatus", CanBus.POWERTRAIN, {"LKADriverAppldTrq": 1.5, "LKATorqueDeliveredStatus": 2}),
+      packer.make_can_msg("BCMDoorBeltStatus", CanBus.POWERTRAIN, {"RearRightDoor": 1, "LeftSeatBelt": 1}),
+      packer.make_can_msg("BCMTurnSignals", CanBus.POWERTRAIN, {"TurnSignals": 2}),
+      gmcan.create_steering_control(packer, CanBus.LOOPBACK, 0, 2, False),
+    ]
+
+    # handles are resolved again for new parsers
+    for _ in range(2):
+      pt_cp, loopback_cp = CS.get_can_parser(CP), CS.get_loopback_can_parser(CP)
+      pt_cp.update_strings([can_list_to_can_capnp(msgs)])
+      loopback_cp.update_strings([can_list_to_can_capnp(msgs)])
+      ret = CS.update(pt_cp, loopback_cp)
+
+      self.assertAlmostEqual(ret.wheelSpeeds.rr, pt_cp.vl["EBCMWheelSpdRear"]["RRWheelSpd"] * CP.wheelSpeedFactor * CV.KPH_TO_MS, places=5)
+      self.assertAlmostEqual(ret.steeringTorque, 1.5)
+      self.assertTrue(ret.steerWarning)
+      self.assertTrue(ret.doorOpen)
+      self.assertFalse(ret.seatbeltUnlatched)
+      self.assertTrue(ret.rightBlinker)
+      self.assertEqual(CS.lka_steering_cmd_counter, 2)
+
+
+if __name__ == "__main__":
+  unittest.main()
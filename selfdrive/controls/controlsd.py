@@ -29,7 +29,7 @@ from selfdrive.locationd.calibrationd import Calibration
 from selfdrive.hardware import HARDWARE, TICI, EON
 from selfdrive.manager.process_config import managed_processes
 
-from selfdrive.ntune import ntune_common_get, ntune_common_enabled, ntune_scc_get
+from selfdrive.ntune import ntune_common, ntune_scc
 from selfdrive.road_speed_limiter import road_speed_limiter_get_max_speed, road_speed_limiter_get_active
 from selfdrive.controls.lib.drive_helpers import V_CRUISE_MAX, V_CRUISE_MIN, V_CRUISE_DELTA_KM, V_CRUISE_DELTA_MI
 from selfdrive.car.gm.values import SLOW_ON_CURVES, MIN_CURVE_SPEED
@@ -275,7 +275,7 @@ class Controls:
             curv = curv[start:min(start + 10, TRAJECTORY_SIZE)]
             a_y_max = 2.975 - v_ego * 0.0375  # ~1.85 @ 75mph, ~2.6 @ 25mph
             v_curvature = np.sqrt(a_y_max / np.clip(np.abs(curv), 1e-4, None))
-            model_speed = np.mean(v_curvature) * 0.85 * ntune_scc_get("sccCurvatureFactor")   #  MIN : 0.5, MAX : 1.5, DEFAULT : 0.98
+            model_speed = np.mean(v_curvature) * 0.85 * ntune_scc().sccCurvatureFactor   #  MIN : 0.5, MAX : 1.5, DEFAULT : 0.98
 
             if model_speed < v_ego:
               self.curve_speed_ms = float(max(model_speed, MIN_CURVE_SPEED))
@@ -333,7 +333,7 @@ class Controls:
         self.slowing_down = False
 
       # 안전거리 활성화
-      if ntune_scc_get('leadSafe') == 1:
+      if ntune_scc().leadSafe == 1:
         lead_speed = self.get_long_lead_safe_speed(sm, CS, vEgo)
         if lead_speed >= self.min_set_speed_clu:
             if lead_speed < max_speed_clu:
@@ -727,10 +727,11 @@ class Controls:
     x = max(params.stiffnessFactor, 0.1)
     #sr = max(params.steerRatio, 0.1)
 
-    if ntune_common_enabled('useLiveSteerRatio'):
+    ntune = ntune_common()
+    if ntune.useLiveSteerRatio > 0.5:
       sr = max(params.steerRatio, 0.1)
     else:
-      sr = max(ntune_common_get('steerRatio'), 0.1)
+      sr = max(ntune.steerRatio, 0.1)
 
     self.VM.update_params(x, sr)
 
@@ -857,7 +858,7 @@ class Controls:
       left_lane_visible = self.sm['lateralPlan'].lProb > 0.5
       l_lane_change_prob = meta.desirePrediction[Desire.laneChangeLeft - 1]
       r_lane_change_prob = meta.desirePrediction[Desire.laneChangeRight - 1]
-      cameraOffset = ntune_common_get("cameraOffset")
+      cameraOffset = ntune_common().cameraOffset
       l_lane_close = left_lane_visible and (self.sm['modelV2'].laneLines[1].y[0] > -(1.08 + cameraOffset))
       r_lane_close = right_lane_visible and (self.sm['modelV2'].laneLines[2].y[0] < (1.08 - cameraOffset))
 
@@ -939,19 +940,21 @@ class Controls:
     controlsState.lateralControlSelect = int(self.lateral_control_select)
     controlsState.angleSteers = steer_angle_without_offset * CV.RAD_TO_DEG
     controlsState.steerRatio = self.VM.sR
-    controlsState.steerRateCost = ntune_common_get('steerRateCost')
-    controlsState.steerActuatorDelay = ntune_common_get('steerActuatorDelay')
+    ntune = ntune_common()
+    controlsState.steerRateCost = ntune.steerRateCost
+    controlsState.steerActuatorDelay = ntune.steerActuatorDelay
 
     # SCC
-    controlsState.leadSafeMode = ntune_scc_get('leadSafe')
-    controlsState.accelProfile = ntune_scc_get('accelProfile')
-    controlsState.leadAccelTau = ntune_scc_get('leadAccelTau')
-    controlsState.distanceGap = ntune_scc_get('distanceGap')
-    controlsState.sccGasFactor = ntune_scc_get('sccGasFactor')
-    controlsState.sccBrakeFactor = ntune_scc_get('sccBrakeFactor')
-    controlsState.sccCurvatureFactor = ntune_scc_get('sccCurvatureFactor')
-    controlsState.longitudinalActuatorDelayLowerBound = ntune_scc_get('longitudinalActuatorDelayLowerBound')
-    controlsState.longitudinalActuatorDelayUpperBound = ntune_scc_get('longitudinalActuatorDelayUpperBound')
+    ntune = ntune_scc()
+    controlsState.leadSafeMode = ntune.leadSafe
+    controlsState.accelProfile = ntune.accelProfile
+    controlsState.leadAccelTau = ntune.leadAccelTau
+    controlsState.distanceGap = ntune.distanceGap
+    controlsState.sccGasFactor = ntune.sccGasFactor
+    controlsState.sccBrakeFactor = ntune.sccBrakeFactor
+    controlsState.sccCurvatureFactor = ntune.sccCurvatureFactor
+    controlsState.longitudinalActuatorDelayLowerBound = ntune.longitudinalActuatorDelayLowerBound
+    controlsState.longitudinalActuatorDelayUpperBound = ntune.longitudinalActuatorDelayUpperBound
 
     if self.joystick_mode:
       controlsState.lateralControlState.debugState = lac_log
@@ -5,7 +5,7 @@ from common.numpy_fast import interp, clip, mean
 from common.realtime import DT_MDL
 from selfdrive.hardware import EON, TICI
 from selfdrive.swaglog import cloudlog
-from selfdrive.ntune import ntune_common_get
+from selfdrive.ntune import ntune_common
 
 ENABLE_ZORROBYTE = True
 ENABLE_INC_LANE_PROB = True
@@ -52,7 +52,7 @@ class LanePlanner:
       self.ll_x = md.laneLines[1].x
       # only offset left and right lane lines; offsetting path does not make sense
 
-      cameraOffset = ntune_common_get("cameraOffset")
+      cameraOffset = ntune_common().cameraOffset
 
       self.lll_y = np.array(md.laneLines[1].y) - cameraOffset
       self.rll_y = np.array(md.laneLines[2].y) - cameraOffset
@@ -8,7 +8,7 @@ from selfdrive.swaglog import cloudlog
 from selfdrive.modeld.constants import index_function
 from selfdrive.controls.lib.radar_helpers import _LEAD_ACCEL_TAU
 from selfdrive.config import Conversions as CV
-from selfdrive.ntune import ntune_scc_get
+from selfdrive.ntune import ntune_scc
 
 if __name__ == '__main__':  # generating code
   from pyextra.acados_template import AcadosModel, AcadosOcp, AcadosOcpSolver
@@ -204,25 +204,28 @@ def gen_long_mpc_solver():
 class LongitudinalMpc:
   def __init__(self, e2e=False):
     self.e2e = e2e
+    self.solver = AcadosOcpSolverFast('long', N, EXPORT_DIR)
     self.reset()
     self.source = SOURCES[2]
+    self.solve_time = 0.0
+    self.qp_iterations = 0
+    # cumulative, a good solve or reset() doesn't clear it
+    self.solver_failures_total = 0
 
   def reset(self):
-    self.solver = AcadosOcpSolverFast('long', N, EXPORT_DIR)
+    # the solver is reused, so everything it was given before is set again here
     self.v_solution = np.zeros(N+1)
     self.a_solution = np.zeros(N+1)
     self.prev_a = np.array(self.a_solution)
     self.j_solution = np.zeros(N)
     self.yref = np.zeros((N+1, COST_DIM))
-    for i in range(N):
-      self.solver.cost_set(i, "yref", self.yref[i])
-    self.solver.cost_set(N, "yref", self.yref[N][:COST_E_DIM])
+    self.solver.set_all("yref", self.yref)
     self.x_sol = np.zeros((N+1, X_DIM))
     self.u_sol = np.zeros((N,1))
     self.params = np.zeros((N+1, PARAM_DIM))
     self.param_tr = T_FOLLOW
-    for i in range(N+1):
-      self.solver.set(i, 'x', np.zeros(X_DIM))
+    self.set_iterate(np.zeros((N+1, X_DIM)))
+    self.x_sol_good = None
     self.last_cloudlog_t = 0
     self.status = False
     self.crash_cnt = 0.0
@@ -230,6 +233,36 @@ class LongitudinalMpc:
     self.x0 = np.zeros(X_DIM)
     self.set_weights()
 
+  def set_iterate(self, x_traj):
+    """Sets the states the solver starts from, and clears the controls and multipliers of its last solution."""
+    self.solver.set_all('x', x_traj)
+    self.solver.set_all('u', np.zeros((N, U_DIM)))
+    self.solver.set_all('pi', np.zeros((N, X_DIM)))
+    for i in range(N+1):
+      for field in ('lam', 't'):
+        zeros = np.zeros_like(self.solver.get(i, field))
+        if len(zeros):
+          self.solver.set(i, field, zeros)
+
+  def recover(self):
+    """Restarts the existing solver after a failed solve, instead of making a new one.
+
+       The states are warm started from the last good solution shifted by one
+       planner step, or held at the current state when there is none. Returns
+       the state trajectory the solver was restarted from, which is what the next
+       failure shifts again, so the plan keeps advancing over consecutive failures.
+    """
+    if self.x_sol_good is not None:
+      x_traj = np.column_stack([np.interp(T_IDXS + 0.05, T_IDXS, self.x_sol_good[:,j]) for j in range(X_DIM)])
+      x_traj[:,0] -= x_traj[0,0]
+      x_traj[0] = self.x0
+    else:
+      x_traj = np.tile(self.x0, (N+1, 1))
+    self.set_iterate(x_traj)
+    self.x_sol_good = np.copy(x_traj)
+    self.crash_cnt = 0
+    return x_traj
+
   def set_weights(self):
     if self.e2e:
       self.set_weights_for_xva_policy()
@@ -270,8 +303,7 @@ class LongitudinalMpc:
     if abs(self.x0[1] - v) > 2.:
       self.x0[1] = v
       self.x0[2] = a
-      for i in range(0, N+1):
-        self.solver.set(i, 'x', self.x0)
+      self.solver.set_all('x', np.tile(self.x0, (N+1, 1)))
     else:
       self.x0[1] = v
       self.x0[2] = a
@@ -324,7 +356,7 @@ class LongitudinalMpc:
     self.params[:,1] = self.cruise_max_a
 
     # psk ....
-    gap = ntune_scc_get('distanceGap')
+    gap = ntune_scc().distanceGap
     if gap == 0:
       tr = interp(v_ego, AUTO_TR_BP, AUTO_TR_V)
     else:
@@ -369,36 +401,39 @@ class LongitudinalMpc:
     self.yref[:,1] = x
     self.yref[:,2] = v
     self.yref[:,3] = a
-    for i in range(N):
-      self.solver.cost_set(i, "yref", self.yref[i])
-    self.solver.cost_set(N, "yref", self.yref[N][:COST_E_DIM])
+    self.solver.set_all("yref", self.yref)
     self.params[:,3] = np.copy(self.prev_a)
     self.params[:,4] = self.param_tr
     self.run()
 
   def run(self):
-    for i in range(N+1):
-      self.solver.set(i, 'p', self.params[i])
+    self.solver.set_all('p', self.params)
     self.solver.constraints_set(0, "lbx", self.x0)
     self.solver.constraints_set(0, "ubx", self.x0)
+    t = sec_since_boot()
     self.solution_status = self.solver.solve()
-    for i in range(N+1):
-      self.x_sol[i] = self.solver.get(i, 'x')
-    for i in range(N):
-      self.u_sol[i] = self.solver.get(i, 'u')
-
-    self.v_solution = self.x_sol[:,1]
-    self.a_solution = self.x_sol[:,2]
-    self.j_solution = self.u_sol[:,0]
-
-    self.prev_a = np.interp(T_IDXS + 0.05, T_IDXS, self.a_solution)
+    self.solve_time = sec_since_boot() - t
+    self.qp_iterations = int(np.sum(self.solver.get_stats('statistics')[2]))
 
     t = sec_since_boot()
     if self.solution_status != 0:
+      self.solver_failures_total += 1
       if t > self.last_cloudlog_t + 5.0:
         self.last_cloudlog_t = t
         cloudlog.warning(f"Long mpc reset, solution_status: {self.solution_status}")
-      self.reset()
+      # the failed iterate is never published, the plan follows the warm start instead
+      self.x_sol = self.recover()
+      self.u_sol = np.zeros((N, U_DIM))
+    else:
+      self.x_sol = self.solver.get_all('x')
+      self.u_sol = self.solver.get_all('u')
+      self.x_sol_good = np.copy(self.x_sol)
+
+    self.v_solution = self.x_sol[:,1]
+    self.a_solution = self.x_sol[:,2]
+    self.j_solution = self.u_sol[:,0]
+
+    self.prev_a = np.interp(T_IDXS + 0.05, T_IDXS, self.a_solution)
 
 
 if __name__ == "__main__":
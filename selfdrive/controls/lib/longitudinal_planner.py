@@ -12,7 +12,7 @@ from selfdrive.controls.lib.longitudinal_mpc_lib.long_mpc import LongitudinalMpc
 from selfdrive.controls.lib.longitudinal_mpc_lib.long_mpc import T_IDXS as T_IDXS_MPC
 from selfdrive.controls.lib.drive_helpers import V_CRUISE_MAX, CONTROL_N
 from selfdrive.swaglog import cloudlog
-from selfdrive.ntune import ntune_scc_get
+from selfdrive.ntune import ntune_scc
 
 LON_MPC_STEP = 0.2  # first step is 0.2s
 AWARENESS_DECEL = -0.2  # car smoothly decel at .2m/s^2 when user is distracted
@@ -119,7 +119,7 @@ class Planner:
     self.v_desired = max(0.0, self.v_desired)
 
     # PSK .....
-    accelProfile = ntune_scc_get('accelProfile')
+    accelProfile = ntune_scc().accelProfile
     if accelProfile == 0:
       accel_limits = [A_CRUISE_MIN, get_max_accel(v_ego)]
     else:
@@ -167,4 +167,8 @@ class Planner:
     longitudinalPlan.longitudinalPlanSource = self.mpc.source
     longitudinalPlan.fcw = self.fcw
 
+    longitudinalPlan.solverExecutionTime = self.mpc.solve_time
+    longitudinalPlan.solverQpIterations = self.mpc.qp_iterations
+    longitudinalPlan.solverFailuresTotal = self.mpc.solver_failures_total
+
     pm.send('longitudinalPlan', plan_send)
\ No newline at end of file
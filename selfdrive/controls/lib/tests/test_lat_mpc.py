@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+import unittest
+
+import numpy as np
+
+from selfdrive.controls.lib.lateral_mpc_lib.lat_mpc import LateralMpc, N, X_DIM
+
+U_DIM = 1
+COST_DIM = 3
+COST_E_DIM = 2
+
+
+class TestLateralMpcSolver(unittest.TestCase):
+  def setUp(self):
+    self.solver = LateralMpc().solver
+
+  def test_set_get_all(self):
+    rng = np.random.RandomState(0)
+    for field, shape in (('x', (N+1, X_DIM)), ('u', (N, U_DIM))):
+      value = rng.uniform(-1., 1., size=shape)
+      self.solver.set_all(field, value)
+
+      out = self.solver.get_all(field)
+      self.assertEqual(out.shape, shape)
+      np.testing.assert_array_equal(out, value)
+      for stage in range(shape[0]):
+        np.testing.assert_array_equal(self.solver.get(stage, field), value[stage])
+
+      # non contiguous and non float arrays are converted
+      self.solver.set_all(field, np.asfortranarray(value[:, ::-1]))
+      np.testing.assert_array_equal(self.solver.get_all(field), value[:, ::-1])
+      self.solver.set_all(field, np.ones(shape, dtype=int).tolist())
+      np.testing.assert_array_equal(self.solver.get_all(field), np.ones(shape))
+
+  def _solve(self, solver, x0):
+    solver.set_all('x', np.zeros((N+1, X_DIM)))
+    solver.set_all('u', np.zeros((N, U_DIM)))
+    solver.constraints_set(0, "lbx", x0)
+    solver.constraints_set(0, "ubx", x0)
+    solver.solve()
+    return solver.get_all('x'), solver.get_all('u')
+
+  def test_set_all_yref(self):
+    x0 = np.array([0., 0.5, 0., 0., 10., 1.])
+    yref = np.zeros((N+1, COST_DIM))
+    yref[:, 0] = np.linspace(0., 2., N+1)
+    yref[:, 1] = 0.1
+    # the last entry of the terminal row isn't part of the terminal cost
+    yref[N, 2] = 1e3
+
+    self.solver.set_all('yref', yref)
+    x_all, u_all = self._solve(self.solver, x0)
+
+    solver = LateralMpc().solver
+    for stage in range(N):
+      solver.cost_set(stage, 'yref', yref[stage])
+    solver.cost_set(N, 'yref', yref[N, :COST_E_DIM])
+    x, u = self._solve(solver, x0)
+
+    np.testing.assert_array_equal(x_all, x)
+    np.testing.assert_array_equal(u_all, u)
+
+  def test_dimension_mismatch(self):
+    bad_values = (
+      ('x', np.zeros((N, X_DIM))),
+      ('x', np.zeros((N+1, X_DIM - 1))),
+      ('x', np.zeros((N+1, X_DIM + 1))),
+      ('u', np.zeros((N+1, U_DIM))),
+      ('u', np.zeros((N, U_DIM + 1))),
+      ('yref', np.zeros((N, COST_DIM))),
+      ('yref', np.zeros((N+1, COST_E_DIM))),
+    )
+    for field, value in bad_values:
+      with self.subTest(field=field, shape=value.shape):
+        with self.assertRaises(Exception):
+          self.solver.set_all(field, value)
+
+    with self.assertRaises(ValueError):
+      self.solver.set_all('x', np.zeros(X_DIM))
+    for field in ('lbx', 'W'):
+      with self.assertRaises(Exception):
+        self.solver.set_all(field, np.zeros((N+1, X_DIM)))
+      with self.assertRaises(Exception):
+        self.solver.get_all(field)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import unittest
+
+import numpy as np
+
+from selfdrive.controls.lib.longitudinal_mpc_lib.long_mpc import LongitudinalMpc, N, T_IDXS, X_DIM
+
+GARBAGE = 1e3
+
+
+class FailingSolver:
+  """Leaves a garbage iterate in the solver and reports a failed solve."""
+  def __init__(self, solver):
+    self.solver = solver
+
+  def solve(self):
+    self.solver.set_all('x', np.full((N+1, X_DIM), GARBAGE))
+    return 4
+
+  def __getattr__(self, name):
+    return getattr(self.solver, name)
+
+
+class TestLongitudinalMpc(unittest.TestCase):
+  def _update(self, mpc, v=10.):
+    mpc.set_cur_state(v, 0.)
+    mpc.update_with_xva(v * T_IDXS, v * np.ones(N+1), np.zeros(N+1))
+
+  def test_failed_solve_is_not_published(self):
+    mpc = LongitudinalMpc(e2e=True)
+    self._update(mpc)
+    self.assertEqual(mpc.solution_status, 0)
+    good_a = np.copy(mpc.a_solution)
+
+    mpc.solver = FailingSolver(mpc.solver)
+    self._update(mpc)
+    self.assertEqual(mpc.solver_failures_total, 1)
+    self.assertEqual(mpc.crash_cnt, 0)
+
+    # the plan comes from the warm start, which is the last good solution shifted by one step
+    for sol in (mpc.x_sol, mpc.v_solution, mpc.a_solution, mpc.j_solution, mpc.prev_a):
+      self.assertTrue(np.all(np.abs(sol) < GARBAGE))
+    np.testing.assert_allclose(mpc.a_solution[1:], np.interp(T_IDXS + 0.05, T_IDXS, good_a)[1:])
+    np.testing.assert_equal(mpc.j_solution, np.zeros(N))
+    np.testing.assert_allclose(mpc.solver.get_all('x'), mpc.x_sol)
+    np.testing.assert_equal(mpc.solver.get_all('u'), np.zeros((N, 1)))
+
+    # and the next solve starts from it again, the failure count is kept
+    mpc.solver = mpc.solver.solver
+    self._update(mpc)
+    self.assertEqual(mpc.solution_status, 0)
+    self.assertTrue(np.all(np.abs(mpc.a_solution) < GARBAGE))
+    self.assertEqual(mpc.solver_failures_total, 1)
+    mpc.reset()
+    self.assertEqual(mpc.solver_failures_total, 1)
+
+  def test_consecutive_failures_advance_the_plan(self):
+    mpc = LongitudinalMpc(e2e=True)
+    self._update(mpc)
+    mpc.solver = FailingSolver(mpc.solver)
+
+    x_prev = None
+    for _ in range(3):
+      self._update(mpc)
+      if x_prev is not None:
+        # every failure shifts the plan it published last time, instead of the last good solve again
+        expected = np.column_stack([np.interp(T_IDXS + 0.05, T_IDXS, x_prev[:,j]) for j in range(X_DIM)])
+        expected[:,0] -= expected[0,0]
+        np.testing.assert_allclose(mpc.x_sol[1:], expected[1:])
+        self.assertFalse(np.allclose(mpc.x_sol[1:], x_prev[1:]))
+      x_prev = np.copy(mpc.x_sol)
+    self.assertEqual(mpc.solver_failures_total, 3)
+
+
+if __name__ == "__main__":
+  unittest.main()
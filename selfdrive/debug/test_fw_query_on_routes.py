@@ -9,7 +9,7 @@ from tqdm import tqdm
 from tools.lib.logreader import LogReader
 from tools.lib.route import Route
 from selfdrive.car.car_helpers import interface_names
-from selfdrive.car.fw_versions import match_fw_to_car_exact, match_fw_to_car_fuzzy, build_fw_dict
+from selfdrive.car.fw_versions import match_fw_to_car_exact, match_fw_to_car_fuzzy, match_fw_to_car_ranked, build_fw_dict
 from selfdrive.car.toyota.values import FW_VERSIONS as TOYOTA_FW_VERSIONS
 from selfdrive.car.honda.values import FW_VERSIONS as HONDA_FW_VERSIONS
 from selfdrive.car.hyundai.values import FW_VERSIONS as HYUNDAI_FW_VERSIONS
@@ -113,6 +113,7 @@ if __name__ == "__main__":
           print("Old style:", live_fingerprint, "Vin", msg.carParams.carVin)
           print("New style (exact):", exact_matches)
           print("New style (fuzzy):", fuzzy_matches)
+          print("Closest candidates:", match_fw_to_car_ranked(fw_versions_dict)[:3])
 
           for version in car_fw:
             subaddr = None if version.subAddress == 0 else hex(version.subAddress)
@@ -18,8 +18,8 @@ from selfdrive.swaglog import cloudlog
 MAX_ANGLE_OFFSET_DELTA = 20 * DT_MDL  # Max 20 deg/s
 
 class ParamsLearner:
-  def __init__(self, CP, steer_ratio, stiffness_factor, angle_offset):
-    self.kf = CarKalman(GENERATED_DIR, steer_ratio, stiffness_factor, angle_offset)
+  def __init__(self, CP, steer_ratio, stiffness_factor, angle_offset, record=False):
+    self.kf = CarKalman(GENERATED_DIR, steer_ratio, stiffness_factor, angle_offset, python_filter=record)
 
     self.kf.filter.set_global("mass", CP.mass)
     self.kf.filter.set_global("rotational_inertia", CP.rotationalInertia)
@@ -36,6 +36,16 @@ class ParamsLearner:
 
     self.valid = True
 
+    # with record, the estimate of every update is kept for offline smoothing,
+    # in separate runs wherever the filter time was reset
+    self.record = record
+    self.estimates = [[]]
+
+  def observe(self, t, kind, data, R=None):
+    estimate = self.kf.predict_and_observe(t, kind, data, R)
+    if self.record and estimate is not None:
+      self.estimates[-1].append(estimate)
+
   def handle_log(self, t, which, msg):
     if which == 'liveLocationKalman':
       yaw_rate = msg.angularVelocityCalibrated.value[2]
@@ -47,11 +57,11 @@ class ParamsLearner:
 
       if self.active:
         if msg.inputsOK and msg.posenetOK and yaw_rate_valid:
-          self.kf.predict_and_observe(t,
-                                      ObservationKind.ROAD_FRAME_YAW_RATE,
-                                      np.array([[-yaw_rate]]),
-                                      np.array([np.atleast_2d(yaw_rate_std**2)]))
-        self.kf.predict_and_observe(t, ObservationKind.ANGLE_OFFSET_FAST, np.array([[0]]))
+          self.observe(t,
+                       ObservationKind.ROAD_FRAME_YAW_RATE,
+                       np.array([[-yaw_rate]]),
+                       np.array([np.atleast_2d(yaw_rate_std**2)]))
+        self.observe(t, ObservationKind.ANGLE_OFFSET_FAST, np.array([[0]]))
 
     elif which == 'carState':
       self.steering_angle = msg.steeringAngleDeg
@@ -62,13 +72,15 @@ class ParamsLearner:
       self.active = self.speed > 5 and in_linear_region
 
       if self.active:
-        self.kf.predict_and_observe(t, ObservationKind.STEER_ANGLE, np.array([[math.radians(msg.steeringAngleDeg)]]))
-        self.kf.predict_and_observe(t, ObservationKind.ROAD_FRAME_X_SPEED, np.array([[self.speed]]))
+        self.observe(t, ObservationKind.STEER_ANGLE, np.array([[math.radians(msg.steeringAngleDeg)]]))
+        self.observe(t, ObservationKind.ROAD_FRAME_X_SPEED, np.array([[self.speed]]))
 
     if not self.active:
       # Reset time when stopped so uncertainty doesn't grow
       self.kf.filter.set_filter_time(t)
       self.kf.filter.reset_rewind()
+      if len(self.estimates[-1]):
+        self.estimates.append([])
 
 
 def main(sm=None, pm=None):
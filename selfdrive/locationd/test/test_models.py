@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+from rednose.helpers.tests.test_ekf_sym import compile_filter, missing_toolchain
+
+BASEDIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+MODELS_DIR = os.path.join(BASEDIR, "selfdrive", "locationd", "models")
+
+
+class TestModels(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    reason = missing_toolchain()
+    if reason is not None:
+      raise unittest.SkipTest(reason)
+
+  def _build(self, script, name):
+    folder = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, folder)
+    # generated the same way as by the SConscript, every update kind has to compile
+    env = dict(os.environ, PYTHONPATH=BASEDIR)
+    subprocess.check_call([sys.executable, os.path.join(MODELS_DIR, script), name, folder], env=env)
+    compile_filter(folder, name)
+
+  def test_car_kf(self):
+    self._build("car_kf.py", "car")
+
+  def test_live_kf(self):
+    self._build("live_kf.py", "live")
+
+
+if __name__ == "__main__":
+  unittest.main()
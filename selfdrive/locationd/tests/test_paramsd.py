@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+import unittest
+
+import numpy as np
+
+from selfdrive.locationd.paramsd import ParamsLearner
+from tools.lib.tests.test_params_refilter import STOP, car_params, synthetic_events
+
+
+class TestParamsLearner(unittest.TestCase):
+  def _run(self, record):
+    CP = car_params()
+    learner = ParamsLearner(CP, CP.steerRatio, 1.0, 0.0, record=record)
+    for msg in synthetic_events(CP):
+      which = msg.which()
+      if which != 'carParams':
+        learner.handle_log(msg.logMonoTime * 1e-9, which, getattr(msg, which))
+    return learner
+
+  def test_live_matches_record(self):
+    live = self._run(record=False)
+    recorded = self._run(record=True)
+
+    # live mode keeps no estimates around, and ends where the recording learner does
+    self.assertEqual(live.estimates, [[]])
+    np.testing.assert_allclose(live.kf.x, recorded.kf.x, rtol=1e-5)
+    np.testing.assert_allclose(live.kf.P, recorded.kf.P, rtol=1e-5, atol=1e-12)
+
+  def test_record_runs(self):
+    learner = self._run(record=True)
+
+    # the stop splits the estimates into two runs
+    runs = [r for r in learner.estimates if len(r)]
+    self.assertEqual(len(runs), 2)
+    for run, before_stop in zip(runs, (True, False)):
+      t = np.array([e[4] for e in run])
+      self.assertTrue(np.all(np.diff(t) >= 0))
+      self.assertTrue(np.all(t < STOP[0]) if before_stop else np.all(t >= STOP[1]))
+      for x_prior, x, P_prior, P, *_ in run:
+        self.assertEqual(x.shape, x_prior.shape)
+        self.assertEqual(P.shape, P_prior.shape)
+        self.assertTrue(np.all(np.isfinite(x)) and np.all(np.isfinite(P)))
+
+
+if __name__ == "__main__":
+  unittest.main()
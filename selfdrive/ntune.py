@@ -1,20 +1,41 @@
 import os
-import fcntl
-import signal
 import json
+import time
+import threading
+import weakref
 import numpy as np
+from collections import namedtuple
 
 from selfdrive.hardware import TICI
 
 CONF_PATH = '/data/ntune/'
 CONF_LQR_FILE = '/data/ntune/lat_lqr.json'
 
+# seconds between checks of the config files for changes
+WATCH_INTERVAL = 1.
+
 ntunes = {}
+_watched = weakref.WeakSet()  # instances drop out once their controller is gone
+_watcher_pid = None
+_lock = threading.RLock()
+
+
+def _watch():
+  while True:
+    time.sleep(WATCH_INTERVAL)
+    for ntune in list(_watched):
+      ntune.poll()
+
+
+def _start_watcher():
+  # the config files are watched from a thread, so no file io happens in a signal handler.
+  # a forked process needs its own thread
+  global _watcher_pid
+  with _lock:
+    if _watcher_pid != os.getpid():
+      _watcher_pid = os.getpid()
+      threading.Thread(target=_watch, name="ntune_watcher", daemon=True).start()
 
-def file_watch_handler(signum, frame):
-  global ntunes
-  for ntune in ntunes.values():
-    ntune.handle()
 
 class nTune():
   def __init__(self, CP=None, controller=None, group=None):
@@ -24,6 +45,9 @@ class nTune():
     self.lqr = None
     self.group = group
     self.config = {}
+    self.version = 0
+    self.snapshot = None
+    self.mtime = None
 
     if "LatControlLQR" in str(type(controller)):
       self.lqr = controller
@@ -39,26 +63,45 @@ class nTune():
     if not os.path.exists(CONF_PATH):
       os.makedirs(CONF_PATH)
 
+    self.mtime = self.get_mtime()
     self.read()
 
-    try:
-      signal.signal(signal.SIGIO, file_watch_handler)
-      fd = os.open(CONF_PATH, os.O_RDONLY)
-      fcntl.fcntl(fd, fcntl.F_SETSIG, 0)
-      fcntl.fcntl(fd, fcntl.F_NOTIFY, fcntl.DN_MODIFY | fcntl.DN_CREATE | fcntl.DN_MULTISHOT)
-    except Exception as ex:
-      print("exception", ex)
-      pass
+    _watched.add(self)
+    _start_watcher()
 
-  def handle(self):
+  def get_mtime(self):
+    try:
+      return os.stat(self.file).st_mtime_ns
+    except OSError:
+      return None
+
+  def poll(self):  # called by the watcher thread
+    with _lock:
+      mtime = self.get_mtime()
+      if mtime is not None and mtime != self.mtime:
+        self.handle(mtime)
+
+  def publish(self):
+    # replace the snapshot as a whole, so readers never see a half updated config
+    self.version += 1
+    keys = [k for k in self.config if k.isidentifier() and k != 'version']
+    snapshot_type = namedtuple('nTuneConfig', keys + ['version'])
+    self.snapshot = snapshot_type(*[self.config[k] for k in keys], self.version)
+
+  def handle(self, mtime=None):
     try:
       if os.path.getsize(self.file) > 0:
         with open(self.file, 'r') as f:
           self.config = json.load(f)
 
+        # only a file that parsed counts as seen, a half written one is read again on the next poll
+        if mtime is not None:
+          self.mtime = mtime
+
         if self.checkValid():
           self.write_config(self.config)
 
+        self.publish()
         self.invalidated = True
 
     except:
@@ -94,6 +137,8 @@ class nTune():
       except:
         pass
 
+    self.publish()
+
   def checkValue(self, key, min_, max_, default_):
     updated = False
 
@@ -195,13 +240,14 @@ class nTune():
     return updated
 
   def updateLQR(self):
+    config = self.snapshot._asdict() if self.snapshot is not None else self.config
 
-    self.lqr.scale = float(self.config["scale"])
-    self.lqr.ki = float(self.config["ki"])
+    self.lqr.scale = float(config["scale"])
+    self.lqr.ki = float(config["ki"])
 
-    self.lqr.dc_gain = float(self.config["dcGain"])
+    self.lqr.dc_gain = float(config["dcGain"])
 
-    self.lqr.sat_limit = float(self.config["steerLimitTimer"])
+    self.lqr.sat_limit = float(config["steerLimitTimer"])
 
     self.lqr.x_hat = np.array([[0], [0]])
     self.lqr.reset()
@@ -252,23 +298,39 @@ class nTune():
       except:
         pass
 
-def ntune_get(group, key):
-  global ntunes
-  if group not in ntunes:
-    ntunes[group] = nTune(group=group)
+    # our own writes aren't changes for the watcher
+    self.mtime = self.get_mtime()
 
-  ntune = ntunes[group]
+def ntune_config(group):
+  """Returns the current config of a group as an immutable snapshot with one attribute per key.
 
-  if ntune.config == None or key not in ntune.config:
-    ntune.read()
+     Hot loops should get the snapshot once per cycle and read its attributes,
+     e.g. ntune_scc().distanceGap. A new snapshot with a higher version replaces
+     it when the file changes.
+  """
+  ntune = ntunes.get(group)
+  if ntune is None:
+    with _lock:
+      if group not in ntunes:
+        ntunes[group] = nTune(group=group)
+    ntune = ntunes[group]
 
-  v = ntune.config[key]
+  return ntune.snapshot
 
-  if v is None:
-    ntune.read()
-    v = ntune.config[key]
+def ntune_get(group, key):
+  config = ntune_config(group)
+  if key in config._fields:
+    return getattr(config, key)
+
+  # keys that aren't identifiers have no attribute, and new keys may not be loaded yet
+  ntune = ntunes[group]
+  with _lock:
+    if key not in ntune.config:
+      ntune.read()
+    return ntune.config.get(key)
 
-  return v
+def ntune_common():
+  return ntune_config("common")
 
 def ntune_common_get(key):
   return ntune_get("common", key)
@@ -276,5 +338,8 @@ def ntune_common_get(key):
 def ntune_common_enabled(key):
   return ntune_common_get(key) > 0.5
 
+def ntune_scc():
+  return ntune_config("scc")
+
 def ntune_scc_get(key):
   return ntune_get("scc", key)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import gc
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+import weakref
+from unittest import mock
+
+import selfdrive.ntune as ntune
+
+
+def write_file(path, config, mtime_ns):
+  # replaced in one step with a given mtime, like an edit done at another time
+  with open(path + ".tmp", "w") as f:
+    json.dump(config, f)
+  os.utime(path + ".tmp", ns=(mtime_ns, mtime_ns))
+  os.replace(path + ".tmp", path)
+
+
+class TestNTune(unittest.TestCase):
+  def setUp(self):
+    self.conf_path = tempfile.mkdtemp() + "/"
+    self.addCleanup(shutil.rmtree, self.conf_path)
+    for name, value in (("CONF_PATH", self.conf_path), ("ntunes", {}), ("_watched", weakref.WeakSet())):
+      patcher = mock.patch.object(ntune, name, value)
+      patcher.start()
+      self.addCleanup(patcher.stop)
+
+  def _edit(self, group, **changes):
+    path = self.conf_path + group + ".json"
+    with open(path) as f:
+      config = json.load(f)
+    config.update(changes)
+    # an hour ago, so a write by nTune can't end up with the same mtime
+    write_file(path, config, time.time_ns() - 3600 * 10**9)
+    return path
+
+  def test_snapshot(self):
+    config = ntune.ntune_scc()
+    self.assertIs(ntune.ntune_config("scc"), config)
+    self.assertEqual(config.version, 1)
+    self.assertEqual(config.distanceGap, 0)
+    self.assertEqual(config.leadAccelTau, 3.0)
+    self.assertEqual(ntune.ntune_scc_get("leadAccelTau"), 3.0)
+    with self.assertRaises(AttributeError):
+      config.distanceGap = 2
+
+    # the defaults were written out
+    with open(self.conf_path + "scc.json") as f:
+      self.assertEqual(json.load(f)["leadAccelTau"], 3.0)
+
+  def test_reload(self):
+    old = ntune.ntune_scc()
+    path = self._edit("scc", distanceGap=2, leadAccelTau=20.)
+    ntune.ntunes["scc"].poll()
+
+    # a new snapshot with the clamped values replaces the old one, which stays as it was
+    new = ntune.ntune_scc()
+    self.assertEqual((new.version, new.distanceGap, new.leadAccelTau), (2, 2, 10.))
+    self.assertEqual((old.version, old.distanceGap, old.leadAccelTau), (1, 0, 3.))
+    with open(path) as f:
+      self.assertEqual(json.load(f)["leadAccelTau"], 10.)
+
+    # writing the clamped values back isn't a change
+    ntune.ntunes["scc"].poll()
+    self.assertIs(ntune.ntune_scc(), new)
+
+  def test_reload_after_partial_write(self):
+    ntune.ntune_scc()
+    path = self.conf_path + "scc.json"
+    with open(path) as f:
+      config = json.load(f)
+    mtime_ns = time.time_ns() - 3600 * 10**9
+
+    # read while half written, the same mtime is kept when the write completes
+    with open(path, "w") as f:
+      f.write('{"distanceGap": 3, ')
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    ntune.ntunes["scc"].poll()
+    self.assertEqual(ntune.ntune_scc().version, 1)
+
+    config["distanceGap"] = 3
+    write_file(path, config, mtime_ns)
+    ntune.ntunes["scc"].poll()
+    self.assertEqual(ntune.ntune_scc().version, 2)
+    self.assertEqual(ntune.ntune_scc().distanceGap, 3)
+
+  def test_watcher(self):
+    ntune.ntune_scc()
+    self._edit("scc", distanceGap=3)
+    with mock.patch.object(ntune, "WATCH_INTERVAL", 0.01):
+      ntune._start_watcher()
+      for _ in range(500):
+        if ntune.ntune_scc().version > 1:
+          break
+        time.sleep(0.01)
+    self.assertEqual(ntune.ntune_scc().version, 2)
+    self.assertEqual(ntune.ntune_scc().distanceGap, 3)
+
+  def test_get_fallback(self):
+    ntune.ntune_scc()
+    self._edit("scc", **{"lead-gap": 1.5})
+
+    # keys that aren't attributes of the snapshot, or not loaded yet, are read from the file
+    self.assertEqual(ntune.ntune_scc_get("lead-gap"), 1.5)
+    self._edit("scc", newKey=4)
+    self.assertEqual(ntune.ntune_scc_get("newKey"), 4)
+    self.assertIsNone(ntune.ntune_scc_get("missing"))
+
+  def test_watched_pruned(self):
+    tune = ntune.nTune(group="scc")
+    self.assertIn(tune, ntune._watched)
+    del tune
+    gc.collect()
+    self.assertEqual(len(ntune._watched), 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,179 @@
+import os
+import re
+import time
+import zlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from common.file_helpers import mkdirs_exists_ok, atomic_write_in_dir, rm_not_exists_ok
+
+INDEX_FILENAME = "index.sqlite"
+# bumped when files from an older layout have been imported into the index
+INDEX_VERSION = 1
+
+# files of the layout URLFile used before the index: <hash>_length and <hash>_<chunk>.0
+LEGACY_LENGTH_RE = re.compile(r'^(.+)_length$')
+LEGACY_CHUNK_RE = re.compile(r'^(.+_\d+)\.0$')
+
+
+class DownloadCache:
+  """Size bounded on-disk cache of chunks of data, shared by all processes using the same directory.
+
+     File lengths, chunk sizes, checksums and access times are kept in a single
+     sqlite index. When the chunks exceed max_size bytes, the least recently used
+     ones are evicted. Chunks whose size or checksum don't match the index are
+     treated as missing. Length and chunk files of the older URLFile layout are
+     imported into the index the first time a directory is opened.
+  """
+  def __init__(self, cache_dir, max_size):
+    self.cache_dir = cache_dir
+    self.max_size = max_size
+
+    self._lock = threading.Lock()
+    # one sqlite connection per process, shared by its threads
+    self._conn_lock = threading.Lock()
+    self._conn = None
+    self._conn_pid = None
+    self.hits = 0
+    self.misses = 0
+    self.bytes_from_cache = 0
+    self.bytes_from_network = 0
+
+  def _connect(self):
+    """Returns the connection of this process, opening it and setting up the index on first use.
+
+       Must be called with _conn_lock held.
+    """
+    index_path = os.path.join(self.cache_dir, INDEX_FILENAME)
+    # sqlite connections can't be shared with a forked process, and the directory can be removed under us
+    if self._conn is None or self._conn_pid != os.getpid() or not os.path.exists(index_path):
+      mkdirs_exists_ok(self.cache_dir)
+      conn = sqlite3.connect(index_path, timeout=60, check_same_thread=False)
+      with conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS lengths (key TEXT PRIMARY KEY, length INTEGER)")
+        conn.execute("CREATE TABLE IF NOT EXISTS chunks (name TEXT PRIMARY KEY, size INTEGER, crc INTEGER, atime REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS chunks_atime ON chunks (atime)")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_VERSION:
+          self._import_legacy(conn)
+          conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+      self._conn = conn
+      self._conn_pid = os.getpid()
+    return self._conn
+
+  def _import_legacy(self, conn):
+    for fn in os.listdir(self.cache_dir):
+      path = os.path.join(self.cache_dir, fn)
+      length_match, chunk_match = LEGACY_LENGTH_RE.match(fn), LEGACY_CHUNK_RE.match(fn)
+      try:
+        if length_match is not None:
+          with open(path) as f:
+            conn.execute("INSERT OR IGNORE INTO lengths VALUES (?, ?)", (length_match.group(1), int(f.read())))
+          os.remove(path)
+        elif chunk_match is not None:
+          with open(path, "rb") as f:
+            data = f.read()
+          name, atime = chunk_match.group(1), os.path.getmtime(path)
+          os.replace(path, os.path.join(self.cache_dir, name))
+          conn.execute("INSERT OR IGNORE INTO chunks VALUES (?, ?, ?, ?)", (name, len(data), zlib.crc32(data), atime))
+      except (OSError, ValueError):
+        rm_not_exists_ok(path)
+
+  @contextmanager
+  def _transaction(self):
+    with self._conn_lock:
+      conn = self._connect()
+      with conn:
+        yield conn
+
+  def get_length(self, key):
+    with self._transaction() as conn:
+      row = conn.execute("SELECT length FROM lengths WHERE key = ?", (key,)).fetchone()
+    return row[0] if row is not None else None
+
+  def put_length(self, key, length):
+    with self._transaction() as conn:
+      conn.execute("INSERT OR REPLACE INTO lengths VALUES (?, ?)", (key, length))
+
+  def _touch(self, name):
+    with self._transaction() as conn:
+      conn.execute("UPDATE chunks SET atime = ? WHERE name = ?", (time.time(), name))
+
+  def get_chunk(self, name):
+    with self._transaction() as conn:
+      row = conn.execute("SELECT size, crc FROM chunks WHERE name = ?", (name,)).fetchone()
+    data = None
+    if row is not None:
+      try:
+        with open(os.path.join(self.cache_dir, name), "rb") as cached_file:
+          data = cached_file.read()
+      except FileNotFoundError:
+        pass
+    if data is None or len(data) != row[0] or zlib.crc32(data) != row[1]:
+      with self._lock:
+        self.misses += 1
+      return None
+
+    self._touch(name)
+    with self._lock:
+      self.hits += 1
+      self.bytes_from_cache += len(data)
+    return data
+
+  def get_path(self, name):
+    """Like get_chunk, but returns the path of the chunk file so it can be mapped instead of read.
+
+       Only the size of the file is verified.
+    """
+    path = os.path.join(self.cache_dir, name)
+    with self._transaction() as conn:
+      row = conn.execute("SELECT size FROM chunks WHERE name = ?", (name,)).fetchone()
+    if row is None or not os.path.exists(path) or os.path.getsize(path) != row[0]:
+      with self._lock:
+        self.misses += 1
+      return None
+
+    self._touch(name)
+    with self._lock:
+      self.hits += 1
+      self.bytes_from_cache += row[0]
+    return path
+
+  def put_chunk(self, name, data):
+    with self._lock:
+      self.bytes_from_network += len(data)
+
+    mkdirs_exists_ok(self.cache_dir)
+    with atomic_write_in_dir(os.path.join(self.cache_dir, name), mode="wb", overwrite=True) as new_cached_file:
+      new_cached_file.write(data)
+    with self._transaction() as conn:
+      conn.execute("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)", (name, len(data), zlib.crc32(data), time.time()))
+    self.evict()
+
+  def evict(self):
+    evicted = []
+    with self._transaction() as conn:
+      total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM chunks").fetchone()[0]
+      if total_size <= self.max_size:
+        return
+
+      for name, size in conn.execute("SELECT name, size FROM chunks ORDER BY atime"):
+        if total_size <= self.max_size:
+          break
+        evicted.append(name)
+        total_size -= size
+      conn.executemany("DELETE FROM chunks WHERE name = ?", [(name,) for name in evicted])
+
+    for name in evicted:
+      rm_not_exists_ok(os.path.join(self.cache_dir, name))
+
+  def stats(self):
+    with self._lock:
+      requests = self.hits + self.misses
+      return {
+        'hits': self.hits,
+        'misses': self.misses,
+        'hit_rate': self.hits / requests if requests else 0.,
+        'bytes_from_cache': self.bytes_from_cache,
+        'bytes_from_network': self.bytes_from_network,
+      }
@@ -13,8 +13,10 @@ import numpy as np
 from lru import LRU
 
 import _io
-from tools.lib.cache import cache_path_for_file_path
+from tools.lib.cache import DEFAULT_CACHE_DIR, cache_path_for_file_path
+from tools.lib.download_cache import DownloadCache
 from tools.lib.exceptions import DataUnreadableError
+from tools.lib.url_file import URLFile, hash_256
 from common.file_helpers import atomic_write_in_dir
 
 try:
@@ -26,12 +28,19 @@ HEVC_SLICE_B = 0
 HEVC_SLICE_P = 1
 HEVC_SLICE_I = 2
 
+GOP_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, "gops")
+GOP_CACHE_MAX_SIZE = int(float(os.environ.get("FRAMEREADER_GOP_CACHE_MAX_SIZE", 50e9)))
+
 
 class GOPReader:
   def get_gop(self, num):
     # returns (start_frame_num, num_frames, frames_to_skip, gop_data)
     raise NotImplementedError
 
+  def lookup_gop(self, num):
+    # returns (start_frame_num, num_frames) without reading the gop
+    raise NotImplementedError
+
 
 class DoNothingContextManager:
   def __enter__(self):
@@ -238,12 +247,16 @@ def decompress_video_data(rawdat, vid_fmt, w, h, pix_fmt):
     if proc.wait() != 0:
       raise DataUnreadableError("ffmpeg failed")
 
+  return frames_from_buffer(np.frombuffer(dat, dtype=np.uint8), w, h, pix_fmt)
+
+
+def frames_from_buffer(dat, w, h, pix_fmt):
   if pix_fmt == "rgb24":
-    ret = np.frombuffer(dat, dtype=np.uint8).reshape(-1, h, w, 3)
+    ret = dat.reshape(-1, h, w, 3)
   elif pix_fmt == "yuv420p":
-    ret = np.frombuffer(dat, dtype=np.uint8).reshape(-1, (h*w*3//2))
+    ret = dat.reshape(-1, (h*w*3//2))
   elif pix_fmt == "yuv444p":
-    ret = np.frombuffer(dat, dtype=np.uint8).reshape(-1, 3, h, w)
+    ret = dat.reshape(-1, 3, h, w)
   else:
     raise NotImplementedError
 
@@ -266,14 +279,14 @@ class BaseFrameReader:
     raise NotImplementedError
 
 
-def FrameReader(fn, cache_prefix=None, readahead=False, readbehind=False, index_data=None):
+def FrameReader(fn, cache_prefix=None, readahead=False, readbehind=False, index_data=None, gop_cache=False):
   frame_type = fingerprint_video(fn)
   if frame_type == FrameType.raw:
     return RawFrameReader(fn)
   elif frame_type in (FrameType.h265_stream,):
     if not index_data:
       index_data = get_video_index(fn, frame_type, cache_prefix)
-    return StreamFrameReader(fn, frame_type, index_data, readahead=readahead, readbehind=readbehind)
+    return StreamFrameReader(fn, frame_type, index_data, readahead=readahead, readbehind=readbehind, gop_cache=gop_cache)
   else:
     raise NotImplementedError(frame_type)
 
@@ -447,6 +460,10 @@ class StreamGOPReader(GOPReader):
 
     return (frame_b, frame_e, offset_b, offset_e)
 
+  def lookup_gop(self, num):
+    frame_b, frame_e, _, _ = self._lookup_gop(num)
+    return frame_b, frame_e - frame_b
+
   def get_gop(self, num):
     frame_b, frame_e, offset_b, offset_e = self._lookup_gop(num)
     assert frame_b <= num < frame_e
@@ -472,13 +489,16 @@ class StreamGOPReader(GOPReader):
 
 class GOPFrameReader(BaseFrameReader):
   #FrameReader with caching and readahead for formats that are group-of-picture based
+  #With gop_cache, decoded gops are also kept on disk and shared by all processes
 
-  def __init__(self, readahead=False, readbehind=False):
+  def __init__(self, readahead=False, readbehind=False, gop_cache=False):
     self.open_ = True
 
     self.readahead = readahead
     self.readbehind = readbehind
     self.frame_cache = LRU(64)
+    self.gop_cache = DownloadCache(GOP_CACHE_DIR, GOP_CACHE_MAX_SIZE) if gop_cache else None
+    self._gop_cache_key = None
 
     if self.readahead:
       self.cache_lock = threading.RLock()
@@ -533,17 +553,48 @@ class GOPFrameReader(BaseFrameReader):
       if (num, pix_fmt) in self.frame_cache:
         return self.frame_cache[(num, pix_fmt)]
 
-      frame_b, num_frames, skip_frames, rawdat = self.get_gop(num)
-
-      ret = decompress_video_data(rawdat, self.vid_fmt, self.w, self.h, pix_fmt)
-      ret = ret[skip_frames:]
-      assert ret.shape[0] == num_frames
+      frame_b, ret = self._decode_gop(num, pix_fmt)
 
       for i in range(ret.shape[0]):
         self.frame_cache[(frame_b+i, pix_fmt)] = ret[i]
 
       return self.frame_cache[(num, pix_fmt)]
 
+  def _video_key(self):
+    # the path and what identifies its current contents, so a replaced video isn't served from old gops
+    if self._gop_cache_key is None:
+      if "://" in self.fn:
+        self._gop_cache_key = f"{hash_256(self.fn)}_{URLFile(self.fn).get_length_online()}"
+      else:
+        st = os.stat(self.fn)
+        self._gop_cache_key = f"{hash_256(os.path.abspath(self.fn))}_{st.st_size}_{st.st_mtime_ns}"
+    return self._gop_cache_key
+
+  def _decode_gop(self, num, pix_fmt):
+    if self.gop_cache is not None:
+      frame_b, num_frames = self.lookup_gop(num)
+      cache_name = f"{self._video_key()}_{frame_b}_{pix_fmt}"
+      cache_path = self.gop_cache.get_path(cache_name)
+      if cache_path is not None:
+        frame_size = self.w * self.h * 3 // 2 if pix_fmt == "yuv420p" else self.w * self.h * 3
+        try:
+          # a cut short file can't be mapped, or would map to fewer frames
+          if os.path.getsize(cache_path) == num_frames * frame_size:
+            return frame_b, frames_from_buffer(np.memmap(cache_path, dtype=np.uint8, mode='r'), self.w, self.h, pix_fmt)
+        except (OSError, ValueError):
+          # evicted or replaced by another reader since get_path, decode it again
+          pass
+
+    frame_b, num_frames, skip_frames, rawdat = self.get_gop(num)
+
+    ret = decompress_video_data(rawdat, self.vid_fmt, self.w, self.h, pix_fmt)
+    ret = ret[skip_frames:]
+    assert ret.shape[0] == num_frames
+
+    if self.gop_cache is not None:
+      self.gop_cache.put_chunk(cache_name, ret.tobytes())
+    return frame_b, ret
+
   def get(self, num, count=1, pix_fmt="yuv420p"):
     assert self.frame_count is not None
 
@@ -565,9 +616,9 @@ class GOPFrameReader(BaseFrameReader):
 
 
 class StreamFrameReader(StreamGOPReader, GOPFrameReader):
-  def __init__(self, fn, frame_type, index_data, readahead=False, readbehind=False):
+  def __init__(self, fn, frame_type, index_data, readahead=False, readbehind=False, gop_cache=False):
     StreamGOPReader.__init__(self, fn, frame_type, index_data)
-    GOPFrameReader.__init__(self, readahead, readbehind)
+    GOPFrameReader.__init__(self, readahead, readbehind, gop_cache)
 
 
 def GOPFrameIterator(gop_reader, pix_fmt):
@@ -0,0 +1,107 @@
+import os
+import json
+import pickle
+import multiprocessing
+from hashlib import sha256
+from functools import reduce
+
+import numpy as np
+from numpy.lib.recfunctions import stack_arrays
+
+from tools.lib.cache import cache_path_for_file_path
+from tools.lib.logreader import LogReader, _source_stamp
+from common.file_helpers import atomic_write_in_dir
+from cereal import log as capnp_log
+
+# bump when the layout of the cached columns changes
+COLUMNS_VERSION = 2
+
+
+def _get_field(msg, path):
+  return reduce(getattr, path.split("."), msg)
+
+
+def _to_value(value):
+  return str(value) if not isinstance(value, (bool, int, float)) else value
+
+
+def _column_dtype(service, field):
+  # the type a column of field gets from its values, taken from the default value in the schema,
+  # so an empty column can be concatenated with the ones of logs that have the service
+  value = _to_value(_get_field(capnp_log.Event.new_message().init(service), field))
+  for typ, dtype in ((bool, np.bool_), (int, np.int64), (float, np.float64)):
+    if isinstance(value, typ):
+      return dtype
+  return np.str_
+
+
+def _to_table(service, mono_times, columns):
+  arrays = [np.array(mono_times, dtype=np.uint64)]
+  arrays += [np.array(v) if len(v) else np.array(v, dtype=_column_dtype(service, f)) for f, v in columns.items()]
+  names = ['logMonoTime'] + list(columns.keys())
+  return np.rec.fromarrays(arrays, names=names)
+
+
+def events_to_columns(events, fields):
+  """Converts an iterable of events into one structured NumPy array per service.
+
+     fields maps service names to lists of scalar fields, using dots for nested
+     structs, e.g. {'carState': ['vEgo', 'cruiseState.speed']}. Every table also
+     has a logMonoTime column.
+  """
+  mono_times = {service: [] for service in fields}
+  columns = {service: {f: [] for f in fields[service]} for service in fields}
+  for msg in events:
+    service = msg.which()
+    if service not in fields:
+      continue
+
+    mono_times[service].append(msg.logMonoTime)
+    data = getattr(msg, service)
+    for f, values in columns[service].items():
+      values.append(_to_value(_get_field(data, f)))
+
+  return {service: _to_table(service, mono_times[service], columns[service]) for service in fields}
+
+
+def _cache_path(fn, fields):
+  key = sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()[:16]
+  return cache_path_for_file_path(fn) + f"_columns_{key}"
+
+
+def log_to_columns(fn, fields, cache=True):
+  """Returns the requested fields of the log fn as column tables, see events_to_columns.
+
+     Results are kept in the ~/.commacache directory, keyed by log and fields,
+     and recomputed when the log changed since they were cached.
+  """
+  cache_path = _cache_path(fn, fields) if cache else None
+  stamp = _source_stamp(fn) if cache else None
+  if cache_path and os.path.exists(cache_path):
+    with open(cache_path, "rb") as cache_file:
+      cache_value = pickle.load(cache_file)
+    if cache_value['version'] == COLUMNS_VERSION and cache_value['source'] == stamp:
+      return cache_value['tables']
+
+  tables = events_to_columns(LogReader(fn, services=list(fields)), fields)
+
+  if cache_path:
+    with atomic_write_in_dir(cache_path, mode="wb", overwrite=True) as cache_file:
+      pickle.dump({'version': COLUMNS_VERSION, 'source': stamp, 'tables': tables}, cache_file, -1)
+  return tables
+
+
+def route_to_columns(log_paths, fields, cache=True, processes=None):
+  """Returns the requested fields of a whole route, e.g. Route.log_paths(), as column tables.
+
+     Logs are converted in a pool of processes and their tables concatenated in order.
+  """
+  log_paths = [p for p in log_paths if p is not None]
+  if len(log_paths) == 0:
+    return events_to_columns([], fields)
+
+  with multiprocessing.Pool(processes) as pool:
+    tables = pool.starmap(log_to_columns, [(fn, fields, cache) for fn in log_paths])
+
+  return {service: stack_arrays([t[service] for t in tables], usemask=False, asrecarray=True, autoconvert=True)
+          for service in fields}
@@ -2,62 +2,361 @@
 import os
 import sys
 import bz2
+import mmap
+import pickle
+import struct
 import urllib.parse
+import multiprocessing
+from collections import deque
+from itertools import islice
 import capnp
+import numpy as np
 
 try:
   from xx.chffr.lib.filereader import FileReader
 except ImportError:
   from tools.lib.filereader import FileReader
+from tools.lib.url_file import URLFile
+from tools.lib.cache import cache_path_for_file_path
+from tools.lib.exceptions import DataUnreadableError
+from common.file_helpers import atomic_write_in_dir
 from cereal import log as capnp_log
 
-# this is an iterator itself, and uses private variables from LogReader
+# compressed bytes requested from the FileReader per read in streaming mode
+STREAM_READ_SIZE = 1024 * 1024
+# upper bound on decompressed bytes buffered at once in streaming mode
+STREAM_WINDOW = 16 * 1024 * 1024
+
+
+# capnp's marker for struct fields that aren't part of a union
+NO_DISCRIMINANT = 0xffff
+_event_schema = capnp_log.Event.schema.node.struct
+EVENT_DISCRIMINANT_OFFSET = _event_schema.discriminantOffset
+EVENT_DISCRIMINANTS = {f.name: f.discriminantValue for f in _event_schema.fields if f.discriminantValue != NO_DISCRIMINANT}
+EVENT_MONO_TIME_OFFSET = next(f.slot.offset for f in _event_schema.fields if f.name == 'logMonoTime')
+
+# bump when the layout of the cached log indexes changes
+LOG_INDEX_VERSION = 2
+LOG_INDEX_DTYPE = np.dtype([('mono_time', '<u8'), ('offset', '<u8'), ('which', '<u2')])
+
+
+def _header_length(buf, pos):
+  """Returns the size in bytes of the segment table of the capnp message starting at pos."""
+  num_segments = struct.unpack_from("<I", buf, pos)[0] + 1
+  header_len = 4 * (num_segments + 1)
+  return header_len + header_len % 8  # segment table is padded to a word boundary
+
+
+def _frame_length(buf, pos):
+  """Returns the size in bytes of the capnp message starting at pos, or None if buf doesn't hold its whole header."""
+  if len(buf) - pos < 4:
+    return None
+  header_len = _header_length(buf, pos)
+  if len(buf) - pos < header_len:
+    return None
+  num_segments = struct.unpack_from("<I", buf, pos)[0] + 1
+  segment_words = struct.unpack_from(f"<{num_segments}I", buf, pos + 4)
+  return header_len + 8 * sum(segment_words)
+
+
+def _split_frames(buf, pos=0):
+  """Yields (offset, length) of every complete capnp message in buf starting at pos."""
+  while True:
+    length = _frame_length(buf, pos)
+    if length is None or len(buf) - pos < length:
+      return
+    yield pos, length
+    pos += length
+
+
+def _peek_event(buf, pos):
+  """Returns (union discriminant, logMonoTime) of the Event message starting at pos without decoding it.
+
+     The discriminant is None if the message holds a union member this schema doesn't know about.
+  """
+  root_ptr_pos = pos + _header_length(buf, pos)
+  root_ptr = struct.unpack_from("<Q", buf, root_ptr_pos)[0]
+  if root_ptr & 3 != 0:
+    # root isn't a plain struct pointer (loggerd never writes these), let capnp resolve it
+    ent = capnp_log.Event.from_bytes(bytes(buf[pos:pos + _frame_length(buf, pos)]))
+    try:
+      return EVENT_DISCRIMINANTS[ent.which()], ent.logMonoTime
+    except capnp.lib.capnp.KjException:
+      return None, ent.logMonoTime
+
+  offset = (root_ptr & 0xffffffff) >> 2
+  if offset >= 1 << 29:
+    offset -= 1 << 30
+  data_words = (root_ptr >> 32) & 0xffff
+  data_pos = root_ptr_pos + 8 * (1 + offset)
+
+  # fields past the end of an older, smaller struct have their default value
+  mono_time = 0
+  if 8 * (EVENT_MONO_TIME_OFFSET + 1) <= 8 * data_words:
+    mono_time = struct.unpack_from("<Q", buf, data_pos + 8 * EVENT_MONO_TIME_OFFSET)[0]
+  which = 0
+  if 2 * (EVENT_DISCRIMINANT_OFFSET + 1) <= 8 * data_words:
+    which = struct.unpack_from("<H", buf, data_pos + 2 * EVENT_DISCRIMINANT_OFFSET)[0]
+  return which, mono_time
+
+
+def _iter_frames(chunks, which=None):
+  """Splits a stream of byte chunks into complete capnp messages.
+
+     If which is a set of Event union discriminants, messages of other types are
+     dropped before being copied out of the stream.
+  """
+  tail = b""
+  for chunk in chunks:
+    buf = tail + chunk if len(tail) else chunk
+    end = 0
+    for pos, length in _split_frames(buf):
+      end = pos + length
+      if which is None or _peek_event(buf, pos)[0] in which:
+        yield buf[pos:end]
+    tail = buf[end:]
+
+  if len(tail):
+    raise DataUnreadableError(f"log ends with a truncated message ({len(tail)} bytes)")
+
+
+def _service_discriminants(services):
+  if services is None:
+    return None
+  unknown = set(services) - EVENT_DISCRIMINANTS.keys()
+  if unknown:
+    raise ValueError(f"unknown services {sorted(unknown)}")
+  return {EVENT_DISCRIMINANTS[s] for s in services}
+
+
+def _read_decompressed(fn):
+  _, ext = os.path.splitext(urllib.parse.urlparse(fn).path)
+  with FileReader(fn) as f:
+    dat = f.read()
+
+  if ext == "":
+    # old rlogs weren't bz2 compressed
+    return dat
+  elif ext == ".bz2":
+    return bz2.decompress(dat)
+  else:
+    raise Exception(f"unknown extension {ext}")
+
+
+def build_log_index(dat):
+  """Indexes every event in the decompressed log dat by logMonoTime, byte offset and union discriminant."""
+  entries = []
+  for pos, _ in _split_frames(dat):
+    which, mono_time = _peek_event(dat, pos)
+    entries.append((mono_time, pos, NO_DISCRIMINANT if which is None else which))
+  return np.array(entries, dtype=LOG_INDEX_DTYPE)
+
+
+def _source_stamp(fn):
+  """Returns what identifies the current contents of the log fn: size and mtime of local files, length of remote ones."""
+  if urllib.parse.urlparse(fn).scheme == "":
+    st = os.stat(fn)
+    return (st.st_size, st.st_mtime_ns)
+  return (URLFile(fn).get_length_online(), None)
+
+
+def _read_stamp(path):
+  try:
+    with open(path, "rb") as f:
+      return pickle.load(f)
+  except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+    return None
+
+
+def _write_stamp(path, stamp):
+  with atomic_write_in_dir(path, mode="wb", overwrite=True) as f:
+    pickle.dump(stamp, f, -1)
+
+
+def get_log_index(fn, stamp=None, load=None):
+  """Returns the index of the log fn, building it once and keeping it in the ~/.commacache directory.
+
+     The index is rebuilt when the log changed since it was cached. Unknown event
+     types have the NO_DISCRIMINANT discriminant. stamp is the _source_stamp of fn
+     if the caller already has it, and load returns the decompressed log, so a
+     caller that needs the data anyway doesn't read it twice.
+  """
+  cache_path = cache_path_for_file_path(fn) + "_log_index"
+  if stamp is None:
+    stamp = _source_stamp(fn)
+  if os.path.exists(cache_path):
+    with open(cache_path, "rb") as cache_file:
+      cache_value = pickle.load(cache_file)
+    if cache_value['version'] == LOG_INDEX_VERSION and cache_value['source'] == stamp:
+      return cache_value['index']
+
+  index = build_log_index(load() if load is not None else _read_decompressed(fn))
+  with atomic_write_in_dir(cache_path, mode="wb", overwrite=True) as cache_file:
+    pickle.dump({'version': LOG_INDEX_VERSION, 'source': stamp, 'index': index}, cache_file, -1)
+  return index
+
+
+def _decompressed_chunks(f, ext, window):
+  """Reads f incrementally, yielding the decompressed data in pieces of at most window bytes."""
+  decompressor = bz2.BZ2Decompressor() if ext == ".bz2" else None
+  while True:
+    dat = f.read(STREAM_READ_SIZE)
+    if len(dat) == 0:
+      break
+
+    if decompressor is None:
+      yield dat
+      continue
+
+    while True:
+      if decompressor.eof:
+        # multiple bz2 streams can be concatenated in one file
+        dat = decompressor.unused_data + dat
+        decompressor = bz2.BZ2Decompressor()
+      if len(dat) == 0 and decompressor.needs_input:
+        break
+      out = decompressor.decompress(dat, window)
+      dat = b""
+      if len(out):
+        yield out
+
+
+def _mmap_decompressed(fn, stamp=None):
+  """Returns a read only mmap of the decompressed log fn.
+
+     Local uncompressed logs are mapped directly, anything else is decompressed
+     once into the ~/.commacache directory and mapped from there on. Like the log
+     index, the decompressed copy is redone when the log changed since, stamp is
+     the _source_stamp of fn if the caller already has it.
+  """
+  parsed = urllib.parse.urlparse(fn)
+  _, ext = os.path.splitext(parsed.path)
+  if ext not in ("", ".bz2"):
+    raise Exception(f"unknown extension {ext}")
+
+  if ext == "" and parsed.scheme == "":
+    path = fn
+  else:
+    path = cache_path_for_file_path(fn) + "_decompressed"
+    stamp_path = path + "_source"
+    if stamp is None:
+      stamp = _source_stamp(fn)
+    if not os.path.exists(path) or _read_stamp(stamp_path) != stamp:
+      with FileReader(fn) as f, atomic_write_in_dir(path, mode="wb", overwrite=True) as cache_file:
+        for dat in _decompressed_chunks(f, ext, STREAM_WINDOW):
+          cache_file.write(dat)
+      # written last, so an interrupted decompression is redone
+      _write_stamp(stamp_path, stamp)
+
+  with open(path, "rb") as f:
+    if os.fstat(f.fileno()).st_size == 0:
+      return b""
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# this is an iterator itself, events are decoded lazily from the offsets in the log indexes
 class MultiLogIterator(object):
-  def __init__(self, log_paths, wraparound=False):
+  def __init__(self, log_paths, wraparound=False, services=None, decompressed_cache=False):
     self._log_paths = log_paths
     self._wraparound = wraparound
+    self._which = _service_discriminants(services)
+    self._decompressed_cache = decompressed_cache
 
     self._first_log_idx = next(i for i in range(len(log_paths)) if log_paths[i] is not None)
     self._current_log = self._first_log_idx
     self._idx = 0
-    self._log_readers = [None]*len(log_paths)
-    self.start_time = self._log_reader(self._first_log_idx)._ts[0]
+    self._log_datas = [None]*len(log_paths)
+    self._full_indexes = [None]*len(log_paths)
+    self._log_indexes = [None]*len(log_paths)
+    self._seek_times = [None]*len(log_paths)
+    self._stamps = [None]*len(log_paths)
+    # times are relative to the start of the first log, whatever services are read
+    self.start_time = self._log_start(self._first_log_idx)
+
+  def _source_stamp(self, i):
+    # looked up once per log, for remote logs it's a request
+    if self._stamps[i] is None:
+      self._stamps[i] = _source_stamp(self._log_paths[i])
+    return self._stamps[i]
+
+  def _full_index(self, i):
+    # every event of log i, so seeking only needs the persistent index
+    if self._full_indexes[i] is None:
+      self._full_indexes[i] = get_log_index(self._log_paths[i], self._source_stamp(i), lambda: self._log_data(i))
+    return self._full_indexes[i]
+
+  def _log_index(self, i):
+    # events yielded from log i
+    if self._log_indexes[i] is None:
+      index = self._full_index(i)
+      if self._which is not None:
+        index = index[np.isin(index['which'], list(self._which))]
+      self._log_indexes[i] = index
+    return self._log_indexes[i]
+
+  def _log_start(self, i):
+    times = self._full_index(i)['mono_time']
+    return int(times[0]) if len(times) else 0
+
+  def _log_data(self, i):
+    if self._log_datas[i] is None:
+      if self._decompressed_cache:
+        self._log_datas[i] = memoryview(_mmap_decompressed(self._log_paths[i], self._source_stamp(i)))
+      else:
+        self._log_datas[i] = _read_decompressed(self._log_paths[i])
+    return self._log_datas[i]
 
-  def _log_reader(self, i):
-    if self._log_readers[i] is None and self._log_paths[i] is not None:
-      log_path = self._log_paths[i]
-      self._log_readers[i] = LogReader(log_path)
+  def _times(self, i):
+    return self._log_index(i)['mono_time']
 
-    return self._log_readers[i]
+  def _running_max_times(self, i):
+    # logMonoTime isn't monotonic in file order, the running max is and its first
+    # entry >= t is the first event in file order at or after t
+    if self._seek_times[i] is None:
+      self._seek_times[i] = np.maximum.accumulate(self._times(i))
+    return self._seek_times[i]
 
   def __iter__(self):
     return self
 
   def _inc(self):
-    lr = self._log_reader(self._current_log)
-    if self._idx < len(lr._ents)-1:
+    if self._idx < len(self._log_index(self._current_log))-1:
       self._idx += 1
     else:
       self._idx = 0
-      self._current_log = next(i for i in range(self._current_log + 1, len(self._log_readers) + 1)
-                               if i == len(self._log_readers) or self._log_paths[i] is not None)
-      # wraparound
-      if self._current_log == len(self._log_readers):
-        if self._wraparound:
-          self._current_log = self._first_log_idx
-        else:
-          raise StopIteration
+      self._current_log = next(i for i in range(self._current_log + 1, len(self._log_paths) + 1)
+                               if i == len(self._log_paths) or self._log_paths[i] is not None)
+      # wraparound, otherwise the iterator stays exhausted at len(self._log_paths)
+      if self._current_log == len(self._log_paths) and self._wraparound:
+        self._current_log = self._first_log_idx
 
   def __next__(self):
     while 1:
-      lr = self._log_reader(self._current_log)
-      ret = lr._ents[self._idx]
+      if self._current_log == len(self._log_paths):
+        raise StopIteration
+      index = self._log_index(self._current_log)
+      if self._idx >= len(index):
+        # a segment can be empty when filtering by service
+        self._inc()
+        continue
+      dat = self._log_data(self._current_log)
+      offset = int(index['offset'][self._idx])
+      ret = capnp_log.Event.from_bytes(bytes(dat[offset:offset + _frame_length(dat, offset)]))
       self._inc()
       return ret
 
   def tell(self):
-    # returns seconds from start of log
-    return (self._log_reader(self._current_log)._ts[self._idx] - self.start_time) * 1e-9
+    # returns seconds from start of log to the next event
+    if self._current_log == len(self._log_paths):
+      # exhausted, at the end of the last log
+      last_log = max(i for i in range(len(self._log_paths)) if self._log_paths[i] is not None)
+      times = self._full_index(last_log)['mono_time']
+      t = int(times[-1]) if len(times) else self._log_start(last_log)
+    else:
+      times = self._times(self._current_log)
+      # a log can have no events of the requested services left
+      t = int(times[self._idx]) if self._idx < len(times) else self._log_start(self._current_log)
+    return (t - self.start_time) * 1e-9
 
   def seek(self, ts):
     # seek to nearest minute
@@ -67,36 +366,69 @@ class MultiLogIterator(object):
 
     self._current_log = minute
 
-    # HACK: O(n) seek afterward
-    self._idx = 0
-    while self.tell() < ts:
+    times = self._running_max_times(minute)
+    self._idx = int(np.searchsorted(times, self.start_time + ts * 1e9, side='left'))
+    if self._idx == len(times):
+      # every event in this log is before ts, continue from the next one
+      self._idx = max(len(times) - 1, 0)
       self._inc()
     return True
 
 
 class LogReader(object):
-  def __init__(self, fn, canonicalize=True, only_union_types=False):
+  def __init__(self, fn, canonicalize=True, only_union_types=False, stream=False, window=STREAM_WINDOW, services=None,
+               decompressed_cache=False):
+    """Reads an rlog or qlog.
+
+       If services is given, only events of those types are decoded. The type of
+       every other message is read straight from its bytes and it's skipped.
+
+       With stream=True nothing is loaded up front: every iteration decompresses the
+       file incrementally and yields events as their messages complete, holding at
+       most about window bytes of decompressed data.
+
+       With decompressed_cache=True the decompressed log is kept on disk and events
+       are decoded straight from an mmap of it, so later passes over the same log
+       neither decompress nor copy it.
+    """
     data_version = None
     _, ext = os.path.splitext(urllib.parse.urlparse(fn).path)
-    with FileReader(fn) as f:
-      dat = f.read()
+    self._fn = fn
+    self._ext = ext
+    self._stream = stream
+    self._window = window
+    self.data_version = data_version
+    self._only_union_types = only_union_types
+    self._which = _service_discriminants(services)
 
-    if ext == "":
-      # old rlogs weren't bz2 compressed
-      ents = capnp_log.Event.read_multiple_bytes(dat)
-    elif ext == ".bz2":
-      dat = bz2.decompress(dat)
+    if stream:
+      if ext not in ("", ".bz2"):
+        raise Exception(f"unknown extension {ext}")
+      self._ents = None
+      self._ts = None
+      return
+
+    if decompressed_cache:
+      dat = memoryview(_mmap_decompressed(fn))
+    else:
+      dat = _read_decompressed(fn)
+
+    if self._which is None:
       ents = capnp_log.Event.read_multiple_bytes(dat)
     else:
-      raise Exception(f"unknown extension {ext}")
+      ents = (capnp_log.Event.from_bytes(frame) for frame in _iter_frames([dat], self._which))
 
     self._ents = list(ents)
     self._ts = [x.logMonoTime for x in self._ents]
-    self.data_version = data_version
-    self._only_union_types = only_union_types
+
+  def _stream_ents(self):
+    with FileReader(self._fn) as f:
+      for frame in _iter_frames(_decompressed_chunks(f, self._ext, self._window), self._which):
+        yield capnp_log.Event.from_bytes(frame)
 
   def __iter__(self):
-    for ent in self._ents:
+    ents = self._stream_ents() if self._stream else self._ents
+    for ent in ents:
       if self._only_union_types:
         try:
           ent.which()
@@ -106,6 +438,68 @@ class LogReader(object):
       else:
         yield ent
 
+
+def _load_log(fn, which):
+  dat = _read_decompressed(fn)
+  if which is not None:
+    dat = b"".join(_iter_frames([dat], which))
+  return dat
+
+
+class ParallelLogReader(object):
+  def __init__(self, log_paths, processes=None, prefetch=None, services=None, sort_by_time=True, only_union_types=False):
+    """Reads the logs of a route, e.g. Route.log_paths(), in order.
+
+       Downloading, decompressing and service filtering run in a pool of processes,
+       with up to prefetch logs loaded ahead of the one being iterated. By default a
+       process runs per CPU and prefetch keeps all of them busy. A decompressed log is
+       a few hundred MB and prefetch + 1 of them are held in memory at once, so lower
+       prefetch (the pool then shrinks with it) on machines short on memory. Only
+       parsing happens in the calling process. Missing segments (None paths) are skipped.
+       The events of every log are sorted by logMonoTime, making the whole stream time
+       ordered. Pass sort_by_time=False to skip the sort and keep the file order.
+    """
+    self._log_paths = [p for p in log_paths if p is not None]
+    if prefetch is not None and prefetch < 0:
+      raise ValueError("prefetch must be >= 0")
+    if processes is None:
+      processes = os.cpu_count() or 1
+      if prefetch is not None:
+        processes = min(processes, prefetch + 1)
+    self._processes = processes
+    self._prefetch = prefetch if prefetch is not None else processes - 1
+    self._which = _service_discriminants(services)
+    self._sort_by_time = sort_by_time
+    self._only_union_types = only_union_types
+
+  def _iter_logs(self):
+    paths = iter(self._log_paths)
+    with multiprocessing.Pool(self._processes) as pool:
+      pending = deque(pool.apply_async(_load_log, (fn, self._which)) for fn in islice(paths, self._prefetch + 1))
+      while len(pending):
+        dat = pending.popleft().get()
+        fn = next(paths, None)
+        if fn is not None:
+          pending.append(pool.apply_async(_load_log, (fn, self._which)))
+        yield dat
+
+  def __iter__(self):
+    for dat in self._iter_logs():
+      ents = capnp_log.Event.read_multiple_bytes(dat)
+      if self._sort_by_time:
+        ents = sorted(ents, key=lambda ent: ent.logMonoTime)
+
+      for ent in ents:
+        if self._only_union_types:
+          try:
+            ent.which()
+            yield ent
+          except capnp.lib.capnp.KjException:
+            pass
+        else:
+          yield ent
+
+
 if __name__ == "__main__":
   import codecs
   # capnproto <= 0.8.0 throws errors converting byte data to string
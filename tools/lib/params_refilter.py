@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import sys
+import argparse
+import traceback
+import multiprocessing
+
+import numpy as np
+
+from selfdrive.locationd.paramsd import ParamsLearner
+from selfdrive.locationd.models.car_kf import States
+from tools.lib.logreader import LogReader
+from tools.lib.route import Route
+
+SERVICES = ['carParams', 'carState', 'liveLocationKalman']
+
+TRACE_FIELDS = ['t', 'steerRatio', 'steerRatioStd', 'stiffnessFactor', 'stiffnessFactorStd',
+                'angleOffsetAverageDeg', 'angleOffsetAverageStd', 'angleOffsetDeg', 'angleOffsetFastStd']
+
+
+def _route_events(log_paths):
+  for fn in log_paths:
+    if fn is not None:
+      yield from sorted(LogReader(fn, services=SERVICES), key=lambda msg: msg.logMonoTime)
+
+
+def _to_trace(t, x, P):
+  std = np.sqrt(np.diagonal(P, axis1=1, axis2=2))
+  arrays = [
+    t,
+    x[:, States.STEER_RATIO.start], std[:, States.STEER_RATIO.start],
+    x[:, States.STIFFNESS.start], std[:, States.STIFFNESS.start],
+    np.degrees(x[:, States.ANGLE_OFFSET.start]), std[:, States.ANGLE_OFFSET.start],
+    np.degrees(x[:, States.ANGLE_OFFSET.start] + x[:, States.ANGLE_OFFSET_FAST.start]), std[:, States.ANGLE_OFFSET_FAST.start],
+  ]
+  return np.rec.fromarrays(arrays, names=TRACE_FIELDS)
+
+
+def refilter_events(events, CP=None, smooth=True):
+  """Runs the paramsd learner over logged carState and liveLocationKalman events.
+
+     Returns the parameter estimate after every filter update as a record array
+     with TRACE_FIELDS columns. With smooth, every run between filter resets is
+     RTS smoothed, so the estimates also use the observations that come after them.
+     CP defaults to the first carParams event.
+  """
+  learner = None
+  for msg in events:
+    which = msg.which()
+    if which == 'carParams':
+      CP = CP if CP is not None else msg.carParams
+    elif CP is not None:
+      if learner is None:
+        learner = ParamsLearner(CP, CP.steerRatio, 1.0, 0.0, record=True)
+      learner.handle_log(msg.logMonoTime * 1e-9, which, getattr(msg, which))
+
+  runs = [r for r in learner.estimates if len(r)] if learner is not None else []
+  traces = []
+  for estimates in runs:
+    t = np.array([e[4] for e in estimates])
+    if smooth and len(estimates) > 1:
+      x, P = learner.kf.filter.rts_smooth(estimates)
+    else:
+      x = np.vstack([e[1] for e in estimates])
+      P = np.stack([e[3] for e in estimates], 0)
+    traces.append(_to_trace(t, x, P))
+
+  if not len(traces):
+    return np.rec.fromarrays([np.zeros(0) for _ in TRACE_FIELDS], names=TRACE_FIELDS)
+  return np.concatenate(traces).view(np.recarray)
+
+
+def refilter_route(route_name, data_dir=None, smooth=True):
+  """Returns the parameter trace of a route, see refilter_events, or None if it can't be processed."""
+  try:
+    log_paths = Route(route_name, data_dir).log_paths()
+    return refilter_events(_route_events(log_paths), smooth=smooth)
+  except Exception:
+    print(f"failed to refilter {route_name}", file=sys.stderr)
+    traceback.print_exc()
+    return None
+
+
+def refilter_routes(route_names, data_dir=None, smooth=True, processes=None):
+  """Refilters many routes in a pool of processes, one route per task.
+
+     Returns a dict of route name -> trace, with None for routes that failed.
+  """
+  with multiprocessing.Pool(processes) as pool:
+    traces = pool.starmap(refilter_route, [(r, data_dir, smooth) for r in route_names])
+  return dict(zip(route_names, traces))
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Rerun the paramsd car model learner offline over routes")
+  parser.add_argument("routes", nargs="+")
+  parser.add_argument("--data-dir", default=None)
+  parser.add_argument("--processes", type=int, default=None)
+  parser.add_argument("--no-smooth", action="store_true")
+  parser.add_argument("--out", default=None, help="npz file to store the traces in")
+  args = parser.parse_args()
+
+  traces = refilter_routes(args.routes, args.data_dir, not args.no_smooth, args.processes)
+  for route_name, trace in traces.items():
+    if trace is None or not len(trace):
+      print(f"{route_name}: no estimates")
+    else:
+      print(f"{route_name}: steerRatio {trace.steerRatio[-1]:.2f} +- {trace.steerRatioStd[-1]:.2f}, "
+            f"stiffnessFactor {trace.stiffnessFactor[-1]:.3f} +- {trace.stiffnessFactorStd[-1]:.3f}, "
+            f"angleOffsetAverageDeg {trace.angleOffsetAverageDeg[-1]:.2f}")
+
+  if args.out is not None:
+    np.savez(args.out, **{name.replace('|', '_'): trace for name, trace in traces.items() if trace is not None})
@@ -3,18 +3,36 @@ import os
 import bz2
 import urllib.parse
 import subprocess
-import tqdm
 import glob
+from concurrent.futures import ThreadPoolExecutor
 from tempfile import TemporaryDirectory
 import capnp
 
-from tools.lib.logreader import FileReader, LogReader
+from tools.lib.logreader import FileReader, LogReader, _split_frames
 from cereal import log as capnp_log
 
 
+def _decompress_block(fn):
+  with open(fn, 'rb') as f:
+    try:
+      return bz2.decompress(f.read())
+    except (OSError, ValueError, EOFError):
+      return None
+
+
 class RobustLogReader(LogReader):
   def __init__(self, fn, canonicalize=True, only_union_types=False):  # pylint: disable=super-init-not-called
+    """Reads logs from crashed devices, salvaging everything up to the corruption.
+
+       Messages span bzip2 blocks, so nothing after a recovered block that still
+       fails to decompress can be split into messages again. That block and every
+       one after it are listed in lost_blocks. The (start, end) offsets of
+       decompressed data that had to be dropped before it are in lost_ranges,
+       these are offsets into the decompressed log as it was written.
+    """
     data_version = None
+    self.lost_blocks = []
+    self.lost_ranges = []
     _, ext = os.path.splitext(urllib.parse.urlparse(fn).path)
     with FileReader(fn) as f:
       dat = f.read()
@@ -24,7 +42,7 @@ class RobustLogReader(LogReader):
     elif ext == ".bz2":
       try:
         dat = bz2.decompress(dat)
-      except ValueError:
+      except (OSError, ValueError, EOFError):
         print("Failed to decompress, falling back to bzip2recover")
         with TemporaryDirectory() as directory:
           # Run bzip2recovery on log
@@ -32,29 +50,44 @@ class RobustLogReader(LogReader):
             f.write(dat)
           subprocess.check_call(["bzip2recover", "out.bz2"], cwd=directory)
 
-          # Decompress and concatenate parts
-          dat = b""
-          for n in sorted(glob.glob(f"{directory}/rec*.bz2")):
-            print(f"Decompressing {n}")
-            with open(n, 'rb') as f:
-              dat += bz2.decompress(f.read())
+          # Decompress the recovered blocks in parallel, bz2 releases the GIL
+          blocks = sorted(glob.glob(f"{directory}/rec*.bz2"))
+          print(f"Decompressing {len(blocks)} blocks")
+          with ThreadPoolExecutor() as pool:
+            decompressed = list(pool.map(_decompress_block, blocks))
+
+          # splicing the blocks around a lost one would misparse the messages across the gap
+          first_lost = next((i for i, d in enumerate(decompressed) if d is None), len(decompressed))
+          self.lost_blocks = [os.path.basename(n) for n in blocks[first_lost:]]
+          if len(self.lost_blocks):
+            print(f"Failed to decompress {self.lost_blocks[0]}, dropping it and the {len(self.lost_blocks) - 1} blocks after it")
+          dat = b"".join(decompressed[:first_lost])
     else:
       raise Exception(f"unknown extension {ext}")
 
-    progress = None
-    while True:
-      try:
-        ents = capnp_log.Event.read_multiple_bytes(dat)
-        self._ents = list(ents)
-        break
-      except capnp.lib.capnp.KjException:
-        if progress is None:
-          progress = tqdm.tqdm(total=len(dat))
+    # Cut off everything after the last complete message
+    end = 0
+    for pos, length in _split_frames(dat):
+      end = pos + length
+    if end != len(dat):
+      print(f"Dropping {len(dat) - end} bytes after the last complete message")
+      self.lost_ranges.append((end, len(dat)))
+      dat = dat[:end]
 
-        # Cut off bytes at the end until capnp is able to read
-        dat = dat[:-1]
-        progress.update(1)
+    try:
+      self._ents = list(capnp_log.Event.read_multiple_bytes(dat))
+    except capnp.lib.capnp.KjException:
+      # A message in the middle is corrupt, keep everything before it
+      self._ents = []
+      for pos, length in _split_frames(dat):
+        try:
+          self._ents.append(capnp_log.Event.from_bytes(dat[pos:pos + length]))
+        except capnp.lib.capnp.KjException:
+          print(f"Dropping {len(dat) - pos} bytes after a corrupt message")
+          self.lost_ranges.append((pos, len(dat)))
+          break
 
     self._ts = [x.logMonoTime for x in self._ents]
     self.data_version = data_version
     self._only_union_types = only_union_types
+    self._stream = False
@@ -1,10 +1,37 @@
 #!/usr/bin/env python3
 import os
 import shutil
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
 
 os.environ["COMMA_CACHE"] = "/tmp/__test_cache__"
-from tools.lib.url_file import URLFile, CACHE_DIR
+from tools.lib.url_file import URLFile, CACHE_DIR, CHUNK_SIZE
+
+UNKNOWN_LENGTH_DATA = bytes(range(256)) * (CHUNK_SIZE // 100)
+
+
+class UnknownLengthHandler(BaseHTTPRequestHandler):
+  """Serves UNKNOWN_LENGTH_DATA chunked, without a Content-Length header and without ranges."""
+  protocol_version = "HTTP/1.1"
+
+  def _start(self):
+    self.send_response(200)
+    self.send_header("Transfer-Encoding", "chunked")
+    self.end_headers()
+
+  def do_HEAD(self):
+    self._start()
+
+  def do_GET(self):
+    self._start()
+    for i in range(0, len(UNKNOWN_LENGTH_DATA), 65536):
+      part = UNKNOWN_LENGTH_DATA[i:i + 65536]
+      self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+    self.wfile.write(b"0\r\n\r\n")
+
+  def log_message(self, *args):
+    pass
 
 
 class TestFileDownload(unittest.TestCase):
@@ -64,6 +91,20 @@ class TestFileDownload(unittest.TestCase):
     self.compare_loads(large_file_url, length - 100, 100)
     self.compare_loads(large_file_url)
 
+  def test_unknown_length(self):
+    server = HTTPServer(("127.0.0.1", 0), UnknownLengthHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+      shutil.rmtree(CACHE_DIR, ignore_errors=True)
+      url = f"http://127.0.0.1:{server.server_port}/unknown_length"
+      for cache in (False, True):
+        f = URLFile(url, cache=cache)
+        self.assertEqual(f.get_length(), -1)
+        self.assertEqual(f.read(), UNKNOWN_LENGTH_DATA)
+    finally:
+      server.shutdown()
+      server.server_close()
+
 
 if __name__ == "__main__":
     unittest.main()
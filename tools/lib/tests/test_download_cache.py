@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+import unittest
+
+from tools.lib.download_cache import DownloadCache
+
+
+class TestDownloadCache(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.TemporaryDirectory()
+    self.cache = DownloadCache(self.tmpdir.name, 2500)
+
+  def tearDown(self):
+    self.tmpdir.cleanup()
+
+  def test_lru_eviction(self):
+    for i in range(5):
+      self.cache.put_chunk(f"chunk_{i}", bytes([i]) * 1000)
+      self.assertEqual(self.cache.get_chunk("chunk_0"), bytes(1000))
+
+    self.assertIsNone(self.cache.get_chunk("chunk_1"))
+    self.assertEqual(self.cache.get_chunk("chunk_4"), bytes([4]) * 1000)
+    chunk_files = sorted(f for f in os.listdir(self.tmpdir.name) if f.startswith("chunk_"))
+    self.assertEqual(chunk_files, ["chunk_0", "chunk_4"])
+
+  def test_corrupt_chunk(self):
+    self.cache.put_chunk("chunk_0", b"a" * 1000)
+    with open(os.path.join(self.tmpdir.name, "chunk_0"), "wb") as f:
+      f.write(b"b" * 1000)
+    self.assertIsNone(self.cache.get_chunk("chunk_0"))
+
+  def test_lengths_and_stats(self):
+    self.assertIsNone(self.cache.get_length("url"))
+    self.cache.put_length("url", 1234)
+    self.assertEqual(self.cache.get_length("url"), 1234)
+
+    self.cache.put_chunk("chunk_0", b"a" * 100)
+    self.cache.get_chunk("chunk_0")
+    self.cache.get_chunk("chunk_1")
+    stats = self.cache.stats()
+    self.assertEqual(stats['hit_rate'], 0.5)
+    self.assertEqual(stats['bytes_from_cache'], 100)
+    self.assertEqual(stats['bytes_from_network'], 100)
+
+  def test_legacy_layout(self):
+    with tempfile.TemporaryDirectory() as cache_dir:
+      with open(os.path.join(cache_dir, "abc_length"), "w") as f:
+        f.write("3000")
+      for i in range(3):
+        with open(os.path.join(cache_dir, f"abc_{i}.0"), "wb") as f:
+          f.write(bytes([i]) * 1000)
+        os.utime(os.path.join(cache_dir, f"abc_{i}.0"), (i, i))
+
+      cache = DownloadCache(cache_dir, 2500)
+      self.assertEqual(cache.get_length("abc"), 3000)
+      self.assertEqual(cache.get_chunk("abc_2"), bytes([2]) * 1000)
+      self.assertEqual(sorted(os.listdir(cache_dir)), ["abc_0", "abc_1", "abc_2", "index.sqlite"])
+
+      # the imported chunks count towards the size limit, oldest first
+      cache.put_chunk("def_0", b"d" * 1000)
+      self.assertEqual(sorted(os.listdir(cache_dir)), ["abc_2", "def_0", "index.sqlite"])
+
+  def test_shared_connection(self):
+    self.cache.put_length("url", 1)
+    conn = self.cache._conn
+    self.cache.put_chunk("chunk_0", b"a")
+    self.cache.get_chunk("chunk_0")
+    self.assertIs(self.cache._conn, conn)
+
+    # a second instance on the same directory sees the same index
+    self.assertEqual(DownloadCache(self.tmpdir.name, 2500).get_chunk("chunk_0"), b"a")
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import tools.lib.framereader as framereader
+from tools.lib.framereader import GOPReader, GOPFrameReader, StreamGOPReader, FrameType, frames_from_buffer
+from tools.lib.framereader import HEVC_SLICE_I, HEVC_SLICE_P
+
+W, H = 8, 4
+GOP_SIZE = 4
+FRAME_SIZE = W * H * 3 // 2
+
+
+class FakeGOPFrameReader(GOPReader, GOPFrameReader):
+  """GOP reader over a fake video, where every frame of a gop is filled with the number of its first frame."""
+  def __init__(self, fn, frame_count=12, gop_cache=True):
+    self.fn = fn
+    self.frame_count = frame_count
+    self.w, self.h = W, H
+    self.vid_fmt = "hevc"
+    GOPFrameReader.__init__(self, gop_cache=gop_cache)
+
+  def lookup_gop(self, num):
+    frame_b = num - num % GOP_SIZE
+    return frame_b, min(GOP_SIZE, self.frame_count - frame_b)
+
+  def get_gop(self, num):
+    frame_b, num_frames = self.lookup_gop(num)
+    return frame_b, num_frames, 0, bytes([frame_b, num_frames])
+
+
+def fake_decompress(rawdat, vid_fmt, w, h, pix_fmt):
+  frame_b, num_frames = rawdat
+  frame_size = w * h * 3 // 2 if pix_fmt == "yuv420p" else w * h * 3
+  return frames_from_buffer(np.full(num_frames * frame_size, frame_b, dtype=np.uint8), w, h, pix_fmt)
+
+
+class TestGOPCache(unittest.TestCase):
+  def setUp(self):
+    self.cache_dir = tempfile.TemporaryDirectory()
+    self.decode = mock.Mock(side_effect=fake_decompress)
+    patches = [
+      mock.patch.object(framereader, "GOP_CACHE_DIR", self.cache_dir.name),
+      mock.patch.object(framereader, "decompress_video_data", self.decode),
+    ]
+    for p in patches:
+      p.start()
+      self.addCleanup(p.stop)
+    self.addCleanup(self.cache_dir.cleanup)
+
+    # gops are cached by the path and stamp of the video, so it has to exist
+    self.video_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self.video_dir.cleanup)
+    self.video = self._write_video("video.hevc", b"video")
+
+  def _write_video(self, name, dat):
+    fn = os.path.join(self.video_dir.name, name)
+    with open(fn, "wb") as f:
+      f.write(dat)
+    return fn
+
+  def _check_frame(self, fr, num):
+    frame = fr.get(num)[0]
+    self.assertEqual(frame.shape, (FRAME_SIZE,))
+    self.assertTrue(np.all(frame == num - num % GOP_SIZE))
+
+  def test_default_max_size(self):
+    if "FRAMEREADER_GOP_CACHE_MAX_SIZE" not in os.environ:
+      self.assertEqual(framereader.GOP_CACHE_MAX_SIZE, 50e9)
+    fr = FakeGOPFrameReader(self.video)
+    self.assertEqual(fr.gop_cache.max_size, framereader.GOP_CACHE_MAX_SIZE)
+    self.assertIsNone(FakeGOPFrameReader(self.video, gop_cache=False).gop_cache)
+
+  def test_miss_then_hit(self):
+    fr = FakeGOPFrameReader(self.video)
+    self._check_frame(fr, 5)
+    self.assertEqual(self.decode.call_count, 1)
+    self.assertEqual(fr.gop_cache.stats()['misses'], 1)
+
+    # a new reader has an empty frame cache, the gop comes from disk
+    fr = FakeGOPFrameReader(self.video)
+    for num in range(4, 8):
+      self._check_frame(fr, num)
+    self.assertEqual(self.decode.call_count, 1)
+    self.assertEqual(fr.gop_cache.stats()['hits'], 1)
+
+    # gops are cached per video and pixel format
+    self._check_frame(FakeGOPFrameReader(self._write_video("other.hevc", b"other")), 5)
+    fr.get(0, pix_fmt="rgb24")
+    self.assertEqual(self.decode.call_count, 3)
+
+  def test_replaced_video(self):
+    self._check_frame(FakeGOPFrameReader(self.video), 0)
+    self._check_frame(FakeGOPFrameReader(self.video), 0)
+    self.assertEqual(self.decode.call_count, 1)
+
+    # a video rewritten at the same path is decoded again
+    self._write_video("video.hevc", b"reencoded video")
+    self._check_frame(FakeGOPFrameReader(self.video), 0)
+    self.assertEqual(self.decode.call_count, 2)
+
+  def test_eviction(self):
+    gop_bytes = GOP_SIZE * FRAME_SIZE
+    with mock.patch.object(framereader, "GOP_CACHE_MAX_SIZE", 2 * gop_bytes):
+      fr = FakeGOPFrameReader(self.video)
+      for num in (0, 4, 8):
+        self._check_frame(fr, num)
+      self.assertEqual(self.decode.call_count, 3)
+
+      # the least recently used gop was evicted, the other two are still cached
+      fr = FakeGOPFrameReader(self.video)
+      self._check_frame(fr, 9)
+      self._check_frame(fr, 5)
+      self.assertEqual(self.decode.call_count, 3)
+      self._check_frame(fr, 1)
+      self.assertEqual(self.decode.call_count, 4)
+
+  def test_evicted_after_lookup(self):
+    self._check_frame(FakeGOPFrameReader(self.video), 0)
+
+    # the file disappears, is emptied or cut short between get_path and mapping it
+    truncated = os.path.join(self.cache_dir.name, "truncated")
+    with open(truncated, "wb") as f:
+      f.write(bytes(FRAME_SIZE + 1))
+    for bad_path in (os.path.join(self.cache_dir.name, "missing"), os.devnull, truncated):
+      fr = FakeGOPFrameReader(self.video)
+      fr.gop_cache.get_path = lambda name, path=bad_path: path
+      self._check_frame(fr, 2)
+    self.assertEqual(self.decode.call_count, 4)
+
+
+class TestStreamGOPReader(unittest.TestCase):
+  def test_lookup_gop(self):
+    types = [HEVC_SLICE_I, HEVC_SLICE_P, HEVC_SLICE_P, HEVC_SLICE_I, HEVC_SLICE_P, 0]
+    index_data = {
+      'index': np.array([[t, 100 * i] for i, t in enumerate(types)]),
+      'global_prefix': b"",
+      'probe': {'streams': [{'width': W, 'height': H}]},
+    }
+    reader = StreamGOPReader("video.hevc", FrameType.h265_stream, index_data)
+    self.assertEqual(reader.frame_count, 5)
+    self.assertEqual([reader.lookup_gop(i) for i in range(5)], [(0, 3)] * 3 + [(3, 2)] * 2)
+
+
+if __name__ == "__main__":
+  unittest.main()
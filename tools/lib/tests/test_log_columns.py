@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+import os
+import unittest
+import tempfile
+
+import numpy as np
+from tools.lib.log_columns import log_to_columns, route_to_columns
+from tools.lib.tests.test_readers import write_test_log
+
+
+class TestLogColumns(unittest.TestCase):
+  def test_log_to_columns(self):
+    fields = {'carState': ['vEgo', 'cruiseState.speed'], 'can': []}
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp:
+      write_test_log(fp)
+
+      for cache in (False, True, True):
+        tables = log_to_columns(fp.name, fields, cache=cache)
+        self.assertEqual(len(tables['carState']), 500)
+        self.assertEqual(len(tables['can']), 500)
+        np.testing.assert_equal(tables['carState'].vEgo, np.arange(1, 1000, 2))
+        np.testing.assert_equal(tables['carState'].logMonoTime, np.arange(1, 1000, 2) * 10_000_000)
+
+      tables = route_to_columns([fp.name, None, fp.name], fields, processes=2)
+      self.assertEqual(len(tables['carState']), 1000)
+
+  def test_cache_invalidation(self):
+    fields = {'carState': ['vEgo']}
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp:
+      write_test_log(fp)
+      self.assertEqual(len(log_to_columns(fp.name, fields)['carState']), 500)
+
+      # rewrite the log in place, keeping its mtime, the size change must be noticed
+      st = os.stat(fp.name)
+      fp.seek(0)
+      fp.truncate()
+      write_test_log(fp, n=200)
+      os.utime(fp.name, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+      tables = log_to_columns(fp.name, fields)
+      np.testing.assert_equal(tables['carState'].vEgo, np.arange(1, 200, 2))
+
+  def test_route_missing_service(self):
+    fields = {'carState': ['vEgo', 'standstill', 'gearShifter'], 'can': []}
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp1, tempfile.NamedTemporaryFile(suffix=".bz2") as fp2:
+      write_test_log(fp1, car_state=False)
+      write_test_log(fp2)
+
+      # the first segment has no carState, its empty columns still have the types of the others
+      tables = route_to_columns([fp1.name, fp2.name], fields, cache=False, processes=2)
+      car_state = tables['carState']
+      self.assertEqual(len(car_state), 500)
+      self.assertEqual(car_state.vEgo.dtype, np.float64)
+      self.assertEqual(car_state.standstill.dtype, np.bool_)
+      self.assertEqual(car_state.gearShifter.dtype.kind, 'U')
+      self.assertEqual(car_state.gearShifter.tolist(), ['unknown'] * 500)
+      self.assertEqual(len(tables['can']), 1500)
+
+  def test_empty_route(self):
+    fields = {'carState': ['vEgo'], 'can': []}
+    tables = route_to_columns([None, None], fields)
+    self.assertEqual(set(tables), set(fields))
+    for service in fields:
+      self.assertEqual(len(tables[service]), 0)
+      self.assertEqual(tables[service].dtype.names[0], 'logMonoTime')
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import math
+import unittest
+
+import numpy as np
+
+import cereal.messaging as messaging
+from selfdrive.car.toyota.interface import CarInterface
+from selfdrive.car.toyota.values import CAR
+from selfdrive.controls.lib.vehicle_model import VehicleModel
+from tools.lib.params_refilter import TRACE_FIELDS, refilter_events
+
+DURATION = 20.
+STOP = (8., 10.)
+
+
+def synthetic_events(CP, duration=DURATION, stop=STOP):
+  """Drives a sine wave of steering at 20 m/s with a stop in between,
+     with yaw rates following the vehicle model of CP."""
+  VM = VehicleModel(CP)
+
+  msg = messaging.new_message('carParams')
+  msg.logMonoTime = 0
+  msg.carParams = CP
+  events = [msg.as_reader()]
+
+  for i in range(int(duration * 100)):
+    t = i * 0.01
+    speed = 0. if stop[0] <= t < stop[1] else 20.
+    angle = 10. * math.sin(0.5 * t)
+
+    msg = messaging.new_message('carState')
+    msg.logMonoTime = int(t * 1e9)
+    msg.carState.vEgo = speed
+    msg.carState.steeringAngleDeg = angle
+    events.append(msg.as_reader())
+
+    if i % 5 == 0:
+      yaw_rate = VM.yaw_rate(math.radians(angle), speed) if speed > 0 else 0.
+      msg = messaging.new_message('liveLocationKalman')
+      msg.logMonoTime = int(t * 1e9)
+      msg.liveLocationKalman.angularVelocityCalibrated.value = [0., 0., -yaw_rate]
+      msg.liveLocationKalman.angularVelocityCalibrated.std = [0.01, 0.01, 0.01]
+      msg.liveLocationKalman.angularVelocityCalibrated.valid = True
+      events.append(msg.as_reader())
+
+  return events
+
+
+def car_params():
+  return CarInterface.get_params(CAR.COROLLA_TSS2)
+
+
+class TestParamsRefilter(unittest.TestCase):
+  def test_refilter_events(self):
+    CP = car_params()
+    events = synthetic_events(CP)
+
+    filtered = refilter_events(events, smooth=False)
+    smoothed = refilter_events(events)
+    self.assertEqual(smoothed.dtype.names, tuple(TRACE_FIELDS))
+    self.assertGreater(len(smoothed), 0)
+    self.assertEqual(len(smoothed), len(filtered))
+    np.testing.assert_array_equal(smoothed.t, filtered.t)
+    self.assertTrue(np.all(np.diff(smoothed.t) >= 0))
+
+    # nothing is estimated while stopped
+    self.assertFalse(np.any((smoothed.t >= STOP[0]) & (smoothed.t < STOP[1])))
+
+    for trace in (filtered, smoothed):
+      for name in TRACE_FIELDS:
+        self.assertTrue(np.all(np.isfinite(trace[name])), name)
+      self.assertTrue(np.all((trace.steerRatio > 0.5 * CP.steerRatio) & (trace.steerRatio < 2 * CP.steerRatio)))
+      self.assertTrue(np.all(trace.stiffnessFactor > 0))
+
+  def test_no_events(self):
+    trace = refilter_events([])
+    self.assertEqual(len(trace), 0)
+    self.assertEqual(trace.dtype.names, tuple(TRACE_FIELDS))
+
+
+if __name__ == "__main__":
+  unittest.main()
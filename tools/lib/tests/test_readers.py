@@ -1,12 +1,32 @@
 #!/usr/bin/env python
+import bz2
+import os
+import shutil
 import unittest
 import requests
 import tempfile
+from unittest import mock
 
 from collections import defaultdict
 import numpy as np
+import tools.lib.logreader as logreader
 from tools.lib.framereader import FrameReader
-from tools.lib.logreader import LogReader
+from tools.lib.logreader import LogReader, MultiLogIterator, ParallelLogReader, get_log_index
+from tools.lib.robust_logreader import RobustLogReader
+from cereal import log as capnp_log
+
+
+def write_test_log(fp, n=1000, t0=0, car_state=True):
+  dat = b""
+  for i in range(n):
+    msg = capnp_log.Event.new_message(logMonoTime=t0 + i * 10_000_000, valid=True)
+    if i % 2 and car_state:
+      msg.init('carState').vEgo = i
+    else:
+      msg.init('can', i % 5)
+    dat += msg.to_bytes()
+  fp.write(bz2.compress(dat))
+  fp.flush()
 
 
 class TestReaders(unittest.TestCase):
@@ -31,6 +51,209 @@ class TestReaders(unittest.TestCase):
     lr_url = LogReader("https://github.com/commaai/comma2k19/blob/master/Example_1/b0c9d2329ad1606b%7C2018-08-02--08-34-47/40/raw_log.bz2?raw=true")
     _check_data(lr_url)
 
+  def test_logreader_stream(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp:
+      write_test_log(fp)
+
+      expected = [m.as_builder().to_bytes() for m in LogReader(fp.name)]
+      streamed = [m.as_builder().to_bytes() for m in LogReader(fp.name, stream=True, window=4096)]
+      self.assertEqual(len(expected), 1000)
+      self.assertEqual(streamed, expected)
+
+  def test_logreader_services(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp:
+      write_test_log(fp)
+
+      expected = [m.as_builder().to_bytes() for m in LogReader(fp.name) if m.which() == 'carState']
+      for stream in (False, True):
+        filtered = list(LogReader(fp.name, stream=stream, services=['carState']))
+        self.assertEqual(len(filtered), 500)
+        self.assertEqual([m.as_builder().to_bytes() for m in filtered], expected)
+
+      with self.assertRaises(ValueError):
+        LogReader(fp.name, services=['notAService'])
+
+  def test_logreader_decompressed_cache(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp:
+      write_test_log(fp)
+
+      expected = [m.as_builder().to_bytes() for m in LogReader(fp.name)]
+      for _ in range(2):
+        self.assertEqual([m.as_builder().to_bytes() for m in LogReader(fp.name, decompressed_cache=True)], expected)
+      car_states = list(LogReader(fp.name, decompressed_cache=True, services=['carState']))
+      self.assertEqual(len(car_states), 500)
+
+  def test_robust_logreader_truncated(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp, tempfile.NamedTemporaryFile() as fp_raw:
+      write_test_log(fp)
+      with open(fp.name, "rb") as f:
+        dat = bz2.decompress(f.read())
+      fp_raw.write(dat[:-10])
+      fp_raw.flush()
+
+      lr = RobustLogReader(fp_raw.name)
+      self.assertEqual(len(list(lr)), 999)
+      self.assertEqual(len(lr.lost_ranges), 1)
+      self.assertEqual(lr.lost_ranges[0][1], len(dat) - 10)
+
+  @unittest.skipUnless(shutil.which("bzip2recover"), "bzip2recover isn't installed")
+  def test_robust_logreader_lost_block(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp:
+      ents = [capnp_log.Event.new_message(logMonoTime=i, valid=True) for i in range(20000)]
+      for i, ent in enumerate(ents):
+        ent.init('carState').vEgo = i
+      # 100k blocks, so there are some after the corrupt one
+      raw = b"".join(ent.to_bytes() for ent in ents)
+      expected = [m.as_builder().to_bytes() for m in capnp_log.Event.read_multiple_bytes(raw)]
+      dat = bytearray(bz2.compress(raw, compresslevel=1))
+      mid = len(dat) // 2
+      dat[mid:mid + 16] = bytes(b ^ 0xff for b in dat[mid:mid + 16])
+      fp.write(dat)
+      fp.flush()
+
+      lr = RobustLogReader(fp.name)
+      salvaged = [m.as_builder().to_bytes() for m in lr]
+      self.assertGreater(len(salvaged), 0)
+      self.assertLess(len(salvaged), len(ents))
+      # only whole messages from before the corrupt block, none are misparsed across the gap
+      self.assertEqual(salvaged, expected[:len(salvaged)])
+      self.assertGreater(len(lr.lost_blocks), 1)
+      self.assertEqual(len(lr.lost_ranges), 1)
+
+  def test_log_index_seek(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp:
+      write_test_log(fp)
+
+      index = get_log_index(fp.name)
+      self.assertEqual(list(index['mono_time']), [m.logMonoTime for m in LogReader(fp.name)])
+
+      mli = MultiLogIterator([fp.name])
+      self.assertTrue(mli.seek(5.))
+      self.assertAlmostEqual(mli.tell(), 5.)
+      self.assertEqual(next(mli).logMonoTime, 5_000_000_000)
+
+  def test_seek_out_of_order_times(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp:
+      times = [0, 3_000_000_000, 1_000_000_000, 2_000_000_000, 4_000_000_000]
+      fp.write(bz2.compress(b"".join(capnp_log.Event.new_message(logMonoTime=t, valid=True).to_bytes() for t in times)))
+      fp.flush()
+
+      # same as a linear scan, the first event in file order at or after ts
+      for ts, idx in ((0.5, 1), (2., 1), (3., 1), (3.5, 4), (4., 4)):
+        mli = MultiLogIterator([fp.name])
+        self.assertTrue(mli.seek(ts))
+        self.assertEqual(next(mli).logMonoTime, times[idx])
+
+  def test_multi_log_iterator(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp1, tempfile.NamedTemporaryFile(suffix=".bz2") as fp2:
+      write_test_log(fp1)
+      write_test_log(fp2, n=500)
+      log_paths = [fp1.name, None, fp2.name]
+
+      expected = [m.as_builder().to_bytes() for fn in (fp1.name, fp2.name) for m in LogReader(fn, services=['carState'])]
+      mli = MultiLogIterator(log_paths, services=['carState'])
+      self.assertEqual([m.as_builder().to_bytes() for m in mli], expected)
+
+      # seeking only reads the indexes, events are decoded from the log being iterated
+      mli = MultiLogIterator(log_paths, decompressed_cache=True)
+      self.assertTrue(mli.seek(5.))
+      self.assertEqual(mli._log_datas, [None, None, None])
+      self.assertEqual(next(mli).logMonoTime, 5_000_000_000)
+      self.assertIsNone(mli._log_datas[2])
+
+  def test_multi_log_iterator_services_time(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp1, tempfile.NamedTemporaryFile(suffix=".bz2") as fp2:
+      write_test_log(fp1, n=6000, car_state=False)
+      write_test_log(fp2, n=6000, t0=60_000_000_000)
+      log_paths = [fp1.name, fp2.name]
+
+      # times count from the start of the first log, also when it has no events of the services
+      mli = MultiLogIterator(log_paths, services=['carState'])
+      self.assertEqual(mli.start_time, 0)
+      self.assertEqual(mli.tell(), 0.)
+      self.assertEqual(next(mli).logMonoTime, 60_010_000_000)
+      self.assertAlmostEqual(mli.tell(), 60.03)
+
+      self.assertTrue(mli.seek(61.))
+      self.assertAlmostEqual(mli.tell(), 61.01)
+      self.assertEqual(next(mli).logMonoTime, 61_010_000_000)
+      self.assertEqual(len(list(mli)), 2949)
+      self.assertAlmostEqual(mli.tell(), 119.99)
+
+      mli = MultiLogIterator(log_paths, services=['can'])
+      self.assertEqual(mli.start_time, 0)
+      self.assertTrue(mli.seek(61.))
+      self.assertAlmostEqual(mli.tell(), 61.)
+
+  def test_multi_log_iterator_reads_once(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp1, tempfile.NamedTemporaryFile(suffix=".bz2") as fp2:
+      write_test_log(fp1)
+      write_test_log(fp2, n=500)
+
+      # on a cold cache the index is built from the data that's loaded for iterating anyway
+      read = mock.Mock(side_effect=logreader._read_decompressed)
+      stamp = mock.Mock(side_effect=logreader._source_stamp)
+      with mock.patch.object(logreader, "_read_decompressed", read), mock.patch.object(logreader, "_source_stamp", stamp):
+        mli = MultiLogIterator([fp1.name, fp2.name])
+        self.assertEqual(len(list(mli)), 1500)
+        mli.seek(3.)
+        next(mli)
+      self.assertEqual(read.call_count, 2)
+      self.assertEqual(stamp.call_count, 2)
+
+  def test_log_index_invalidation(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp:
+      write_test_log(fp)
+      self.assertEqual(len(get_log_index(fp.name)), 1000)
+
+      # the same path with different contents gets a new index
+      fp.seek(0)
+      fp.truncate()
+      write_test_log(fp, n=500)
+      self.assertEqual(len(get_log_index(fp.name)), 500)
+
+  def test_decompressed_cache_invalidation(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp:
+      write_test_log(fp)
+      self.assertEqual(len(list(MultiLogIterator([fp.name], decompressed_cache=True))), 1000)
+
+      # same message sizes, so stale decompressed bytes would still parse at the new offsets
+      fp.seek(0)
+      fp.truncate()
+      write_test_log(fp, n=500, t0=1)
+      expected = [m.as_builder().to_bytes() for m in LogReader(fp.name)]
+      self.assertEqual([m.as_builder().to_bytes() for m in MultiLogIterator([fp.name], decompressed_cache=True)], expected)
+      self.assertEqual([m.as_builder().to_bytes() for m in LogReader(fp.name, decompressed_cache=True)], expected)
+
+  def test_parallel_logreader(self):
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp1, tempfile.NamedTemporaryFile(suffix=".bz2") as fp2:
+      write_test_log(fp1)
+      write_test_log(fp2, n=500)
+      log_paths = [fp1.name, None, fp2.name]
+
+      expected = [m.as_builder().to_bytes() for fn in (fp1.name, fp2.name) for m in LogReader(fn)]
+      for prefetch in (0, 1, 3):
+        ents = [m.as_builder().to_bytes() for m in ParallelLogReader(log_paths, processes=2, prefetch=prefetch)]
+        self.assertEqual(ents, expected)
+
+      car_states = list(ParallelLogReader(log_paths, processes=2, services=['carState']))
+      self.assertEqual(len(car_states), 750)
+
+  def test_parallel_logreader_defaults(self):
+    lr = ParallelLogReader([])
+    self.assertEqual(lr._processes, os.cpu_count())
+    self.assertEqual(lr._prefetch, lr._processes - 1)
+    self.assertEqual(ParallelLogReader([], prefetch=0)._processes, 1)
+
+    with tempfile.NamedTemporaryFile(suffix=".bz2") as fp:
+      write_test_log(fp, n=10, t0=100)
+      write_test_log(fp, n=10)
+      in_order = [m.logMonoTime for m in ParallelLogReader([fp.name], processes=1)]
+      self.assertEqual(in_order, sorted(in_order))
+      file_order = [m.logMonoTime for m in ParallelLogReader([fp.name], processes=1, sort_by_time=False)]
+      self.assertEqual(file_order, [m.logMonoTime for m in LogReader(fp.name)])
+      self.assertNotEqual(file_order, in_order)
+
   @unittest.skip("skip for bandwith reasons")
   def test_framereader(self):
     def _check_data(f):
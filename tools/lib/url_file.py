@@ -6,15 +6,27 @@ import tempfile
 import threading
 import urllib.parse
 import pycurl
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import sha256
 from io import BytesIO
 from tenacity import retry, wait_random_exponential, stop_after_attempt
-from common.file_helpers import mkdirs_exists_ok, atomic_write_in_dir
+from common.file_helpers import mkdirs_exists_ok
+from tools.lib.download_cache import DownloadCache
 #  Cache chunk size
 K = 1000
 CHUNK_SIZE = 1000 * K
 
 CACHE_DIR = os.environ.get("COMMA_CACHE", "/tmp/comma_download_cache/")
+#  Least recently used chunks are evicted past this many bytes
+CACHE_MAX_SIZE = int(float(os.environ.get("COMMA_CACHE_MAX_SIZE", 10e9)))
+#  Number of chunks downloaded concurrently
+DOWNLOAD_THREADS = int(os.environ.get("URLFILE_THREADS", "8"))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+_download_cache = DownloadCache(CACHE_DIR, CACHE_MAX_SIZE)
 
 
 def hash_256(link):
@@ -22,6 +34,28 @@ def hash_256(link):
   return hsh
 
 
+def cache_stats():
+  """Returns hit rate and bytes served from the download cache vs the network for this process."""
+  return _download_cache.stats()
+
+
+def _download_pool():
+  #  Threads keep their own curl handle, so connections are reused across reads. Executor threads
+  #  don't survive a fork, a forked process gets a new pool
+  global _pool, _pool_pid
+  with _pool_lock:
+    if _pool is None or _pool_pid != os.getpid():
+      _pool = ThreadPoolExecutor(max_workers=DOWNLOAD_THREADS)
+      _pool_pid = os.getpid()
+    return _pool
+
+
+def _map_chunks(func, args):
+  if len(args) > 1 and DOWNLOAD_THREADS > 1:
+    return list(_download_pool().map(func, args))
+  return [func(arg) for arg in args]
+
+
 class URLFile(object):
   _tlocal = threading.local()
 
@@ -36,11 +70,15 @@ class URLFile(object):
     if cache is not None:
       self._force_download = not cache
 
+    mkdirs_exists_ok(CACHE_DIR)
+
+  @classmethod
+  def _thread_curl(cls):
     try:
-      self._curl = self._tlocal.curl
+      return cls._tlocal.curl
     except AttributeError:
-      self._curl = self._tlocal.curl = pycurl.Curl()
-    mkdirs_exists_ok(CACHE_DIR)
+      cls._tlocal.curl = pycurl.Curl()
+      return cls._tlocal.curl
 
   def __enter__(self):
     return self
@@ -53,7 +91,7 @@ class URLFile(object):
 
   @retry(wait=wait_random_exponential(multiplier=1, max=5), stop=stop_after_attempt(3), reraise=True)
   def get_length_online(self):
-    c = self._curl
+    c = self._thread_curl()
     c.reset()
     c.setopt(pycurl.NOSIGNAL, 1)
     c.setopt(pycurl.TIMEOUT_MS, 500000)
@@ -68,66 +106,76 @@ class URLFile(object):
   def get_length(self):
     if self._length is not None:
       return self._length
-    file_length_path = os.path.join(CACHE_DIR, hash_256(self._url) + "_length")
-    if os.path.exists(file_length_path) and not self._force_download:
-      with open(file_length_path, "r") as file_length:
-          content = file_length.read()
-          self._length = int(content)
-          return self._length
+    if not self._force_download:
+      self._length = _download_cache.get_length(hash_256(self._url))
+      if self._length is not None:
+        return self._length
 
     self._length = self.get_length_online()
     if not self._force_download:
-      with atomic_write_in_dir(file_length_path, mode="w") as file_length:
-        file_length.write(str(self._length))
+      _download_cache.put_length(hash_256(self._url), self._length)
     return self._length
 
   def read(self, ll=None):
-    if self._force_download:
-      return self.read_aux(ll=ll)
+    if self._force_download or self.get_length() < 0:
+      return self._read_uncached(ll=ll)
 
     file_begin = self._pos
-    file_end = self._pos + ll if ll is not None else self.get_length()
-    #  We have to align with chunks we store. Position is the begginiing of the latest chunk that starts before or at our file
-    position = (file_begin // CHUNK_SIZE) * CHUNK_SIZE
-    response = b""
-    while True:
-      self._pos = position
-      chunk_number = self._pos / CHUNK_SIZE
-      file_name = hash_256(self._url) + "_" + str(chunk_number)
-      full_path = os.path.join(CACHE_DIR, str(file_name))
-      data = None
-      #  If we don't have a file, download it
-      if not os.path.exists(full_path):
-        data = self.read_aux(ll=CHUNK_SIZE)
-        with atomic_write_in_dir(full_path, mode="wb") as new_cached_file:
-          new_cached_file.write(data)
-      else:
-        with open(full_path, "rb") as cached_file:
-          data = cached_file.read()
+    file_end = self.get_length() if ll is None else min(self._pos + ll, self.get_length())
+    #  We have to align with chunks we store. Missing chunks are downloaded concurrently
+    chunk_positions = list(range((file_begin // CHUNK_SIZE) * CHUNK_SIZE, file_end, CHUNK_SIZE))
+    chunks = _map_chunks(self._get_chunk, chunk_positions)
+
+    response = b"".join(data[max(0, file_begin - position): file_end - position] for position, data in zip(chunk_positions, chunks))
+    self._pos = file_begin + len(response)
+    return response
+
+  def _get_chunk(self, position):
+    file_name = hash_256(self._url) + "_" + str(position // CHUNK_SIZE)
+    data = _download_cache.get_chunk(file_name)
+    #  If we don't have the chunk, download it
+    if data is None:
+      data = self._download(position, CHUNK_SIZE)
+      _download_cache.put_chunk(file_name, data)
+    return data
+
+  def _read_uncached(self, ll=None):
+    length = self.get_length()
+    if length < 0:
+      #  Without a Content-Length the file can't be split into chunks, it's read in a single request
+      return self.read_aux(ll=ll)
 
-      response += data[max(0, file_begin - position): min(CHUNK_SIZE, file_end - position)]
+    file_end = length if ll is None else min(self._pos + ll, length)
+    positions = list(range(self._pos, file_end, CHUNK_SIZE))
+    response = b"".join(_map_chunks(lambda position: self._download(position, min(CHUNK_SIZE, file_end - position)), positions))
+    self._pos += len(response)
+    return response
 
-      position += CHUNK_SIZE
-      if position >= file_end:
-        self._pos = file_end
-        return response
+  def read_aux(self, ll=None):
+    ret = self._download(self._pos, ll)
+    self._pos += len(ret)
+    return ret
 
   @retry(wait=wait_random_exponential(multiplier=1, max=5), stop=stop_after_attempt(3), reraise=True)
-  def read_aux(self, ll=None):
+  def _download(self, pos, ll=None):
     download_range = False
     headers = ["Connection: keep-alive"]
-    if self._pos != 0 or ll is not None:
-      if ll is None:
-        end = self.get_length() - 1
+    if pos != 0 or ll is not None:
+      length = self.get_length()
+      if length < 0:
+        #  Unknown length, the server stops at the end of the file
+        if ll is not None and ll <= 0:
+          return b""
+        end = "" if ll is None else pos + ll - 1
       else:
-        end = min(self._pos + ll, self.get_length()) - 1
-      if self._pos >= end:
-        return b""
-      headers.append(f"Range: bytes={self._pos}-{end}")
+        end = (length if ll is None else min(pos + ll, length)) - 1
+        if pos > end:
+          return b""
+      headers.append(f"Range: bytes={pos}-{end}")
       download_range = True
 
     dats = BytesIO()
-    c = self._curl
+    c = self._thread_curl()
     c.setopt(pycurl.URL, self._url)
     c.setopt(pycurl.WRITEDATA, dats)
     c.setopt(pycurl.NOSIGNAL, 1)
@@ -166,9 +214,7 @@ class URLFile(object):
     if (not download_range) and response_code != 200:  # OK
       raise Exception(f"Error {response_code} {headers} ({self._url}): {repr(dats.getvalue())[:500]}")
 
-    ret = dats.getvalue()
-    self._pos += len(ret)
-    return ret
+    return dats.getvalue()
 
   def seek(self, pos):
     self._pos = pos